@@ -159,84 +159,40 @@
 #         return None
 
 # analyzer.py
-import vertexai
-from vertexai.generative_models import GenerativeModel, Part, HarmCategory, HarmBlockThreshold
+import asyncio
+import itertools
 import json
-import re
 import os
-from preprocessing import preprocess_image 
+import threading
+from config import get_settings
+from result_cache import make_cache_key, get_default_cache, CACHE_ENABLED
+from request_scheduler import RequestScheduler
+from json_stream import IncrementalJSONParser, extract_json_object, PARTIAL_KEY
+from compact_format import CATEGORY_FIELDS, REVIEW_FIELDS, expand_compact, expand_compact_category
 
 # --- CONFIGURATION ---
-import os
-import streamlit as st
-import json
-import tempfile
-
-# Try to get from Streamlit secrets first, then environment variables
-try:
-    PROJECT_ID = st.secrets["gcp"]["project_id"]
-    LOCATION = st.secrets["gcp"]["location"] 
-    MODEL_ID = st.secrets["gcp"]["model_id"]
-    
-    # Set up authentication if service account key is provided
-    if "service_account_key" in st.secrets["gcp"]:
-        # Create temporary file for service account key
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            json.dump(dict(st.secrets["gcp"]["service_account_key"]), f)
-            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = f.name
-            
-except (KeyError, FileNotFoundError):
-    # Fallback to environment variables
-    PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT_ID", "p-id-digitizer-project")
-    LOCATION = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
-    MODEL_ID = os.getenv("GOOGLE_CLOUD_MODEL_ID", "gemini-2.5-pro")
-
-# Set up authentication from environment variable if available
-credentials_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
-if credentials_json:
-    try:
-        credentials_data = json.loads(credentials_json)
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            json.dump(credentials_data, f)
-            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = f.name
-    except json.JSONDecodeError:
-        print("Warning: Invalid JSON in GOOGLE_APPLICATION_CREDENTIALS_JSON")
+# Credentials and model settings are resolved lazily (config.get_settings), so importing
+# this module never loads Streamlit or the Vertex SDK.
 
-def extract_json_from_response(text: str):
-    """Finds and parses the first valid JSON block from a string."""
-    json_match = re.search(r'```json\s*(\{.*?\})\s*```|(\{.*?\})', text, re.DOTALL)
-    if json_match:
-        json_str = json_match.group(1) if json_match.group(1) else json_match.group(2)
-        try:
-            return json.loads(json_str)
-        except json.JSONDecodeError as e:
-            print(f"Error decoding JSON: {e}")
-            return None
-    return None
-
-def analyze_pid(image_file_path: str):
-    """
-    Analyzes a P&ID using the final, hyper-specific master prompt.
-    """
-    print("---------------------///////////// Starting analysis pipeline...")
-    processed_image_path = preprocess_image(image_file_path)
+# Upper bound on concurrent model requests in batch mode
+DEFAULT_CONCURRENCY = int(os.getenv("PID_MAX_CONCURRENCY", 8))
+# Tokens reserved per request against the tokens/min budget (image + prompt + typical output)
+EST_TOKENS_PER_REQUEST = int(os.getenv("PID_EST_TOKENS_PER_REQUEST", 12000))
+# "verbose" (one JSON object per detection) or "compact" (columnar rows per category)
+OUTPUT_MODE = os.getenv("PID_OUTPUT_MODE", "verbose")
 
-    vertexai.init(project=PROJECT_ID, location=LOCATION)
-    model = GenerativeModel(MODEL_ID)
 
-    # --- FINAL HYPER-SPECIFIC MASTER PROMPT ---
-    prompt = """
+# --- PROMPTS ---
+# Both output modes share the header, the extraction rules and the footer; only the
+# output-format section differs, so verbose and compact runs extract the same things.
+_PROMPT_HEADER = """
     Your SOLE task is to output ONE valid JSON object for the provided P&ID image. 
     ⚠️ Output NOTHING except the JSON (must start with { and end with }).
 
     You are an expert AI process engineer. Follow ISA-5.1 and ISO 14617 conventions.
+"""
 
-    ================= JSON RULES =================
-    - Return ONLY a JSON object (not Markdown, no commentary).
-    - JSON must be syntactically valid and parseable with Python json.loads.
-    - All arrays must contain only objects (no trailing commas).
-    - Use null for missing values, never empty strings.
-
+_EXTRACTION_RULES = """
     ================= COORDINATE SYSTEM =================
     - All bounding boxes MUST be normalized to image frame where (0,0) is top-left and (1000,1000) is bottom-right.
     - bounding_box format: [x1, y1, x2, y2] with integers only.
@@ -244,6 +200,30 @@ def analyze_pid(image_file_path: str):
     - Boxes must be TIGHT around the actual symbol/text (no loose/oversized boxes, no overlaps).
     - Round coordinates to nearest integer.
 
+    ================= ALLOWED VALUES =================
+    - metadata: drawing_title, drawing_number, revision. If no title block is found, return it with null values.
+    - line_type MUST be one of ["process", "instrument_signal", "electrical_signal", "utility", "pneumatic", "hydraulic", "unknown"].
+    - relationship_type MUST be one of ["measures", "controls", "signals"].
+    - Use null for missing values, never empty strings.
+
+    ================= VALIDATION RULES =================
+    - If any field is missing/uncertain, set flag_for_review to true and give a review_reason.
+    - DO NOT hallucinate connections — only include if clearly visible.
+"""
+
+_PROMPT_FOOTER = """
+    ⚠️ Final Output = JSON object ONLY (no explanations, no markdown, no ```json fences).
+    """
+
+# One JSON object per detection, with its category_name and label
+_VERBOSE_FORMAT = """
+    ================= JSON RULES =================
+    - Return ONLY a JSON object (not Markdown, no commentary).
+    - JSON must be syntactically valid and parseable with Python json.loads.
+    - All arrays must contain only objects (no trailing commas).
+    - Ensure each object has "category_name" and "label".
+    - Ensure JSON is compact, valid, and industry-compliant.
+
     ================= LABELING RULES =================
     Every object MUST have a non-empty "label". 
     Allowed priority for label:
@@ -260,7 +240,7 @@ def analyze_pid(image_file_path: str):
     The top-level JSON object MUST include the "metadata" key. Other keys may be omitted if empty.
 
     1) metadata: object
-       fields: drawing_title?, drawing_number?, revision?. If no title block is found, return this object with null values for its fields.
+       fields: drawing_title?, drawing_number?, revision?
 
     2) equipment: array of objects
     fields: tag?, type?, description?, bounding_box [int,int,int,int], 
@@ -273,7 +253,7 @@ def analyze_pid(image_file_path: str):
             category_name="instrumentation", label
 
     4) lines: array of objects
-    fields: line_number_tag?, source_tag?, destination_tag?, line_type (MUST be one of ["process", "instrument_signal", "electrical_signal", "utility", "pneumatic", "hydraulic", "unknown"])?, 
+    fields: line_number_tag?, source_tag?, destination_tag?, line_type?, 
             bounding_box? [int,int,int,int], 
             category_name="lines", label
 
@@ -287,7 +267,7 @@ def analyze_pid(image_file_path: str):
             category_name="junctions", label
 
     7) control_relationships: array of objects
-    fields: source_tag, destination_tag, relationship_type ("measures","controls","signals"), 
+    fields: source_tag, destination_tag, relationship_type, 
             category_name="control_relationships", 
             label (e.g., "FT-101 -> FC-101")
 
@@ -303,49 +283,286 @@ def analyze_pid(image_file_path: str):
         fields: description, bounding_box [int,int,int,int], 
                 flag_for_review=true, review_reason?, 
                 category_name="unrecognized_symbols", label
+"""
+
+# Each category is a header row plus value rows (see compact_format.py), which avoids
+# repeating keys, category_name and label for every object; labels are derived with
+# the verbose labeling priority (compact_format.derive_label).
+_COMPACT_COLUMNS = "\n".join(
+    f"    {i}) {category}: fields = {json.dumps(fields + [f for f in REVIEW_FIELDS if f not in fields])}"
+    for i, (category, fields) in enumerate(CATEGORY_FIELDS.items(), start=2)
+)
+_COMPACT_FORMAT = """
+    ================= OUTPUT FORMAT (COLUMNAR) =================
+    - Each category is an object {"fields": [...], "rows": [[...], ...]}.
+    - "fields" lists the column names in exactly the order given below; you may drop trailing
+      columns that are null in every row.
+    - Each detected object is ONE row: an array of values in the same order as "fields".
+    - Do not repeat field names inside rows.
+    - Do NOT output category_name or label; they are derived automatically.
+
+    ================= CATEGORIES =================
+    The top-level JSON object MUST include the "metadata" key. Other keys may be omitted if empty.
 
-    ================= VALIDATION RULES =================
-    - If any field is missing/uncertain, include "flag_for_review": true and "review_reason".
-    - DO NOT hallucinate connections — only include if clearly visible.
-    - Ensure each object has "category_name" and "label".
-    - Ensure JSON is compact, valid, and industry-compliant.
+    1) metadata: object with drawing_title, drawing_number, revision.
+""" + _COMPACT_COLUMNS + "\n"
 
-    ⚠️ Final Output = JSON object ONLY (no explanations, no markdown, no ```json fences).
+MASTER_PROMPT = _PROMPT_HEADER + _VERBOSE_FORMAT + _EXTRACTION_RULES + _PROMPT_FOOTER
+COMPACT_PROMPT = _PROMPT_HEADER + _COMPACT_FORMAT + _EXTRACTION_RULES + _PROMPT_FOOTER
+
+PROMPTS = {"verbose": MASTER_PROMPT, "compact": COMPACT_PROMPT}
+
+
+def extract_json_from_response(text: str):
+    """
+    Finds and parses the first JSON object in the model response.
+    Uses a single-pass, balanced-brace scanner, so nested objects are handled; truncated
+    output is repaired to its last complete item and marked with PARTIAL_KEY.
+    """
+    data = extract_json_object(text)
+    if data is None:
+        print("Error decoding JSON: no parseable object in response")
+    elif data.get(PARTIAL_KEY):
+        print("⚠️ Response was truncated; kept every complete item (partial result).")
+    return data
+
+def encode_payload(img):
+    """
+    Encodes a preprocessed image array once into the bytes sent to the model.
+    PNG keeps the binary drawing lossless and compresses it well.
+    """
+    import cv2
+
+    ok, buffer = cv2.imencode(".png", img)
+    if not ok:
+        raise ValueError("Could not encode preprocessed image as PNG")
+    return buffer.tobytes(), "image/png"
+
+class AnalyzerClient:
     """
+    Long-lived analysis client: the model backend is created once per process and
+    reused for every drawing. Offers a blocking `analyze` and an `async analyze_many`
+    batch API with a bound on in-flight model requests. Every model call goes through
+    a RequestScheduler (rate limits, jittered retries, circuit breaker).
 
-    # Load image
-    ext = os.path.splitext(processed_image_path)[1].lower()
-    mime = "image/jpeg" if ext in [".jpg", ".jpeg"] else "image/png"
-    with open(processed_image_path, "rb") as f:
-        image_bytes = f.read()
-    image = Part.from_data(data=image_bytes, mime_type=mime)
+    `output_mode` selects the prompt: "verbose" (one object per detection) or "compact"
+    (columnar rows, expanded back to the verbose structure after parsing).
+    """
 
-    safety_settings = {
-        HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-        HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-        HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-        HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-    }
+    def __init__(self, backend=None, cache=None, prompt=None, scheduler=None, output_mode=OUTPUT_MODE):
+        if output_mode not in PROMPTS:
+            raise ValueError(f"Unknown output mode {output_mode!r}; expected one of {sorted(PROMPTS)}")
+        self._backend = backend
+        self._backend_lock = threading.Lock()
+        self.cache = cache
+        self.output_mode = output_mode
+        self.prompt = prompt if prompt is not None else PROMPTS[output_mode]
+        self.scheduler = scheduler or RequestScheduler()
+
+    @property
+    def backend(self):
+        """The model backend, initialised on first use (Vertex AI unless one was injected)."""
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    from model_backends import VertexBackend
+                    settings = get_settings()
+                    self._backend = VertexBackend(
+                        settings.project_id, settings.location, settings.model_id, settings.credentials_info
+                    )
+        return self._backend
+
+    @property
+    def model_id(self):
+        return self._backend.model_id if self._backend is not None else get_settings().model_id
+
+    def _get_cache(self, use_cache):
+        if not use_cache:
+            return None
+        return self.cache if self.cache is not None else get_default_cache()
 
-    print(f"--------------///////////// Identifying the Symbols/ Instrumentation/ Piping lines/ Valves / Junctions ...")
-    response = model.generate_content([image, prompt], safety_settings=safety_settings)
+    def _prepare(self, image):
+        """Preprocesses and encodes the image; returns (image_bytes, mime) or None."""
+        # OpenCV is loaded on the first drawing rather than when the module is imported
+        from preprocessing import preprocess_image
+
+        processed_image = preprocess_image(image)
+        if processed_image is None:
+            print("❌ Could not decode the input image.")
+            return None
+        # Encode the preprocessed image straight into the request payload
+        return encode_payload(processed_image)
 
-    if os.path.exists(processed_image_path) and processed_image_path != image_file_path:
+    def _lookup(self, image_bytes, cache, refresh_cache):
+        from preprocessing import PREPROCESS_PARAMS
+
+        cache_key = make_cache_key(image_bytes, self.prompt, self.model_id, PREPROCESS_PARAMS)
+        if cache and not refresh_cache:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                print("------------------ Analysis loaded from cache!")
+                return cache_key, cached
+        return cache_key, None
+
+    def _finish(self, response_text, cache, cache_key):
         try:
-            os.remove(processed_image_path)
-        except Exception:
-            pass
+            data = expand_compact(extract_json_from_response(response_text))
+            if data and data.get(PARTIAL_KEY) and not any(isinstance(v, list) and v for v in data.values()):
+                print("❌ Response was cut off before any item was complete.")
+                data = None
+            if data:
+                print("------------------ Analysis Complete!")
+                # A truncated response is shown, but never cached: the next run asks again
+                if cache and not data.get(PARTIAL_KEY):
+                    cache.put(cache_key, data)
+                return data
+            else:
+                print("❌ Could not parse JSON. Raw response:")
+                print(response_text)
+                return None
+        except Exception as e:
+            print(f"❌ Error during parsing/post-processing: {e}")
+            return None
 
-    try:
-        data = extract_json_from_response(response.text)
-        if data:
+    def analyze(self, image, use_cache=CACHE_ENABLED, refresh_cache=False):
+        """Blocking analysis of a single drawing (see analyze_pid)."""
+        print("---------------------///////////// Starting analysis pipeline...")
+        prepared = self._prepare(image)
+        if prepared is None:
+            return None
+        image_bytes, mime = prepared
+
+        cache = self._get_cache(use_cache)
+        cache_key, cached = self._lookup(image_bytes, cache, refresh_cache)
+        if cached is not None:
+            return cached
+
+        print(f"--------------///////////// Identifying the Symbols/ Instrumentation/ Piping lines/ Valves / Junctions ...")
+        backend = self.backend
+        response_text = self.scheduler.call(
+            lambda: backend.generate(image_bytes, mime, self.prompt), EST_TOKENS_PER_REQUEST
+        )
+        return self._finish(response_text, cache, cache_key)
+
+    def analyze_stream(self, image, use_cache=CACHE_ENABLED, refresh_cache=False):
+        """
+        Streaming analysis of a single drawing. Yields ("category", key, value) as soon as
+        each top-level member of the model's JSON (equipment, lines, ...) is complete, then
+        ("result", None, data) with the whole document (data is None if parsing failed).
+        """
+        print("---------------------///////////// Starting streaming analysis pipeline...")
+        prepared = self._prepare(image)
+        if prepared is None:
+            yield ("result", None, None)
+            return
+        image_bytes, mime = prepared
+
+        cache = self._get_cache(use_cache)
+        cache_key, cached = self._lookup(image_bytes, cache, refresh_cache)
+        if cached is not None:
+            for key, value in cached.items():
+                yield ("category", key, value)
+            yield ("result", None, cached)
+            return
+
+        backend = self.backend
+
+        def open_stream():
+            # Pull the first chunk inside the scheduler so throttling on connect is retried
+            chunks = iter(backend.generate_stream(image_bytes, mime, self.prompt))
+            return next(chunks, ""), chunks
+
+        first, chunks = self.scheduler.call(open_stream, EST_TOKENS_PER_REQUEST)
+        parser = IncrementalJSONParser()
+        parts = []
+        expanded = {}
+        for chunk in itertools.chain([first], chunks):
+            parts.append(chunk)
+            for key, value in parser.feed(chunk):
+                if key != "metadata":
+                    value = expand_compact_category(key, value)
+                expanded[key] = value
+                yield ("category", key, value)
+
+        if parser.done and not parser.errors:
+            # The incremental parse already holds the full document; no second pass needed
+            data = expanded
             print("------------------ Analysis Complete!")
-            return data
+            if cache:
+                cache.put(cache_key, data)
         else:
-            print("❌ Could not parse JSON. Raw response:")
-            print(response.text)
+            data = self._finish("".join(parts), cache, cache_key)
+        yield ("result", None, data)
+
+    async def analyze_async(self, image, use_cache=CACHE_ENABLED, refresh_cache=False):
+        """
+        Non-blocking analysis of a single drawing. CPU-bound preprocessing runs in a
+        worker thread so the event loop keeps other model requests in flight.
+        """
+        loop = asyncio.get_running_loop()
+        prepared = await loop.run_in_executor(None, self._prepare, image)
+        if prepared is None:
             return None
-    except Exception as e:
-        print(f"❌ Error during parsing/post-processing: {e}")
-        return None
+        image_bytes, mime = prepared
 
+        cache = self._get_cache(use_cache)
+        cache_key, cached = self._lookup(image_bytes, cache, refresh_cache)
+        if cached is not None:
+            return cached
+
+        backend = self.backend
+        response_text = await self.scheduler.run(
+            lambda: backend.generate_async(image_bytes, mime, self.prompt), EST_TOKENS_PER_REQUEST
+        )
+        return self._finish(response_text, cache, cache_key)
+
+    async def analyze_many(self, paths, max_concurrency=DEFAULT_CONCURRENCY,
+                           use_cache=CACHE_ENABLED, refresh_cache=False):
+        """
+        Analyzes many drawings concurrently with at most `max_concurrency` in flight.
+        Returns results in input order; a drawing that fails yields None.
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def run_one(path):
+            async with semaphore:
+                try:
+                    return await self.analyze_async(path, use_cache=use_cache, refresh_cache=refresh_cache)
+                except Exception as e:
+                    print(f"❌ Analysis failed for {path}: {e}")
+                    return None
+
+        return await asyncio.gather(*(run_one(path) for path in paths))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Returns the process-wide AnalyzerClient, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = AnalyzerClient()
+    return _client
+
+
+def analyze_pid_stream(image, use_cache=CACHE_ENABLED, refresh_cache=False):
+    """
+    Streaming variant of analyze_pid; see AnalyzerClient.analyze_stream for the events yielded.
+    """
+    return get_client().analyze_stream(image, use_cache=use_cache, refresh_cache=refresh_cache)
+
+
+def analyze_pid(image, use_cache=CACHE_ENABLED, refresh_cache=False):
+    """
+    Analyzes a P&ID using the final, hyper-specific master prompt.
+    `image` may be a path, raw bytes, a file-like upload or a decoded NumPy array.
+
+    Results are cached on disk keyed by the preprocessed image, prompt, model and
+    preprocessing parameters. `use_cache=False` bypasses the cache entirely;
+    `refresh_cache=True` skips the lookup but stores the fresh result.
+    """
+    return get_client().analyze(image, use_cache=use_cache, refresh_cache=refresh_cache)
@@ -1,14 +1,33 @@
 import streamlit as st
+import copy
 import os
 import pandas as pd
 import json
 import streamlit.components.v1 as components
-from jsonschema import validate, ValidationError
-from analyzer import analyze_pid
-from schema import PID_SCHEMA_V2 as PID_SCHEMA
+from jsonschema import ValidationError
+from analyzer import analyze_pid_stream
+from request_scheduler import ModelUnavailableError
+from json_stream import PARTIAL_KEY
+from schema_validator import validate_document
+from review_engine import ReviewSession
 from visualizer import draw_bounding_boxes
-from intelligence_builder import build_knowledge_graph_from_tables
-from postprocessing import postprocess_pid_data 
+from preprocessing import load_image
+from intelligence_builder import render_knowledge_graph
+from postprocessing import TAG_KEYS, postprocess_category
+from normalizer import normalize_document
+from plant_model import PlantModel, save_sheet, sheet_key
+
+CATEGORY_MAPPING = {
+    "equipment": "Equipment",
+    "instrumentation": "Instrumentation",
+    "lines": "Piping Lines",
+    "valves": "Valves",
+    "junctions": "Junctions",
+    "control_relationships": "Control Relationships",
+    "annotations": "Annotations",
+    "safety_devices": "Safety Devices",
+    "unrecognized_symbols": "Unrecognized Symbols"
+}
 
 
 st.set_page_config(page_title="P&ID >>> Digital Intelligence", layout="wide")
@@ -17,6 +36,17 @@ if "extracted_data" not in st.session_state:
     st.session_state.extracted_data = None
 if "uploaded_file_name" not in st.session_state:
     st.session_state.uploaded_file_name = None
+if "uploaded_image" not in st.session_state:
+    st.session_state.uploaded_image = None
+if "quarantined" not in st.session_state:
+    st.session_state.quarantined = []
+if "review" not in st.session_state:
+    st.session_state.review = None
+if "sheet_key" not in st.session_state:
+    st.session_state.sheet_key = None
+if "plant" not in st.session_state:
+    # Every analyzed sheet joins one plant model, stitched across sheets and kept on disk
+    st.session_state.plant = PlantModel.load()
 
 st.title("P&ID >>> Digital Intelligence")
 st.write(
@@ -28,32 +58,53 @@ uploaded_file = st.file_uploader("Choose a P&ID image file", type=["png", "jpg",
 
 if uploaded_file is not None:
    
-    if uploaded_file.name != st.session_state.uploaded_file_name:
+    if uploaded_file.name != st.session_state.uploaded_file_name or st.session_state.uploaded_image is None:
         st.session_state.extracted_data = None
         st.session_state.uploaded_file_name = uploaded_file.name
+        # Decode the upload once; preprocessing, the model payload and the visualizer share this buffer
+        st.session_state.uploaded_image = load_image(uploaded_file)
+
+    refresh_cache = st.checkbox("Ignore cached results and re-analyze", value=False)
 
     col1, col2, _ = st.columns([1, 1, 3])
+    # Tables appear here while the model is still generating, then are replaced by the full results
+    live_preview = st.empty()
     with col1:
         if st.button("Analyze P&ID", use_container_width=True):
-            temp_dir = "temp_uploads"
-            os.makedirs(temp_dir, exist_ok=True)
-            temp_path = os.path.join(temp_dir, uploaded_file.name)
-
-            with open(temp_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-
             with st.spinner("Analyzing the P&ID image..."):
                 try:
-                    raw_data = analyze_pid(temp_path)
+                    raw_data = None
+                    preview = live_preview.container()
+                    for event, key, value in analyze_pid_stream(st.session_state.uploaded_image, refresh_cache=refresh_cache):
+                        if event == "result":
+                            raw_data = value
+                        elif key in CATEGORY_MAPPING and isinstance(value, list) and value:
+                            with preview:
+                                st.subheader(f"Detected {CATEGORY_MAPPING[key]} (preview)")
+                                # Clean a copy: the streamed lists become the final result and the cache entry
+                                st.dataframe(pd.DataFrame(postprocess_category(key, copy.deepcopy(value))), use_container_width=True)
+                    live_preview.empty()
 
                     if raw_data:
                         
-                        data = postprocess_pid_data(raw_data)
+                        data = normalize_document(raw_data)
                         
                       
-                        validate(instance=data, schema=PID_SCHEMA)
+                        # Invalid items go to the review queue; the rest of the sheet is kept
+                        data, quarantined = validate_document(data)
                         st.session_state.extracted_data = data
+                        st.session_state.quarantined = quarantined
+                        st.session_state.review = ReviewSession(data, quarantined)
+                        # Keyed by drawing number (or the upload's bytes), merged with sheets other sessions saved
+                        st.session_state.sheet_key = sheet_key(data, upload=uploaded_file.getvalue())
+                        plant = save_sheet(st.session_state.sheet_key, data)
+                        st.session_state.plant = plant
                         st.success("-----------------------//////// Analysis Complete, Standardized & Schema Validated!")
+                        if quarantined:
+                            st.warning(f"{len(quarantined)} item(s) failed schema validation and were moved to the review queue.")
+                        if data.get(PARTIAL_KEY):
+                            st.warning("The AI response was cut off; showing every complete item that was recovered.")
+                        st.info(f"Plant model: {len(plant)} sheet(s), {plant.stitched_edges()} cross-sheet connection(s).")
                     else:
                         st.error("****** Analysis failed. AI returned no data.")
 
@@ -63,14 +114,14 @@ if uploaded_file is not None:
                     st.subheader("Invalid Data (after postprocessing):")
                     st.json(data if 'data' in locals() else raw_data) 
 
+                except ModelUnavailableError as e:
+                    st.session_state.extracted_data = None
+                    st.error(f"****** The AI service is busy or rate limited. Please try again in a minute. ({e})")
+
                 except Exception as e:
                     st.session_state.extracted_data = None
                     st.error(f"****** An unexpected error occurred: {e}")
 
-                finally:
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
-
     with col2:
         if st.session_state.extracted_data and st.button("Clear Results", use_container_width=True):
             st.session_state.extracted_data = None
@@ -86,18 +137,18 @@ if st.session_state.extracted_data:
     vis_col1, vis_col2 = st.columns(2)
     with vis_col1:
         st.subheader("Original Image")
-        st.image(uploaded_file, caption="Original P&ID", use_container_width=True)
+        st.image(st.session_state.uploaded_image, caption="Original P&ID", channels="BGR", use_container_width=True)
 
     with vis_col2:
         st.subheader("AI Detections")
-        annotated_image_path = draw_bounding_boxes(uploaded_file, data)
-        if annotated_image_path:
+        annotated_image = draw_bounding_boxes(st.session_state.uploaded_image, data)
+        if annotated_image is not None:
             st.image(
-                annotated_image_path,
+                annotated_image,
                 caption="P&ID with AI Detections",
+                channels="BGR",
                 use_container_width=True,
             )
-            os.remove(annotated_image_path)
 
   
     st.write("---")
@@ -118,19 +169,38 @@ if st.session_state.extracted_data:
                 st.download_button( "Download Metadata as JSON", json_string_meta, f"{os.path.splitext(st.session_state.uploaded_file_name)[0]}_metadata.json", "application/json", key="json_meta")
             st.write("---")
 
+        # Review findings (schema violations, orphans, low confidence, tag formats, flags), for human review
+        if st.session_state.review is None:
+            st.session_state.review = ReviewSession(data, st.session_state.quarantined)
+        session = st.session_state.review
+        review = session.queue()
+        if review["errors"] or review["warnings"]:
+            st.subheader("Review Queue")
+            for severity in ("errors", "warnings"):
+                if review[severity]:
+                    st.caption(f"{len(review[severity])} {severity}")
+                    st.dataframe(pd.DataFrame(review[severity]).drop(columns=["bounding_box"]), use_container_width=True)
+
+            # A fix re-checks only the edited item and its neighbours, not the whole sheet
+            editable = [f for f in review["errors"] + review["warnings"] if "category" in f]
+            if editable:
+                with st.form("review_fix"):
+                    target = st.selectbox("Item", sorted({(f["category"], f["index"], f["id"]) for f in editable}),
+                                          format_func=lambda t: f"{t[2]} ({t[0]} #{t[1]})")
+                    new_tag = st.text_input("Corrected tag")
+                    if st.form_submit_button("Apply fix") and new_tag.strip():
+                        delta = session.apply_edit(target[0], target[1], {TAG_KEYS.get(target[0], "tag"): new_tag.strip()})
+                        st.session_state.extracted_data = session.data
+                        st.session_state.plant = save_sheet(st.session_state.sheet_key, session.data)
+                        st.session_state.review_delta = (len(delta["resolved"]), len(delta["added"]))
+                        st.rerun()
+            if "review_delta" in st.session_state:
+                resolved, added = st.session_state.pop("review_delta")
+                st.info(f"Fix applied: {resolved} finding(s) resolved, {added} new.")
+            st.write("---")
+
         # tables
-        category_mapping = {
-            "equipment": "Equipment",
-            "instrumentation": "Instrumentation",
-            "lines": "Piping Lines",
-            "valves": "Valves",
-            "junctions": "Junctions",
-            "control_relationships": "Control Relationships",
-            "annotations": "Annotations",
-            "safety_devices": "Safety Devices",
-            "unrecognized_symbols": "Unrecognized Symbols"
-        }
-        for key, label in category_mapping.items():
+        for key, label in CATEGORY_MAPPING.items():
             if key in data and data[key]:
                 st.subheader(f"Detected {label}")
                 if isinstance(data[key], list):
@@ -149,12 +219,9 @@ if st.session_state.extracted_data:
 
     with tab2:
         st.info("You can drag nodes, zoom, and hover over components to see their details.")
-        graph_path = build_knowledge_graph_from_tables(data)
-        if graph_path and os.path.exists(graph_path):
-            with open(graph_path, "r", encoding="utf-8") as f:
-                source_code = f.read()
-                components.html(source_code, height=800, scrolling=True)
-            os.remove(graph_path)
+        graph_html = render_knowledge_graph(data) if data else None
+        if graph_html:
+            components.html(graph_html, height=800, scrolling=True)
         else:
             st.warning("-----Could not generate an interactive graph from the extracted data.")
 
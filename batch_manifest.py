@@ -0,0 +1,91 @@
+import json
+import os
+import sqlite3
+import time
+
+
+class JobManifest:
+    """
+    SQLite record of a batch run: one row per input drawing with its status,
+    timings, output paths and output name. A drawing is only skipped on resume if it
+    finished successfully, its input file is unchanged and its outputs still exist.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                input_path TEXT PRIMARY KEY,
+                fingerprint TEXT,
+                status TEXT NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                duration_s REAL,
+                outputs TEXT,
+                error TEXT,
+                output_name TEXT
+            )
+        """)
+        # Manifests written before output names were recorded
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        if "output_name" not in columns:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN output_name TEXT")
+        self.conn.commit()
+
+    @staticmethod
+    def fingerprint(path):
+        """Cheap change detector for an input file (size and modification time)."""
+        stat = os.stat(path)
+        return f"{stat.st_size}:{int(stat.st_mtime_ns)}"
+
+    def is_done(self, input_path):
+        row = self.conn.execute(
+            "SELECT fingerprint, status, outputs FROM jobs WHERE input_path = ?", (input_path,)
+        ).fetchone()
+        if not row or row[1] != "done":
+            return False
+        if row[0] != self.fingerprint(input_path):
+            return False
+        outputs = json.loads(row[2] or "[]")
+        return all(os.path.exists(path) for path in outputs)
+
+    def output_name(self, input_path):
+        """The output name an earlier run gave `input_path`, or None."""
+        row = self.conn.execute("SELECT output_name FROM jobs WHERE input_path = ?", (input_path,)).fetchone()
+        return row[0] if row else None
+
+    def mark_running(self, input_path):
+        self.conn.execute("""
+            INSERT INTO jobs (input_path, fingerprint, status, started_at)
+            VALUES (?, ?, 'running', ?)
+            ON CONFLICT(input_path) DO UPDATE SET
+                fingerprint = excluded.fingerprint, status = 'running',
+                started_at = excluded.started_at, finished_at = NULL,
+                duration_s = NULL, outputs = NULL, error = NULL
+        """, (input_path, self.fingerprint(input_path), time.time()))
+        self.conn.commit()
+
+    def _finish(self, input_path, status, duration_s, outputs=None, error=None, output_name=None):
+        self.conn.execute("""
+            UPDATE jobs SET status = ?, finished_at = ?, duration_s = ?, outputs = ?, error = ?,
+                output_name = COALESCE(?, output_name)
+            WHERE input_path = ?
+        """, (status, time.time(), duration_s, json.dumps(outputs or []), error, output_name, input_path))
+        self.conn.commit()
+
+    def mark_done(self, input_path, duration_s, outputs, output_name=None):
+        self._finish(input_path, "done", duration_s, outputs=outputs, output_name=output_name)
+
+    def mark_failed(self, input_path, duration_s, error):
+        self._finish(input_path, "failed", duration_s, error=str(error))
+
+    def counts(self):
+        """Returns {status: count} over the whole manifest."""
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,47 @@
+"""
+Benchmark: batch throughput of AnalyzerClient.analyze_many against the offline stand-in backend.
+
+Run from the repository root:
+    python -m benchmarks.bench_batch --sheets 64 --latency 0.5 --concurrency 1 4 16
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from analyzer import AnalyzerClient
+from model_backends import LocalBackend
+
+
+def synthetic_sheets(count, size=256):
+    """Small distinct sheets so preprocessing stays cheap and every sheet is a cache miss."""
+    sheets = []
+    for i in range(count):
+        img = np.full((size, size), 255, np.uint8)
+        img[(i * 7) % size, :] = 0
+        img[:, (i * 13) % size] = 0
+        sheets.append(img)
+    return sheets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure analyze_many throughput vs concurrency.")
+    parser.add_argument("--sheets", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated model latency in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    sheets = synthetic_sheets(args.sheets)
+    for concurrency in args.concurrency:
+        backend = LocalBackend(latency=args.latency)
+        client = AnalyzerClient(backend=backend)
+        start = time.perf_counter()
+        asyncio.run(client.analyze_many(sheets, max_concurrency=concurrency, use_cache=False))
+        elapsed = time.perf_counter() - start
+        print(f"concurrency={concurrency:3d}  {elapsed:7.2f} s  "
+              f"{args.sheets / elapsed:7.2f} sheets/s  max in flight={backend.max_in_flight}")
+
+
+if __name__ == "__main__":
+    main()
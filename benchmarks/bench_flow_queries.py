@@ -0,0 +1,88 @@
+"""
+Benchmark: flow queries on a large plant graph, indexed vs plain networkx traversal.
+
+Builds a synthetic plant (parallel process trains of equipment and valves with recycle
+loops), indexes it with FlowIndex, then times downstream/upstream traversal,
+reachability, shortest flow path and isolation queries, and re-indexing after one line
+changes. Run from the repository root:
+    python -m benchmarks.bench_flow_queries --nodes 10000
+"""
+import argparse
+import copy
+import time
+
+import networkx as nx
+import numpy as np
+
+from flow_queries import FlowIndex
+from process_graph import get_process_graph, line_subgraph
+
+
+def synthetic_plant(nodes, trains=20):
+    equipment, valves, lines = [], [], []
+    per_train = nodes // trains
+    for t in range(trains):
+        previous = None
+        for k in range(per_train):
+            if k % 3 == 1:
+                tag = f"V-{t}-{k}"
+                valves.append({"tag": tag, "type": "Check Valve" if k % 9 == 4 else "Gate Valve"})
+            else:
+                tag = f"E-{t}-{k}"
+                equipment.append({"tag": tag, "type": "Exchanger"})
+            if previous:
+                lines.append({"line_number_tag": f"L-{t}-{k}", "source_tag": previous, "destination_tag": tag})
+            if k % 30 == 29:
+                # Recycle back to the start of the section
+                lines.append({"line_number_tag": f"R-{t}-{k}", "source_tag": tag, "destination_tag": f"E-{t}-{k - 29}"})
+            previous = tag
+    return {"equipment": equipment, "valves": valves, "lines": lines}
+
+
+def timed(fn, *args, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark process flow queries.")
+    parser.add_argument("--nodes", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    data = synthetic_plant(args.nodes)
+    _, graph_ms = timed(get_process_graph, data)
+    index, build_ms = timed(FlowIndex, data)
+    flow = line_subgraph(get_process_graph(data))
+    print(f"{flow.number_of_nodes()} nodes, {flow.number_of_edges()} lines: process graph {graph_ms:.0f} ms, "
+          f"flow index {build_ms:.0f} ms")
+
+    rng = np.random.default_rng(0)
+    tags = list(flow.nodes)
+    sources = [tags[i] for i in rng.integers(0, len(tags), args.queries)]
+    targets = [tags[i] for i in rng.integers(0, len(tags), args.queries)]
+
+    def run(fn, pairs=False):
+        start = time.perf_counter()
+        for s, t in zip(sources, targets):
+            fn(s, t) if pairs else fn(s)
+        return (time.perf_counter() - start) * 1000 / args.queries
+
+    print(f"downstream     indexed {run(index.downstream):7.3f} ms   networkx {run(lambda s: nx.descendants(flow, s)):7.3f} ms")
+    print(f"upstream       indexed {run(index.upstream):7.3f} ms   networkx {run(lambda s: nx.ancestors(flow, s)):7.3f} ms")
+    print(f"reaches        indexed {run(index.reaches, True):7.3f} ms   networkx {run(lambda s, t: nx.has_path(flow, s, t), True):7.3f} ms")
+    print(f"flow path      indexed {run(index.flow_path, True):7.3f} ms")
+    print(f"isolation      indexed {run(index.isolation_valves):7.3f} ms")
+
+    changed = copy.deepcopy(data)
+    changed["lines"][0]["destination_tag"] = changed["lines"][5]["destination_tag"]
+    get_process_graph(changed)
+    rebuilt, update_ms = timed(index.update, changed)
+    _, full_ms = timed(FlowIndex, changed)
+    print(f"one line changed: update {update_ms:.0f} ms ({rebuilt} part rebuilt)   full rebuild {full_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark: bulk bounding-box validation and overlap detection (geometry.apply_geometry)
+vs per-item checks plus a naive all-pairs overlap scan.
+
+The synthetic sheet places symbols on a jittered grid with a few duplicates, overlaps
+and boxes outside the frame. The naive scan is O(n^2), so it runs on a subset and is
+extrapolated. Run from the repository root:
+    python -m benchmarks.bench_geometry --items 20000 --budget-ms 100
+"""
+import argparse
+import copy
+import itertools
+import sys
+import time
+
+import numpy as np
+
+from geometry import apply_geometry
+from normalizer import attach_flags
+
+CATEGORIES = ["equipment", "instrumentation", "valves", "annotations", "lines"]
+
+
+def synthetic_sheet(items, seed=0):
+    rng = np.random.default_rng(seed)
+    side = int(np.ceil(np.sqrt(items)))
+    pitch = 1000 / side
+    doc = {category: [] for category in CATEGORIES}
+    for k in range(items):
+        x = (k % side) * pitch + rng.uniform(0, 0.2 * pitch)
+        y = (k // side) * pitch + rng.uniform(0, 0.2 * pitch)
+        box = [int(x), int(y), int(x + 0.7 * pitch) + 1, int(y + 0.5 * pitch) + 1]
+        roll = rng.random()
+        if roll < 0.01:
+            box = [box[0] + 1, box[1], box[2] + 1, box[3]]  # near-duplicate of the previous symbol
+            doc["equipment"].append({"tag": f"D-{k}", "type": "Pump", "bounding_box": box})
+        if roll > 0.995:
+            box = [box[0], box[1], box[2] + 2000, box[3]]  # runs off the frame
+        doc[CATEGORIES[k % len(CATEGORIES)]].append({"tag": f"T-{k}", "type": "Symbol", "bounding_box": box})
+    return doc
+
+
+def naive_checks(doc):
+    """Per-item flags plus an all-pairs overlap scan, as a plain-Python baseline."""
+    items = [item for category, values in doc.items() if category != "lines" for item in values]
+    for item in items:
+        attach_flags(item)
+    pairs = 0
+    for a, b in itertools.combinations(items, 2):
+        ax1, ay1, ax2, ay2 = a["bounding_box"]
+        bx1, by1, bx2, by2 = b["bounding_box"]
+        if min(ax2, bx2) > max(ax1, bx1) and min(ay2, by2) > max(ay1, by1):
+            pairs += 1
+    return pairs
+
+
+def subset(doc, items):
+    per = max(1, items // len(doc))
+    return {category: values[:per] for category, values in doc.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk bounding-box checks.")
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--naive-items", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    doc = synthetic_sheet(args.items)
+    n = sum(len(v) for v in doc.values())
+    best = None
+    for _ in range(args.repeat):
+        trial = copy.deepcopy(doc)
+        start = time.perf_counter()
+        counts = apply_geometry(trial)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"apply_geometry on {n} boxes: {best * 1000:.1f} ms (budget {args.budget_ms:.0f} ms); flags {counts}")
+
+    small = subset(copy.deepcopy(doc), args.naive_items)
+    m = sum(len(v) for v in small.values())
+    start = time.perf_counter()
+    naive_checks(small)
+    naive = time.perf_counter() - start
+    print(f"naive per-item + all-pairs on {m} boxes: {naive * 1000:.1f} ms "
+          f"(~{naive * (n / m) ** 2:.1f} s extrapolated to {n})")
+    sys.exit(0 if best * 1000 <= args.budget_ms else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: cold import time of the pipeline modules used by the CLI and worker processes.
+
+Runs `python -X importtime` in a fresh interpreter, reports the total and the heaviest
+imports, and fails (exit code 1) if the total exceeds the budget or if Streamlit, the
+Vertex SDK or OpenCV were loaded. Run from the repository root:
+    python -m benchmarks.bench_import_time --budget-ms 250
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+MODULES = ["analyzer", "postprocessing", "normalizer"]
+# Must stay out of a plain import; they load on first use
+LAZY_MODULES = ["streamlit", "vertexai", "cv2"]
+
+
+def measure(modules, repeat=5):
+    """Returns (best total microseconds, per-module cumulative times, loaded lazy modules)."""
+    code = (
+        f"import {', '.join(modules)}, sys; "
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        timings = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                timings[name[1:].rstrip()] = int(cumulative)
+        total = sum(timings.get(m, 0) for m in modules)
+        if best is None or total < best[0]:
+            best = (total, timings, [m for m in proc.stdout.strip().split(",") if m])
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time of the pipeline modules.")
+    parser.add_argument("--budget-ms", type=float, default=250.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    total, timings, loaded = measure(MODULES, args.repeat)
+    print(f"import {', '.join(MODULES)}: {total / 1000:.1f} ms (budget {args.budget_ms:.0f} ms, best of {args.repeat})")
+    print("heaviest imports (cumulative):")
+    for name, us in sorted(timings.items(), key=lambda kv: kv[1], reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name.strip()}")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: lazily loaded modules were imported: {', '.join(loaded)}")
+        failed = True
+    if total / 1000 > args.budget_ms:
+        print("FAIL: over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
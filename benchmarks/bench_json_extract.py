@@ -0,0 +1,78 @@
+"""
+Benchmark: JSON extraction from model output, old non-greedy regex vs the balanced scanner.
+
+Runs over the malformed-output corpus in tests/fixtures/model_outputs plus large synthetic
+responses (complete and truncated). Run from the repository root:
+    python -m benchmarks.bench_json_extract --items 5000
+"""
+import argparse
+import json
+import os
+import re
+import time
+
+from json_stream import PARTIAL_KEY, extract_json_object
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures", "model_outputs")
+
+
+def legacy_extract(text):
+    """The previous extract_json_from_response, kept here for comparison."""
+    json_match = re.search(r'```json\s*(\{.*?\})\s*```|(\{.*?\})', text, re.DOTALL)
+    if json_match:
+        json_str = json_match.group(1) if json_match.group(1) else json_match.group(2)
+        try:
+            return json.loads(json_str)
+        except json.JSONDecodeError:
+            return None
+    return None
+
+
+def synthetic_response(items):
+    doc = {"metadata": {"drawing_title": "Synthetic {sheet}", "drawing_number": "PID-1", "revision": "A"}}
+    for category in ("equipment", "instrumentation", "valves", "lines", "annotations"):
+        doc[category] = [
+            {"tag": f"{category[:2].upper()}-{i}", "type": "Type", "label": f"{category} {i}",
+             "bounding_box": [i % 900, i % 800, i % 900 + 50, i % 800 + 40], "category_name": category}
+            for i in range(items // 5)
+        ]
+    return "```json\n" + json.dumps(doc) + "\n```"
+
+
+def _time(fn, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(text)
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def _describe(result):
+    if result is None:
+        return "no data"
+    items = sum(len(v) for v in result.values() if isinstance(v, list))
+    return f"{items} items" + (" (partial)" if result.get(PARTIAL_KEY) else "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON extraction strategies.")
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = []
+    for name in sorted(os.listdir(FIXTURES)):
+        with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+            cases.append((name, f.read()))
+    big = synthetic_response(args.items)
+    cases.append((f"synthetic_{args.items}_items", big))
+    cases.append((f"synthetic_{args.items}_items_truncated", big[: int(len(big) * 0.7)]))
+
+    print(f"{'case':40s} {'legacy ms':>10s} {'scanner ms':>11s}  legacy result / scanner result")
+    for name, text in cases:
+        legacy_ms, legacy = _time(legacy_extract, text, args.repeat)
+        new_ms, new = _time(extract_json_object, text, args.repeat)
+        print(f"{name:40s} {legacy_ms:10.2f} {new_ms:11.2f}  {_describe(legacy)} / {_describe(new)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark: knowledge graph HTML for a large plant, pyvis vs the large-graph modes.
+
+Builds a synthetic document (units of equipment chained by lines, instruments with
+control relationships) and times the hierarchical pyvis page, the large-graph page
+(server-side layout, vis-network loaded from a URL) and the per-unit summary. Run from the repository root:
+    python -m benchmarks.bench_knowledge_graph --nodes 5000
+"""
+import argparse
+import time
+
+import intelligence_builder
+from intelligence_builder import render_knowledge_graph
+
+
+def synthetic_document(nodes, per_unit=50):
+    equipment, instruments, lines, controls = [], [], [], []
+    for n in range(nodes // 2):
+        unit, k = 1 + n // per_unit, n % per_unit
+        tag = f"P-{unit}{k:02d}"
+        equipment.append({"tag": tag, "type": "Pump"})
+        instruments.append({"tag": f"FT-{unit}{k:02d}", "type": "Flow Transmitter"})
+        controls.append({"source_tag": f"FT-{unit}{k:02d}", "destination_tag": tag, "relationship_type": "signals"})
+        if k:
+            lines.append({"line_number_tag": f"L-{n}", "source_tag": f"P-{unit}{k - 1:02d}", "destination_tag": tag})
+        elif unit > 1:
+            lines.append({"line_number_tag": f"L-{n}", "source_tag": f"P-{unit - 1}00", "destination_tag": tag})
+    return {"equipment": equipment, "instrumentation": instruments, "lines": lines, "control_relationships": controls}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark knowledge graph rendering.")
+    parser.add_argument("--nodes", type=int, default=5000)
+    args = parser.parse_args()
+
+    # Keep the run free of side effects on ./static
+    intelligence_builder.VIS_JS_URL = "https://unpkg.com/vis-network/standalone/umd/vis-network.min.js"
+    data = synthetic_document(args.nodes)
+    render_knowledge_graph(data, large=True)  # builds and caches the process graph
+    for name, kwargs in (("pyvis (hierarchical)", {"large": False, "collapse": False}),
+                         ("large graph", {"large": True, "collapse": False}),
+                         ("per-unit summary", {"collapse": True})):
+        start = time.perf_counter()
+        html = render_knowledge_graph(data, **kwargs)
+        elapsed = time.perf_counter() - start
+        print(f"{name:22s} {elapsed * 1000:8.0f} ms   {len(html) / 1e6:6.2f} MB HTML")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark: process-flow plot layouts, spring vs layered, cold vs cached.
+
+Builds a synthetic flow graph (parallel trains of equipment with crossovers) and times
+the spring layout, the layered layout, a repeated (cached) layout and a full
+build_and_visualize_graph render before and after caching. Run from the repository root:
+    python -m benchmarks.bench_layout --nodes 2000
+"""
+import argparse
+import time
+
+import networkx as nx
+
+from graph_builder import build_and_visualize_graph
+from layout import compute_layout, layered_layout
+
+
+def synthetic_flow(nodes, train=20):
+    graph = nx.DiGraph()
+    for n in range(nodes):
+        if n % train:
+            graph.add_edge(n - 1, n)
+        if n >= train and n % 7 == 0:
+            graph.add_edge(n - train, n)
+        graph.add_node(n)
+    return graph
+
+
+def synthetic_document(nodes, train=20):
+    equipment = [{"tag": f"P-{n}", "type": "Pump"} for n in range(nodes)]
+    lines = [{"line_number_tag": f"L-{u}-{v}", "source_tag": f"P-{u}", "destination_tag": f"P-{v}"}
+             for u, v in synthetic_flow(nodes, train).edges()]
+    return {"equipment": equipment, "lines": lines}
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark process-flow layouts.")
+    parser.add_argument("--nodes", type=int, default=2000)
+    args = parser.parse_args()
+
+    graph = synthetic_flow(args.nodes)
+    small = synthetic_flow(min(args.nodes, 150))
+    _, spring_ms = timed(nx.spring_layout, small, k=0.9, iterations=50, seed=0)
+    _, layered_ms = timed(layered_layout, graph)
+    compute_layout(graph, method="layered")
+    _, cached_ms = timed(compute_layout, graph, method="layered")
+    print(f"spring layout, {len(small)} nodes: {spring_ms:8.1f} ms")
+    print(f"layered layout, {len(graph)} nodes: {layered_ms:7.1f} ms   cached: {cached_ms:.1f} ms")
+
+    data = synthetic_document(args.nodes)
+    _, first_ms = timed(build_and_visualize_graph, data)
+    _, repeat_ms = timed(build_and_visualize_graph, data)
+    print(f"render {args.nodes} nodes to PNG: first {first_ms:.0f} ms   repeat {repeat_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: incremental loop index vs rebuilding it from every sheet.
+
+Builds a synthetic plant (several areas, complete and incomplete loops), adds the
+sheets one by one to a LoopIndex checking issues after each, then compares the cost
+of adding one more sheet with rebuilding the index from all sheets. Run from the repository root:
+    python -m benchmarks.bench_loop_index --sheets 500
+"""
+import argparse
+import time
+
+import numpy as np
+
+from loop_index import LoopIndex
+
+
+def synthetic_plant(sheets, loops_per_sheet=12, seed=0):
+    rng = np.random.default_rng(seed)
+    plant = []
+    for s in range(sheets):
+        area = str(10 + s % 8)
+        instruments, valves = [], []
+        for k in range(loops_per_sheet):
+            loop = 100 + (s // 8) * loops_per_sheet + k
+            variable = "FTPL"[k % 4]
+            instruments.append({"tag": f"{area}-{variable}T-{loop}", "type": "Transmitter"})
+            if rng.random() < 0.8:
+                instruments.append({"tag": f"{area}-{variable}IC-{loop}", "type": "Controller"})
+            # Some loops are drawn without their final element
+            if rng.random() < 0.7:
+                valves.append({"tag": f"{area}-{variable}V-{loop}", "type": "Control Valve"})
+        plant.append({"instrumentation": instruments, "valves": valves, "control_relationships": []})
+    return plant
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the plant loop index.")
+    parser.add_argument("--sheets", type=int, default=500)
+    args = parser.parse_args()
+
+    plant = synthetic_plant(args.sheets + 1)
+    index = LoopIndex()
+    start = time.perf_counter()
+    for s, sheet in enumerate(plant[:-1]):
+        index.add_sheet(s, sheet)
+        index.issues()
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index.add_sheet(args.sheets, plant[-1])
+    incremental = index.issues()
+    incremental_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rebuilt = LoopIndex()
+    for s, sheet in enumerate(plant):
+        rebuilt.add_sheet(s, sheet)
+    full = rebuilt.issues()
+    rescan_s = time.perf_counter() - start
+
+    print(f"{args.sheets} sheets added one by one, issues checked after each: {build_s * 1000:.0f} ms total")
+    print(f"{len(index)} loops, {len(incremental)} issues")
+    print(f"one more sheet: incremental {incremental_s * 1000:.2f} ms   full rescan {rescan_s * 1000:.1f} ms   "
+          f"results {'identical' if incremental == full else 'DIFFER'}")
+
+
+if __name__ == "__main__":
+    main()
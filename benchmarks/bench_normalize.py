@@ -0,0 +1,90 @@
+"""
+Benchmark: fused copy-on-write normalization vs the previous chain
+(postprocess_pid_data, then normalize_all with a deep copy of the document and of every item).
+
+The fused pass is checked against the old chain with geometry checks, topology and link inference
+off, then timed with them on as well. Reports wall time and peak traced allocation per 10k items. Run from the repository root:
+    python -m benchmarks.bench_normalize --items 10000
+"""
+import argparse
+import contextlib
+import copy
+import io
+import time
+import tracemalloc
+
+from normalizer import (
+    PASS_THROUGH_CATEGORIES, STANDARDS_REFERENCED, attach_flags,
+    normalize_document, normalize_equipment, normalize_instrument, normalize_line, normalize_valve,
+)
+from postprocessing import postprocess_pid_data
+
+
+def legacy_chain(data):
+    """postprocess_pid_data followed by the previous deep-copying normalize_all."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = postprocess_pid_data(copy.deepcopy(data))
+    data = copy.deepcopy(data)
+    data["metadata"]["standards_referenced"] = list(STANDARDS_REFERENCED)
+    for key, fn in (("equipment", normalize_equipment), ("valves", normalize_valve),
+                    ("instrumentation", normalize_instrument), ("lines", normalize_line)):
+        data[key] = [attach_flags(fn(item)) for item in data[key]]
+    for key in PASS_THROUGH_CATEGORIES:
+        data[key] = [attach_flags(item) for item in data[key]]
+    return data
+
+
+def synthetic_document(items):
+    per = max(1, items // 5)
+    # Symbols laid out on a grid (no overlaps), like detections on a real sheet
+    side = max(1, int((5 * per) ** 0.5) + 1)
+    pitch = 1000 / side
+
+    def box(category_index, i):
+        k = category_index * per + i
+        x, y = (k % side) * pitch, (k // side) * pitch
+        return [round(x), round(y), round(x + 0.8 * pitch), round(y + 0.6 * pitch)]
+
+    return {
+        "metadata": {"drawing_title": "Synthetic", "drawing_number": "PID-1", "revision": "A"},
+        "equipment": [{"tag": f"p-{i}", "type": "Pump", "bounding_box": box(0, i)} for i in range(per)],
+        "instrumentation": [{"tag": f"FT-{100 + i % 900}", "type": "Flow Transmitter", "bounding_box": box(1, i)}
+                            for i in range(per)],
+        "lines": [{"line_number_tag": f"2\"-p-{i}", "source_tag": f"p-{i}", "destination_tag": f"p-{i + 1}",
+                   "line_type": "process", "bounding_box": box(2, i)} for i in range(per)],
+        "valves": [{"tag": f"hv-{i}", "type": "Gate Valve", "bounding_box": box(3, i)} for i in range(per)],
+        "annotations": [{"text": f"NOTE {i}", "bounding_box": box(4, i)} for i in range(per)],
+    }
+
+
+def measure(fn, doc, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(doc)
+    elapsed = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    fn(doc)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare normalization passes.")
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    doc = synthetic_document(args.items)
+    fused_only = lambda d: normalize_document(d, check_geometry=False, infer_topology=False, infer_links=False)
+    assert fused_only(doc) == legacy_chain(doc), "fused pass diverged from the legacy chain"
+    scale = 10000 / args.items
+    print(f"{'pipeline':22s} {'ms / 10k items':>15s} {'peak MiB / 10k':>15s}")
+    for name, fn in (("legacy chain", legacy_chain), ("normalize_document", fused_only),
+                     ("  + geometry and links", normalize_document)):
+        elapsed, peak = measure(fn, doc, args.repeat)
+        print(f"{name:22s} {elapsed * 1000 * scale:15.1f} {peak / 2**20 * scale:15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark: verbose (one object per detection) vs compact (columnar) model output.
+
+Encodes the fixture responses and a synthetic dense sheet both ways, compares output
+token counts, estimates generation time at a given decode rate, checks that the compact
+form decodes back to the verbose structure, and times a streamed run through the
+analyzer against the local backend. Run from the repository root:
+    python -m benchmarks.bench_output_modes --items 400 --tokens-per-second 80
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from analyzer import AnalyzerClient, COMPACT_PROMPT, MASTER_PROMPT
+from compact_format import count_tokens, expand_compact, to_compact
+from json_stream import PARTIAL_KEY, extract_json_object
+from model_backends import LocalBackend
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures", "model_outputs")
+
+
+def synthetic_document(items):
+    doc = {"metadata": {"drawing_title": "Synthetic", "drawing_number": "PID-1", "revision": "A"}}
+    per_category = max(1, items // 4)
+    doc["equipment"] = [
+        {"tag": f"P-{100 + i}", "type": "Centrifugal Pump", "description": None,
+         "bounding_box": [i % 900, i % 800, i % 900 + 60, i % 800 + 50],
+         "category_name": "equipment", "label": f"P-{100 + i}"}
+        for i in range(per_category)
+    ]
+    doc["instrumentation"] = [
+        {"tag": f"FT-{200 + i}", "type": "Flow Transmitter", "measured_variable": "Flow",
+         "loop_id": f"{200 + i}", "connected_to_tag": f"P-{100 + i}", "display_value": None,
+         "bounding_box": [i % 900, i % 700, i % 900 + 30, i % 700 + 30], "display_value_bounding_box": None,
+         "category_name": "instrumentation", "label": f"FT-{200 + i}"}
+        for i in range(per_category)
+    ]
+    doc["lines"] = [
+        {"line_number_tag": f"4\"-P-{1000 + i}-A1A", "source_tag": f"P-{100 + i}", "destination_tag": f"P-{101 + i}",
+         "line_type": "process", "bounding_box": [i % 900, i % 600, i % 900 + 200, i % 600 + 4],
+         "category_name": "lines", "label": f"4\"-P-{1000 + i}-A1A"}
+        for i in range(per_category)
+    ]
+    doc["valves"] = [
+        {"tag": f"HV-{300 + i}", "type": "Gate Valve", "installed_on_line_tag": f"4\"-P-{1000 + i}-A1A",
+         "bounding_box": [i % 900, i % 500, i % 900 + 20, i % 500 + 20],
+         "category_name": "valves", "label": f"HV-{300 + i}"}
+        for i in range(per_category)
+    ]
+    return doc
+
+
+def _strip_nulls(doc):
+    return {k: [{f: v for f, v in item.items() if v is not None} for item in items]
+            if isinstance(items, list) else items for k, items in doc.items()}
+
+
+def _load_cases(items):
+    cases = []
+    for name in sorted(os.listdir(FIXTURES)):
+        with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+            data = extract_json_object(f.read())
+        if data and not data.get(PARTIAL_KEY):
+            cases.append((name, data))
+    cases.append((f"synthetic_{items}_items", synthetic_document(items)))
+    return cases
+
+
+def _stream_seconds(text, output_mode, chunk_size):
+    backend = LocalBackend(text, chunk_size=chunk_size)
+    client = AnalyzerClient(backend=backend, output_mode=output_mode)
+    image = np.full((32, 32), 255, np.uint8)
+    start = time.perf_counter()
+    result = list(client.analyze_stream(image, use_cache=False))[-1][2]
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare verbose and compact model output formats.")
+    parser.add_argument("--items", type=int, default=400)
+    parser.add_argument("--tokens-per-second", type=float, default=80.0,
+                        help="Assumed model decode rate, used to estimate generation time")
+    parser.add_argument("--chunk-size", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"prompt tokens: verbose {count_tokens(MASTER_PROMPT)}, compact {count_tokens(COMPACT_PROMPT)}")
+    print(f"{'case':32s} {'verbose tok':>11s} {'compact tok':>11s} {'saved':>6s} "
+          f"{'est. verbose s':>14s} {'est. compact s':>14s}  decode")
+    for name, doc in _load_cases(args.items):
+        verbose = json.dumps(doc)
+        compact = json.dumps(to_compact(doc))
+        v_tok, c_tok = count_tokens(verbose), count_tokens(compact)
+        decoded = expand_compact(json.loads(compact))
+        ok = _strip_nulls(decoded) == _strip_nulls(doc)
+        print(f"{name:32s} {v_tok:11d} {c_tok:11d} {1 - c_tok / v_tok:6.0%} "
+              f"{v_tok / args.tokens_per_second:14.1f} {c_tok / args.tokens_per_second:14.1f}  "
+              f"{'ok' if ok else 'MISMATCH'}")
+
+    doc = synthetic_document(args.items)
+    v_s, v_result = _stream_seconds(json.dumps(doc), "verbose", args.chunk_size)
+    c_s, c_result = _stream_seconds(json.dumps(to_compact(doc)), "compact", args.chunk_size)
+    same = _strip_nulls(v_result) == _strip_nulls(c_result)
+    print(f"client-side streaming parse ({args.items} items): verbose {v_s * 1000:.1f} ms, "
+          f"compact {c_s * 1000:.1f} ms, results {'identical' if same else 'DIFFER'}")
+
+
+if __name__ == "__main__":
+    main()
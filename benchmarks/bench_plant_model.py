@@ -0,0 +1,88 @@
+"""
+Benchmark: building, revising, saving and loading a plant model of many sheets.
+
+Builds a synthetic unit where each sheet continues on the next one through an off-page
+connector and a line with an UNKNOWN end, adds the sheets one by one, then times
+revising one sheet against re-stitching the whole unit, and loading the saved model
+against rebuilding it from the per-sheet JSON outputs. Run from the repository root:
+    python -m benchmarks.bench_plant_model --sheets 1000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from plant_model import PlantModel
+
+
+def synthetic_sheet(s, sheets, items=20):
+    drawing, previous, following = f"D-{s:04d}", f"D-{(s - 1) % sheets:04d}", f"D-{(s + 1) % sheets:04d}"
+    equipment = [{"tag": f"E-{s}-{k}", "type": "Exchanger"} for k in range(items)]
+    lines = [{"line_number_tag": f"L-{s}-{k}", "source_tag": f"E-{s}-{k}", "destination_tag": f"E-{s}-{k + 1}"}
+             for k in range(items - 1)]
+    junctions = [
+        {"junction_id": "J-IN", "off_page": True, "page_ref": previous, "label": f"C{(s - 1) % sheets}", "bounding_box": [0, 0, 1, 1]},
+        {"junction_id": "J-OUT", "off_page": True, "page_ref": following, "label": f"C{s}", "bounding_box": [0, 0, 1, 1]},
+    ]
+    lines += [
+        {"line_number_tag": f"C-{s}", "source_tag": "J-IN", "destination_tag": f"E-{s}-0"},
+        {"line_number_tag": f"C-{s + 1}", "source_tag": f"E-{s}-{items - 1}", "destination_tag": "J-OUT"},
+        # A utility header drawn across sheets without connectors
+        {"line_number_tag": f"U-{s}", "source_tag": f"E-{s}-{items // 2}", "destination_tag": "UNKNOWN"},
+        {"line_number_tag": f"U-{(s - 1) % sheets}", "source_tag": "UNKNOWN", "destination_tag": f"E-{s}-{items // 2 + 1}"},
+    ]
+    return {"metadata": {"drawing_number": drawing}, "equipment": equipment, "junctions": junctions, "lines": lines}
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the plant model.")
+    parser.add_argument("--sheets", type=int, default=1000)
+    args = parser.parse_args()
+
+    sheets = [synthetic_sheet(s, args.sheets) for s in range(args.sheets)]
+    plant = PlantModel()
+
+    def build():
+        for s, sheet in enumerate(sheets):
+            plant.add_sheet(f"sheet-{s}", sheet)
+
+    _, build_ms = timed(build)
+    print(f"{args.sheets} sheets added one by one: {build_ms:.0f} ms   "
+          f"{plant.graph.number_of_nodes()} nodes, {plant.stitched_edges()} stitched edges")
+
+    revised = dict(sheets[10], lines=sheets[10]["lines"][:-1])
+    keys, revise_ms = timed(plant.add_sheet, "sheet-10", revised)
+    print(f"revise one sheet: {revise_ms:.2f} ms ({keys} keys re-stitched)   whole unit: {build_ms:.0f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "plant_model.json")
+        _, save_ms = timed(plant.save, path)
+        loaded, load_ms = timed(PlantModel.load, path)
+        size = os.path.getsize(path)
+        sheets[10] = revised
+        for s, sheet in enumerate(sheets):
+            with open(os.path.join(tmp, f"sheet-{s}.json"), "w", encoding="utf-8") as f:
+                json.dump(sheet, f, indent=2)
+
+        def rebuild():
+            model = PlantModel()
+            for s in range(args.sheets):
+                with open(os.path.join(tmp, f"sheet-{s}.json"), "r", encoding="utf-8") as f:
+                    model.add_sheet(f"sheet-{s}", json.load(f))
+            return model
+
+        rebuilt, rebuild_ms = timed(rebuild)
+    same = sorted(loaded.graph.edges(keys=True)) == sorted(plant.graph.edges(keys=True)) == sorted(rebuilt.graph.edges(keys=True))
+    print(f"save {save_ms:.0f} ms ({size / 1e6:.1f} MB)   load {load_ms:.0f} ms   "
+          f"rebuild from sheet outputs {rebuild_ms:.0f} ms   graphs {'identical' if same else 'DIFFER'}")
+
+
+if __name__ == "__main__":
+    main()
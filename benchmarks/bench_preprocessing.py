@@ -0,0 +1,64 @@
+"""
+Benchmark: tiled vs monolithic preprocessing on a synthetic large-format sheet.
+
+Run from the repository root:
+    python -m benchmarks.bench_preprocessing --width 10000 --height 7000 --workers 8
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from preprocessing import _preprocess_chain, preprocess_tiled, TILED_TOLERANCE, PREPROCESS_WORKERS
+
+
+def synthetic_sheet(width, height, seed=0):
+    """Draws a P&ID-like sheet: pipe runs, symbol boxes, text and scan noise."""
+    rng = np.random.default_rng(seed)
+    img = np.full((height, width), 235, np.uint8)
+    for _ in range(width * height // 400_000):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        if rng.random() < 0.5:
+            cv2.line(img, (x, y), (min(x + int(rng.integers(200, 2000)), width - 1), y), 20, 3)
+        else:
+            cv2.line(img, (x, y), (x, min(y + int(rng.integers(200, 2000)), height - 1)), 20, 3)
+    for _ in range(width * height // 1_000_000):
+        x, y = int(rng.integers(0, width - 200)), int(rng.integers(0, height - 200))
+        cv2.rectangle(img, (x, y), (x + 120, y + 80), 30, 2)
+        cv2.putText(img, f"P-{int(rng.integers(100, 999))}", (x + 10, y + 50),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, 25, 2)
+    # Uneven lighting and sensor noise like a real scan
+    gradient = np.linspace(0, 30, width, dtype=np.float32)[None, :]
+    noise = rng.normal(0, 12, (height, width)).astype(np.float32)
+    return np.clip(img.astype(np.float32) - gradient + noise, 0, 255).astype(np.uint8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare tiled and monolithic preprocessing.")
+    parser.add_argument("--width", type=int, default=10000)
+    parser.add_argument("--height", type=int, default=7000)
+    parser.add_argument("--workers", type=int, default=PREPROCESS_WORKERS)
+    parser.add_argument("--tile-size", type=int, default=None)
+    args = parser.parse_args()
+
+    img = synthetic_sheet(args.width, args.height)
+    print(f"Synthetic sheet: {args.width}x{args.height}")
+
+    start = time.perf_counter()
+    monolithic = _preprocess_chain(img)
+    mono_s = time.perf_counter() - start
+    print(f"monolithic: {mono_s:8.2f} s")
+
+    start = time.perf_counter()
+    tiled = preprocess_tiled(img, workers=args.workers, tile_size=args.tile_size)
+    tiled_s = time.perf_counter() - start
+    print(f"tiled ({args.workers} workers): {tiled_s:8.2f} s  speedup x{mono_s / tiled_s:.2f}")
+
+    mismatch = np.count_nonzero(monolithic != tiled) / monolithic.size
+    status = "OK" if mismatch <= TILED_TOLERANCE else "OUT OF TOLERANCE"
+    print(f"differing pixels: {mismatch:.6%} (tolerance {TILED_TOLERANCE:.3%}) {status}")
+
+
+if __name__ == "__main__":
+    main()
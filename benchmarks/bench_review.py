@@ -0,0 +1,95 @@
+"""
+Benchmark: review engine throughput per 10k items.
+
+Normalizes a synthetic document (some detections get a low confidence, a review flag
+or a missing tag), then times generate_review_queue against one fused per-item loop
+doing the same checks (a lower bound: no shared index, no pluggable rules), and
+checks both report the same findings. Run from the repository root:
+    python -m benchmarks.bench_review --items 10000
+"""
+import argparse
+import time
+from collections import Counter
+
+from benchmarks.bench_normalize import synthetic_document
+from normalizer import normalize_document
+from process_graph import NODE_CATEGORIES, normalize_tag
+from review_engine import EDGE_CATEGORIES, FLAG_ISSUES, MIN_CONFIDENCE, generate_review_queue
+from tag_grammar import parse_equipment, parse_instrument
+from postprocessing import TAG_KEYS
+
+
+def review_document(items, seed_every=7):
+    data = synthetic_document(items)
+    for category in ("equipment", "instrumentation", "valves"):
+        for i, item in enumerate(data[category]):
+            if i % seed_every == 0:
+                item["confidence"] = 0.6
+            if i % (seed_every * 3) == 1:
+                item["flag_for_review"] = True
+            if i % (seed_every * 5) == 2:
+                item["tag"] = "Unknown"
+    return normalize_document(data, infer_topology=False, infer_links=False)
+
+
+def per_item_review(data):
+    """Same checks, one item at a time."""
+    first, degree, found = {}, Counter(), []
+    for category in NODE_CATEGORIES:
+        for i, item in enumerate(data.get(category) or []):
+            tag = normalize_tag(item.get(TAG_KEYS.get(category, "tag")))
+            if tag is not None:
+                first.setdefault(tag, (category, i))
+    for category, _ in EDGE_CATEGORIES:
+        for item in data.get(category) or []:
+            ends = (normalize_tag(item.get("source_tag")), normalize_tag(item.get("destination_tag")))
+            if all(end in first for end in ends):
+                degree.update(ends)
+    for category, items in data.items():
+        if category == "metadata" or not isinstance(items, list):
+            continue
+        for i, item in enumerate(items):
+            tag = normalize_tag(item.get(TAG_KEYS.get(category, "tag"))) if category in NODE_CATEGORIES else None
+            if tag and first[tag] == (category, i) and not degree[tag] and not item.get("connected_lines") \
+                    and not normalize_tag(item.get("connected_to_tag")) and not normalize_tag(item.get("installed_on_line_tag")):
+                found.append("Orphan Node")
+            if item.get("flag_for_review") is True:
+                found.append("AI Flagged")
+            if isinstance(item.get("confidence"), (int, float)) and item["confidence"] < MIN_CONFIDENCE:
+                found.append("Low Confidence")
+            if tag and category == "instrumentation" and not parse_instrument(tag):
+                found.append("Invalid Tag Format")
+            if tag and category == "equipment" and not parse_equipment(tag):
+                found.append("Invalid Tag Format")
+            found += [FLAG_ISSUES[f][0] for f in item.get("flags") or [] if f in FLAG_ISSUES]
+    return Counter(found)
+
+
+def timed(fn, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the review engine.")
+    parser.add_argument("--items", type=int, default=10000)
+    args = parser.parse_args()
+
+    data = review_document(args.items)
+    items = sum(len(v) for k, v in data.items() if isinstance(v, list))
+    queue, engine_s = timed(generate_review_queue, data)
+    baseline, loop_s = timed(per_item_review, data)
+    engine = Counter(f["issue_type"] for f in queue["warnings"] + queue["errors"])
+    print(f"{items} items, {sum(engine.values())} findings")
+    print(f"rule engine   {engine_s * 1000:7.1f} ms   {items / engine_s / 1000:6.0f}k items/s")
+    print(f"per-item loop {loop_s * 1000:7.1f} ms   {items / loop_s / 1000:6.0f}k items/s   "
+          f"findings {'identical' if engine == baseline else 'DIFFER'}")
+
+
+if __name__ == "__main__":
+    main()
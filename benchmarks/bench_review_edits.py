@@ -0,0 +1,84 @@
+"""
+Benchmark: review loop latency for single-item edits.
+
+Builds a ReviewSession over a synthetic reviewed document, applies a series of edits
+(tag fixes, confidence changes, re-routed lines), and times each apply_edit against
+re-running the whole chain a reviewer's edit used to trigger: normalize_document,
+validate_document and generate_review_queue. Checks that the session's queue matches a
+full review of the edited document. Run from the repository root:
+    python -m benchmarks.bench_review_edits --items 10000 --edits 200
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+from collections import Counter
+
+from benchmarks.bench_review import review_document
+from normalizer import normalize_document
+from review_engine import ReviewSession, generate_review_queue
+from schema_validator import validate_document
+
+
+def edits(data, count, seed=0):
+    """(category, position, changes) edits a reviewer might make."""
+    rnd = random.Random(seed)
+    tags = [item["tag"] for item in data["equipment"]]
+    for _ in range(count):
+        kind = rnd.randrange(3)
+        if kind == 0:
+            position = rnd.randrange(len(data["instrumentation"]))
+            yield "instrumentation", position, {"tag": f"PT-{9000 + position}"}
+        elif kind == 1:
+            position = rnd.randrange(len(data["equipment"]))
+            yield "equipment", position, {"confidence": 0.99}
+        else:
+            position = rnd.randrange(len(data["lines"]))
+            yield "lines", position, {"destination_tag": rnd.choice(tags)}
+
+
+def full_review(data):
+    with contextlib.redirect_stdout(io.StringIO()):
+        kept, quarantined = validate_document(normalize_document(data, infer_topology=False, infer_links=False))
+        return generate_review_queue(kept, quarantined)
+
+
+def summary(queue):
+    return Counter((f["id"], f["issue_type"]) for f in queue["errors"] + queue["warnings"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark incremental review after edits.")
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--edits", type=int, default=200)
+    args = parser.parse_args()
+
+    data = review_document(args.items)
+    items = sum(len(v) for k, v in data.items() if isinstance(v, list))
+    start = time.perf_counter()
+    session = ReviewSession(data)
+    setup_s = time.perf_counter() - start
+
+    times, rechecked = [], 0
+    for category, position, changes in edits(data, args.edits):
+        start = time.perf_counter()
+        delta = session.apply_edit(category, position, changes)
+        times.append(time.perf_counter() - start)
+        rechecked += delta["rechecked"]
+    start = time.perf_counter()
+    full = full_review(session.data)
+    full_s = time.perf_counter() - start
+
+    times.sort()
+    with contextlib.redirect_stdout(io.StringIO()):
+        same = summary(session.queue()) == summary(generate_review_queue(session.data))
+    print(f"{items} items, {args.edits} edits, {rechecked / args.edits:.1f} rows re-checked per edit")
+    print(f"session setup         {setup_s * 1000:8.1f} ms")
+    print(f"apply_edit median     {times[len(times) // 2] * 1000:8.3f} ms   p95 {times[int(len(times) * 0.95)] * 1000:.3f} ms")
+    print(f"full re-review        {full_s * 1000:8.1f} ms   "
+          f"queue {'identical' if same else 'DIFFERS'} to a full review")
+
+
+if __name__ == "__main__":
+    main()
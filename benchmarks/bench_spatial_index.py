@@ -0,0 +1,83 @@
+"""
+Benchmark: proximity association through the grid index vs a naive all-pairs scan.
+
+Builds a synthetic sheet (process lines in rows, valves on them, instruments and
+annotations nearby), then fills the missing links with spatial_index.infer_associations
+and with a scan that measures every source box against every target box. Both must
+agree. Run from the repository root:
+    python -m benchmarks.bench_spatial_index --items 10000
+"""
+import argparse
+import copy
+import time
+
+import numpy as np
+
+from spatial_index import ASSOCIATION_RULES, MISSING_VALUES, box_distances, infer_associations
+from postprocessing import TAG_KEYS
+
+
+def synthetic_sheet(items, seed=0):
+    rng = np.random.default_rng(seed)
+    per = max(1, items // 5)
+    rows = max(1, int(np.sqrt(per)))
+    doc = {"lines": [], "valves": [], "instrumentation": [], "equipment": [], "annotations": []}
+    for i in range(per):
+        y = (i % rows) * (1000 / rows)
+        x = (i // rows) * (1000 / (per / rows + 1))
+        doc["lines"].append({"line_number_tag": f"L-{i}", "bounding_box": [int(x), int(y), int(x + 60), int(y + 3)]})
+        doc["valves"].append({"tag": f"V-{i}", "bounding_box": [int(x + 20), int(y - 4), int(x + 28), int(y + 7)]})
+        ox, oy = rng.uniform(-30, 30, 2)
+        doc["instrumentation"].append({"tag": f"PT-{i}", "bounding_box": [int(x + 30 + ox), int(y + 10 + oy),
+                                                                           int(x + 38 + ox), int(y + 18 + oy)]})
+        doc["equipment"].append({"tag": f"E-{i}", "bounding_box": [int(x), int(y + 15), int(x + 20), int(y + 30)]})
+        doc["annotations"].append({"text": f"N{i}", "bounding_box": [int(x + 22), int(y + 18), int(x + 30), int(y + 22)]})
+    return doc
+
+
+def naive_associations(data):
+    """Same rules as infer_associations, comparing every source with every target (ties go to document order)."""
+    for category, field, targets, max_distance in ASSOCIATION_RULES:
+        candidates = [(item[TAG_KEYS.get(t, "tag")], item["bounding_box"])
+                      for t in data if t in targets for item in data[t]
+                      if item.get(TAG_KEYS.get(t, "tag")) not in MISSING_VALUES]
+        if not candidates:
+            continue
+        tags = [tag for tag, _ in candidates]
+        boxes = np.array([box for _, box in candidates], dtype=np.float64)
+        for item in data.get(category, []):
+            if item.get(field) not in MISSING_VALUES:
+                continue
+            d = box_distances(np.array(item["bounding_box"], dtype=np.float64), boxes)
+            best = int(np.argmin(d))
+            if d[best] <= max_distance:
+                item[field] = tags[best]
+
+
+def _links(data):
+    return [(c, i, item.get(f)) for c, f, _, _ in ASSOCIATION_RULES for i, item in enumerate(data.get(c, []))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark proximity association.")
+    parser.add_argument("--items", type=int, default=10000)
+    args = parser.parse_args()
+
+    doc = synthetic_sheet(args.items)
+    indexed, naive = copy.deepcopy(doc), copy.deepcopy(doc)
+
+    start = time.perf_counter()
+    counts = infer_associations(indexed)
+    grid_s = time.perf_counter() - start
+    start = time.perf_counter()
+    naive_associations(naive)
+    naive_s = time.perf_counter() - start
+
+    n = sum(len(v) for v in doc.values())
+    print(f"{n} detections, links filled: {counts}")
+    print(f"grid index: {grid_s * 1000:.1f} ms   naive all-pairs: {naive_s * 1000:.1f} ms   "
+          f"speed-up {naive_s / grid_s:.1f}x   results {'identical' if _links(indexed) == _links(naive) else 'DIFFER'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark: tag parsing through the shared grammar (memoized scalar and column-batched)
+vs uncached per-call regex matching, as the stages did before.
+
+The synthetic tag list repeats tags the way one sheet passes them through
+post-processing, normalization and review. Run from the repository root:
+    python -m benchmarks.bench_tag_grammar --tags 50000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from tag_grammar import GRAMMARS, _parse_cached, parse_column, parse_instrument
+
+FUNCTIONS = ["FT", "FIC", "TT", "TIC", "PT", "PIC", "LT", "LIC", "PSV", "FV"]
+
+
+def synthetic_tags(n, seed=0):
+    rng = np.random.default_rng(seed)
+    distinct = [f"{FUNCTIONS[i % len(FUNCTIONS)]}-{100 + i // len(FUNCTIONS)}" for i in range(max(1, n // 4))]
+    # Every tag is seen about four times, as when three stages parse the same sheet
+    return [distinct[k] for k in rng.integers(0, len(distinct), n)] + ["not a tag"] * (n // 100)
+
+
+def uncached(tags):
+    """Match and unpack every occurrence, like the former per-stage parsers."""
+    pattern = GRAMMARS["instrument"]
+    parsed = []
+    for t in tags:
+        m = pattern.fullmatch(t.strip().upper())
+        parsed.append(m.groupdict() if m else None)
+    return [p is not None for p in parsed]
+
+
+def timed(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tag parsing.")
+    parser.add_argument("--tags", type=int, default=50000)
+    args = parser.parse_args()
+
+    tags = synthetic_tags(args.tags)
+    base_s, base = timed(lambda: uncached(tags))
+    _parse_cached.cache_clear()
+    cached_s, cached = timed(lambda: [parse_instrument(t) is not None for t in tags])
+    batch_s, batch = timed(lambda: parse_column(tags, "instrument")["function"].notna().tolist())
+    same = base == cached == batch
+    print(f"{len(tags)} tags: per-call regex {base_s * 1000:.1f} ms   memoized {cached_s * 1000:.1f} ms   "
+          f"column batch {batch_s * 1000:.1f} ms   results {'identical' if same else 'DIFFER'}")
+
+
+if __name__ == "__main__":
+    main()
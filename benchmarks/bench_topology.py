@@ -0,0 +1,116 @@
+"""
+Benchmark: topology.build_topology vs a naive reconstruction that measures every line
+end against every symbol box and every other line end (O(n^2)).
+
+The synthetic sheet draws rows of pump -> valve -> vessel runs joined by polylines,
+plus branch lines that meet at bare points. Both methods must fill the same tags. Run
+from the repository root:
+    python -m benchmarks.bench_topology --segments 5000 --budget-ms 500
+"""
+import argparse
+import copy
+import sys
+import time
+
+import numpy as np
+
+from spatial_index import box_distances
+from topology import NODE_CATEGORIES, SNAP_TOLERANCE, UnionFind, build_topology, line_endpoints
+
+
+def synthetic_sheet(segments):
+    runs = max(1, segments // 4)
+    rows = max(1, int(np.sqrt(runs)))
+    per_row = -(-runs // rows)
+    pitch_x, pitch_y = 1000 / per_row, 1000 / rows
+    doc = {"equipment": [], "valves": [], "junctions": [], "lines": []}
+    for r in range(runs):
+        x, y = (r % per_row) * pitch_x, (r // per_row) * pitch_y
+        u = pitch_x / 10
+        doc["equipment"].append({"tag": f"P-{r}", "bounding_box": [x, y, x + u, y + u]})
+        doc["valves"].append({"tag": f"V-{r}", "bounding_box": [x + 4 * u, y, x + 5 * u, y + u]})
+        doc["equipment"].append({"tag": f"T-{r}", "bounding_box": [x + 8 * u, y, x + 9 * u, y + u]})
+        mid = y + u / 2
+        doc["lines"].append({"line_number_tag": f"L-{r}-a", "polyline": [[x + u, mid], [x + 4 * u, mid]]})
+        doc["lines"].append({"line_number_tag": f"L-{r}-b", "polyline": [[x + 5 * u, mid], [x + 8 * u, mid]]})
+        # Branch leaving the pump run's line at a bare point below it
+        doc["lines"].append({"line_number_tag": f"L-{r}-c",
+                             "polyline": [[x + 2 * u, y + 3 * u], [x + 2 * u, y + 6 * u]]})
+        doc["lines"].append({"line_number_tag": f"L-{r}-d",
+                             "polyline": [[x + 2 * u, y + 6 * u], [x + 6 * u, y + 6 * u]]})
+    for line in doc["lines"]:
+        line["source_tag"] = line["destination_tag"] = "UNKNOWN"
+    return doc
+
+
+def naive_topology(data, tolerance=SNAP_TOLERANCE):
+    """Same rules (without junction connected_lines), scanning all boxes and ends per end."""
+    nodes = [(item.get("tag") or item.get("junction_id"), item["bounding_box"])
+             for category in NODE_CATEGORIES for item in data.get(category, [])]
+    boxes = np.array([box for _, box in nodes], dtype=np.float64).reshape(-1, 4)
+    ends = [p for line in data["lines"] for p in line_endpoints(line)]
+    uf = UnionFind(len(ends) + len(nodes))
+    free = []
+    for e, point in enumerate(ends):
+        d = box_distances(np.array(point * 2), boxes)
+        best = int(np.argmin(d)) if len(d) else -1
+        if best >= 0 and d[best] <= tolerance:
+            uf.union(e, len(ends) + best)
+        else:
+            free.append(e)
+    for a in free:
+        for b in free:
+            if a < b and np.hypot(ends[a][0] - ends[b][0], ends[a][1] - ends[b][1]) <= tolerance:
+                uf.union(a, b)
+    labels = {uf.find(len(ends) + k): tag for k, (tag, _) in reversed(list(enumerate(nodes)))}
+    sizes = {}
+    for e in range(len(ends)):
+        sizes[uf.find(e)] = sizes.get(uf.find(e), 0) + 1
+    result = []
+    for i in range(len(data["lines"])):
+        a, b = uf.find(2 * i), uf.find(2 * i + 1)
+        result.append(tuple("node" if r in labels and labels[r] else ("junction" if sizes[r] > 1 else None)
+                            for r in (a, b)))
+    return result
+
+
+def _shape(data):
+    """Per line, whether each end went to a symbol, an inferred junction or nowhere."""
+    inferred = {j["junction_id"] for j in data.get("junctions", []) if "topology_inferred" in (j.get("flags") or [])}
+    return [tuple(None if line[field] == "UNKNOWN" else ("junction" if line[field] in inferred else "node")
+                  for field in ("source_tag", "destination_tag")) for line in data["lines"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark line topology reconstruction.")
+    parser.add_argument("--segments", type=int, default=5000)
+    parser.add_argument("--naive-segments", type=int, default=1200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, default=500.0)
+    args = parser.parse_args()
+
+    doc = synthetic_sheet(args.segments)
+    best = None
+    for _ in range(args.repeat):
+        trial = copy.deepcopy(doc)
+        start = time.perf_counter()
+        counts = build_topology(trial)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    n = len(doc["lines"])
+    print(f"build_topology on {n} segments: {best * 1000:.1f} ms (budget {args.budget_ms:.0f} ms); filled {counts}")
+
+    small = synthetic_sheet(args.naive_segments)
+    m = len(small["lines"])
+    start = time.perf_counter()
+    naive = naive_topology(small)
+    naive_s = time.perf_counter() - start
+    build_topology(small)
+    same = naive == _shape(small)
+    print(f"naive all-pairs on {m} segments: {naive_s * 1000:.1f} ms "
+          f"(~{naive_s * (n / m) ** 2:.1f} s extrapolated to {n}); results {'identical' if same else 'DIFFER'}")
+    sys.exit(0 if same and best * 1000 <= args.budget_ms else 1)
+
+
+if __name__ == "__main__":
+    main()
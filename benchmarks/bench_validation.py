@@ -0,0 +1,82 @@
+"""
+Benchmark: schema validation throughput on large documents.
+
+Compares jsonschema.validate (schema check and validator construction on every call,
+stops at the first error) with the precompiled validators in schema_validator, both
+for the whole document and per item with full error collection. About 1% of the items
+are made invalid so the per-item mode has something to quarantine. Run from the
+repository root:
+    python -m benchmarks.bench_validation --items 10000
+"""
+import argparse
+import time
+
+from jsonschema import ValidationError, validate
+
+from benchmarks.bench_normalize import synthetic_document
+from normalizer import normalize_document
+from schema import PID_SCHEMA_V2
+from schema_validator import validate_document
+
+
+def broken_copy(data, every=100):
+    """Drops the required `type` from every `every`-th equipment item and instrument."""
+    out = dict(data)
+    for category in ("equipment", "instrumentation"):
+        out[category] = [{k: v for k, v in item.items() if k != "type"} if i % every == 0 else item
+                         for i, item in enumerate(data[category])]
+    return out
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def per_call_validate(data):
+    try:
+        validate(instance=data, schema=PID_SCHEMA_V2)
+        return "valid"
+    except ValidationError:
+        return "rejected"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark schema validation.")
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    clean = normalize_document(synthetic_document(args.items))
+    broken = broken_copy(clean)
+    n = sum(len(v) for v in clean.values() if isinstance(v, list))
+    print(f"{n} items per document")
+    print(f"{'mode':38s} {'clean ms':>9s} {'broken ms':>10s}  outcome on broken")
+    rows = (
+        ("jsonschema.validate (per call)", per_call_validate, lambda r: r),
+        ("precompiled, whole document", lambda d: _first_error(d), lambda r: r),
+        ("precompiled, per item + quarantine", validate_document,
+         lambda r: f"kept {sum(len(v) for v in r[0].values() if isinstance(v, list))}, quarantined {len(r[1])}"),
+    )
+    for name, fn, outcome in rows:
+        clean_s, _ = timed(lambda: fn(clean), args.repeat)
+        broken_s, result = timed(lambda: fn(broken), args.repeat)
+        print(f"{name:38s} {clean_s * 1000:9.1f} {broken_s * 1000:10.1f}  {outcome(result)}")
+    print(f"per-item throughput: {n / clean_s:,.0f} items/s")
+
+
+def _first_error(data):
+    try:
+        validate_document(data, per_item=False)
+        return "valid"
+    except ValidationError:
+        return "rejected"
+
+
+if __name__ == "__main__":
+    main()
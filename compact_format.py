@@ -0,0 +1,109 @@
+"""
+Compact columnar output protocol.
+
+Instead of one JSON object per detection (repeating every key), the model returns each
+category as a header row of field names followed by value rows:
+
+    "equipment": {"fields": ["tag", "type", "bounding_box"],
+                  "rows": [["P-101", "Pump", [120, 40, 180, 90]], ...]}
+
+`expand_compact` turns this back into exactly the per-object structure that
+postprocess_pid_data expects; `category_name` and `label` are derived, not generated.
+"""
+import re
+
+# Field order the compact prompt asks for, per category
+CATEGORY_FIELDS = {
+    "equipment": ["tag", "type", "description", "bounding_box"],
+    "instrumentation": ["tag", "type", "measured_variable", "loop_id", "connected_to_tag",
+                        "display_value", "bounding_box", "display_value_bounding_box"],
+    "lines": ["line_number_tag", "source_tag", "destination_tag", "line_type", "bounding_box"],
+    "valves": ["tag", "type", "installed_on_line_tag", "bounding_box"],
+    "junctions": ["junction_id", "connected_lines", "bounding_box"],
+    "control_relationships": ["source_tag", "destination_tag", "relationship_type"],
+    "annotations": ["text", "associated_tag", "bounding_box"],
+    "safety_devices": ["tag", "type", "location", "bounding_box"],
+    "unrecognized_symbols": ["description", "bounding_box", "review_reason"],
+}
+# Optional trailing columns shared by every category
+REVIEW_FIELDS = ["flag_for_review", "review_reason"]
+
+# Label priority from the master prompt
+LABEL_PRIORITY = ["tag", "line_number_tag", "junction_id", "text", "type"]
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def derive_label(category, item):
+    """Applies the master prompt's label priority to an expanded item."""
+    if category == "control_relationships" and item.get("source_tag") and item.get("destination_tag"):
+        return f"{item['source_tag']} -> {item['destination_tag']}"
+    for key in LABEL_PRIORITY:
+        if item.get(key):
+            return str(item[key])
+    return category
+
+
+def is_compact_category(value):
+    return isinstance(value, dict) and "fields" in value and "rows" in value
+
+
+def expand_compact_category(category, value):
+    """
+    Expands one {"fields": [...], "rows": [[...], ...]} block into a list of item dicts.
+    Values that are already a list of objects are returned unchanged.
+    """
+    if not is_compact_category(value):
+        return value
+    fields = [str(f) for f in value.get("fields") or []]
+    items = []
+    for row in value.get("rows") or []:
+        if not isinstance(row, list):
+            continue
+        item = dict(zip(fields, row))
+        for field in fields[len(row):]:
+            item[field] = None
+        if category == "unrecognized_symbols":
+            item["flag_for_review"] = True
+        item["category_name"] = category
+        if not item.get("label"):
+            item["label"] = derive_label(category, item)
+        items.append(item)
+    return items
+
+
+def expand_compact(data):
+    """Expands every compact category of a document in place and returns it."""
+    if not isinstance(data, dict):
+        return data
+    for category, value in data.items():
+        if category != "metadata" and is_compact_category(value):
+            data[category] = expand_compact_category(category, value)
+    return data
+
+
+def to_compact(data):
+    """
+    Encodes a verbose document in the compact protocol (used by the comparison harness
+    and tests). `category_name` is always dropped; `label` is kept only where it differs
+    from the derived label.
+    """
+    out = {}
+    for category, items in data.items():
+        if category == "metadata" or not isinstance(items, list):
+            out[category] = items
+            continue
+        keep_label = any(item.get("label") != derive_label(category, item) for item in items)
+        fields = []
+        for item in items:
+            for key in item:
+                if key == "category_name" or (key == "label" and not keep_label) or key in fields:
+                    continue
+                fields.append(key)
+        out[category] = {"fields": fields, "rows": [[item.get(f) for f in fields] for item in items]}
+    return out
+
+
+def count_tokens(text):
+    """Rough, tokenizer-independent token count (words and punctuation)."""
+    return len(_TOKEN_RE.findall(text))
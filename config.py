@@ -0,0 +1,72 @@
+"""
+Model backend configuration, resolved once on first use.
+
+Nothing here runs at import time. Streamlit secrets are only read when the app is
+running (streamlit already imported) or a secrets.toml exists, and service account
+keys stay in memory; they are handed to vertexai.init instead of being written to
+temporary credential files.
+"""
+import json
+import os
+import sys
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+SECRETS_FILES = [
+    os.path.join(".streamlit", "secrets.toml"),
+    os.path.join(os.path.expanduser("~"), ".streamlit", "secrets.toml"),
+]
+
+
+@dataclass(frozen=True)
+class Settings:
+    project_id: str
+    location: str
+    model_id: str
+    credentials_info: Optional[dict] = None  # service account key, if one was configured
+
+
+_settings = None
+_settings_lock = threading.Lock()
+
+
+def _gcp_secrets():
+    """The [gcp] table from Streamlit secrets, or None without importing Streamlit needlessly."""
+    if "streamlit" not in sys.modules and not any(os.path.exists(p) for p in SECRETS_FILES):
+        return None
+    import streamlit as st
+    try:
+        return st.secrets["gcp"]
+    except (KeyError, FileNotFoundError):
+        return None
+
+
+def load_settings():
+    """Reads settings from Streamlit secrets first, then environment variables."""
+    secrets = _gcp_secrets() or {}
+    # Each key falls back on its own, so a partial [gcp] table still resolves
+    project_id = secrets.get("project_id") or os.getenv("GOOGLE_CLOUD_PROJECT_ID", "p-id-digitizer-project")
+    location = secrets.get("location") or os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
+    model_id = secrets.get("model_id") or os.getenv("GOOGLE_CLOUD_MODEL_ID", "gemini-2.5-pro")
+    credentials_info = None
+    if "service_account_key" in secrets:
+        credentials_info = dict(secrets["service_account_key"])
+
+    credentials_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
+    if credentials_json:
+        try:
+            credentials_info = json.loads(credentials_json)
+        except json.JSONDecodeError:
+            print("Warning: Invalid JSON in GOOGLE_APPLICATION_CREDENTIALS_JSON")
+    return Settings(project_id, location, model_id, credentials_info)
+
+
+def get_settings(refresh=False):
+    """Returns the process-wide settings, loading them on first use."""
+    global _settings
+    if _settings is None or refresh:
+        with _settings_lock:
+            if _settings is None or refresh:
+                _settings = load_settings()
+    return _settings
@@ -0,0 +1,89 @@
+"""
+Cheap deltas between two analyses of the same drawing.
+
+Items are matched by their tag (line_number_tag for lines). With deterministic IDs for
+synthesized tags, a re-run of an unchanged drawing matches item for item, so stages
+downstream (exports, DB upserts, review) only need to touch what actually changed.
+"""
+import hashlib
+import json
+
+from postprocessing import TAG_KEYS, stable_digest
+
+
+def item_fingerprint(item):
+    """Digest of an item's full content, independent of key order."""
+    payload = json.dumps(item, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def item_key(category, item):
+    """Identity of an item across runs: its tag, or a content-derived ID if it has none."""
+    tag = item.get(TAG_KEYS.get(category, "tag"))
+    if isinstance(tag, str) and tag.strip():
+        return tag.strip().upper()
+    return stable_digest(category, item)[:12]
+
+
+def index_items(category, items):
+    """Maps item keys to fingerprints; repeated keys get an occurrence suffix (#2, #3, ...)."""
+    index = {}
+    for item in items or []:
+        if not isinstance(item, dict):
+            continue
+        key = base = item_key(category, item)
+        n = 1
+        while key in index:
+            n += 1
+            key = f"{base}#{n}"
+        index[key] = item_fingerprint(item)
+    return index
+
+
+def diff_documents(old, new):
+    """
+    Per-category delta between two documents:
+    {category: {"added": [...], "removed": [...], "changed": [...], "unchanged": n}}.
+    Categories without any difference are omitted, so an empty dict means "nothing changed".
+    """
+    old = old or {}
+    new = new or {}
+    delta = {}
+    categories = [k for k in new if k != "metadata"] + [k for k in old if k not in new and k != "metadata"]
+    for category in categories:
+        old_items, new_items = old.get(category), new.get(category)
+        if not isinstance(old_items, list) and not isinstance(new_items, list):
+            continue
+        before = index_items(category, old_items if isinstance(old_items, list) else [])
+        after = index_items(category, new_items if isinstance(new_items, list) else [])
+        added = [k for k in after if k not in before]
+        removed = [k for k in before if k not in after]
+        changed = [k for k in after if k in before and before[k] != after[k]]
+        if added or removed or changed:
+            delta[category] = {
+                "added": added, "removed": removed, "changed": changed,
+                "unchanged": len(after) - len(added) - len(changed),
+            }
+    if old.get("metadata") != new.get("metadata"):
+        delta["metadata"] = {"added": [], "removed": [], "changed": ["metadata"], "unchanged": 0}
+    return delta
+
+
+def _items(data, category):
+    items = data.get(category)
+    return [i for i in items if isinstance(i, dict)] if isinstance(items, list) else []
+
+
+def changed_categories(old, new):
+    """Categories whose items differ in content or order (i.e. whose exports would change)."""
+    old = old or {}
+    new = new or {}
+    changed = []
+    for category in dict.fromkeys(list(new) + list(old)):
+        if category == "metadata":
+            continue
+        before = [item_fingerprint(i) for i in _items(old, category)]
+        after = [item_fingerprint(i) for i in _items(new, category)]
+        if before != after:
+            changed.append(category)
+    return changed
@@ -1,6 +1,71 @@
 import xml.etree.ElementTree as ET
 from xml.dom import minidom
+import csv
+import io
+import json
 import os
+import tempfile
+
+def atomic_write(path, text, encoding="utf-8"):
+    """
+    Writes `text` to `path` via a temporary file in the same directory and an atomic
+    rename, so an interrupted run never leaves a half-written output behind.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=os.path.splitext(path)[1])
+    try:
+        with os.fdopen(fd, "w", encoding=encoding, newline="") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def save_to_csv(data, output_dir, base_filename, only=None):
+    """
+    Writes one CSV per category (e.g. <base>_equipment.csv), mirroring the
+    per-category tables in the web app. Nested values such as bounding boxes
+    are stored as JSON strings. If `only` is given, categories not in it are
+    assumed up to date and not rewritten unless their file is missing. The CSV
+    of a category that is now empty is removed. Returns the paths of all
+    category CSVs, all of which exist.
+    """
+    written = []
+    paths = []
+    for category_name, items in data.items():
+        if category_name == "metadata" or not isinstance(items, list):
+            continue
+        csv_path = os.path.join(output_dir, f"{base_filename}_{category_name}.csv")
+        if not items:
+            if os.path.exists(csv_path):
+                os.remove(csv_path)
+            continue
+        paths.append(csv_path)
+        if only is not None and category_name not in only and os.path.exists(csv_path):
+            continue
+
+        fieldnames = []
+        for item in items:
+            for key in item:
+                if key not in fieldnames:
+                    fieldnames.append(key)
+
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+        writer.writeheader()
+        for item in items:
+            writer.writerow({
+                key: json.dumps(value) if isinstance(value, (list, dict)) else value
+                for key, value in item.items()
+            })
+
+        atomic_write(csv_path, buffer.getvalue())
+        written.append(csv_path)
+
+    print(f"---/// Saved {len(written)} CSV file(s) to {output_dir}")
+    return paths
 
 def save_to_xml(data, xml_file_path):
     """
@@ -55,9 +120,7 @@ def save_to_xml(data, xml_file_path):
     pretty_xml_str = parsed_str.toprettyxml(indent="  ")
 
  
-    os.makedirs(os.path.dirname(xml_file_path), exist_ok=True)
-    with open(xml_file_path, "w", encoding="utf-8") as f:
-        f.write(pretty_xml_str)
+    atomic_write(xml_file_path, pretty_xml_str)
     
     print("---/// Data successfully exported to XML.")
 
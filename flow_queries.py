@@ -0,0 +1,196 @@
+"""
+Flow queries over the process graph: what is upstream or downstream of a tag, the
+shortest flow path between two tags, and the valves that isolate a piece of equipment.
+
+FlowIndex keeps the line edges of the shared process graph and, for each weakly
+connected part of the plant, its condensation (strongly connected components in
+topological order) with ancestor and descendant sets stored as integer bitsets, so a
+reachability test is one bit lookup and a traversal is one bitset decode. When the
+document changes, update() rebuilds only the parts whose nodes or edges changed.
+"""
+import hashlib
+
+import networkx as nx
+import numpy as np
+
+from process_graph import get_process_graph
+
+# Valve types that do not stop flow in both directions, so never isolate
+NON_ISOLATING_TYPES = ("check", "relief", "safety", "rupture")
+
+
+def _normalize(tag):
+    return str(tag).strip().upper()
+
+
+def _decode(bits, size):
+    """Indices of the set bits of `bits`."""
+    raw = np.frombuffer(bits.to_bytes((size + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, bitorder="little"))
+
+
+class _Part:
+    """Condensation and reachability bitsets of one weakly connected part of the flow graph."""
+
+    def __init__(self, nodes, edges):
+        sub = nx.DiGraph()
+        sub.add_nodes_from(nodes)
+        sub.add_edges_from(edges)
+        condensed = nx.condensation(sub)
+        order = list(nx.topological_sort(condensed))
+        position = {c: i for i, c in enumerate(order)}
+        self.members = [sorted(condensed.nodes[c]["members"]) for c in order]
+        self.scc = {node: position[c] for node, c in condensed.graph["mapping"].items()}
+        successors = [[position[s] for s in condensed.successors(c)] for c in order]
+        self.descendants = [0] * len(order)
+        for i in range(len(order) - 1, -1, -1):
+            bits = 1 << i
+            for j in successors[i]:
+                bits |= self.descendants[j]
+            self.descendants[i] = bits
+        self.ancestors = [1 << i for i in range(len(order))]
+        for i in range(len(order)):
+            for j in successors[i]:
+                self.ancestors[j] |= self.ancestors[i]
+
+    def nodes(self, bits):
+        return [node for i in _decode(bits, len(self.members)) for node in self.members[i]]
+
+
+class FlowIndex:
+    """
+    Reachability index over the line edges (source -> destination) of a document's
+    process graph. Queries take tags in any case; unknown tags have no flow neighbours.
+    """
+
+    def __init__(self, data=None):
+        self._flow = nx.DiGraph()
+        self._parts = {}      # signature -> _Part
+        self._part_of = {}    # tag -> _Part
+        self._valves = {}     # valve tag -> isolates (bool)
+        self._inline = {}     # line tag -> tags of isolating valves installed on it
+        self._categories = {}
+        if data is not None:
+            self.update(data)
+
+    def __contains__(self, tag):
+        return _normalize(tag) in self._flow
+
+    def update(self, data):
+        """
+        Re-indexes the document. Parts of the plant whose nodes and edges are unchanged
+        keep their index; returns the number of parts rebuilt.
+        """
+        graph = get_process_graph(data)
+        flow = nx.DiGraph()
+        flow.add_nodes_from(graph.nodes)
+        for u, v, edge in graph.edges(data=True):
+            if edge["kind"] != "line":
+                continue
+            if flow.has_edge(u, v):
+                flow.edges[u, v]["lines"].append(edge["label"].strip())
+            else:
+                flow.add_edge(u, v, lines=[edge["label"].strip()])
+
+        self._categories = {tag: attrs["category_key"] for tag, attrs in graph.nodes(data=True)}
+        self._valves, self._inline = {}, {}
+        for tag in graph.graph["by_category"]["valves"]:
+            item = graph.nodes[tag]["attributes"]
+            isolates = not any(word in str(item.get("type") or "").lower() for word in NON_ISOLATING_TYPES)
+            self._valves[tag] = isolates
+            line = item.get("installed_on_line_tag")
+            if isolates and isinstance(line, str) and line.strip() and not flow.degree(tag):
+                self._inline.setdefault(line.strip(), []).append(tag)
+
+        parts, part_of, rebuilt = {}, {}, 0
+        for nodes in nx.weakly_connected_components(flow):
+            edges = sorted((u, v) for u in nodes for v in flow.successors(u))
+            signature = hashlib.sha1(repr((sorted(nodes), edges)).encode("utf-8")).hexdigest()
+            part = self._parts.get(signature)
+            if part is None:
+                part = _Part(nodes, edges)
+                rebuilt += 1
+            parts[signature] = part
+            for node in nodes:
+                part_of[node] = part
+        self._flow, self._parts, self._part_of = flow, parts, part_of
+        return rebuilt
+
+    def _bits(self, tag, table):
+        tag = _normalize(tag)
+        part = self._part_of.get(tag)
+        if part is None:
+            return None, 0
+        i = part.scc[tag]
+        return part, getattr(part, table)[i]
+
+    def downstream(self, tag):
+        """Tags reachable from `tag` along the flow, sorted."""
+        part, bits = self._bits(tag, "descendants")
+        return sorted(n for n in part.nodes(bits) if n != _normalize(tag)) if part else []
+
+    def upstream(self, tag):
+        """Tags from which flow reaches `tag`, sorted."""
+        part, bits = self._bits(tag, "ancestors")
+        return sorted(n for n in part.nodes(bits) if n != _normalize(tag)) if part else []
+
+    def reaches(self, source, target):
+        """True if flow from `source` reaches `target`."""
+        part, bits = self._bits(source, "descendants")
+        target = _normalize(target)
+        return part is not None and self._part_of.get(target) is part and bool(bits >> part.scc[target] & 1)
+
+    def flow_path(self, source, target):
+        """Shortest flow path from `source` to `target` as a list of tags, or None."""
+        if not self.reaches(source, target):
+            return None
+        source, target = _normalize(source), _normalize(target)
+        part = self._part_of[source]
+        # Only nodes both downstream of the source and upstream of the target can be on the path
+        allowed = part.descendants[part.scc[source]] & part.ancestors[part.scc[target]]
+        previous, frontier = {source: None}, [source]
+        while target not in previous:
+            following = []
+            for node in frontier:
+                for nxt in self._flow.successors(node):
+                    if nxt not in previous and allowed >> part.scc[nxt] & 1:
+                        previous[nxt] = node
+                        following.append(nxt)
+            frontier = following
+        path = [target]
+        while previous[path[-1]] is not None:
+            path.append(previous[path[-1]])
+        return path[::-1]
+
+    def isolation_valves(self, tag):
+        """
+        The nearest isolating valves around `tag`: every flow path leaving or entering it
+        (in either direction) up to the first valve it meets, either a valve node or a valve
+        installed on the line. Check and relief valves do not count. "unisolated" lists
+        other equipment reached with no valve in between; it cannot be isolated from them.
+        """
+        tag = _normalize(tag)
+        if tag not in self._flow:
+            return {"valves": [], "unisolated": []}
+        valves, unisolated = set(), set()
+        seen, frontier = {tag}, [tag]
+        while frontier:
+            following = []
+            for node in frontier:
+                for u, v in list(self._flow.out_edges(node)) + list(self._flow.in_edges(node)):
+                    nxt = v if u == node else u
+                    lines = self._flow.edges[u, v]["lines"]
+                    open_lines = [line for line in lines if line not in self._inline]
+                    for line in lines:
+                        valves.update(self._inline.get(line, ()))
+                    if not open_lines or nxt in seen:
+                        continue
+                    seen.add(nxt)
+                    if self._valves.get(nxt):
+                        valves.add(nxt)
+                        continue
+                    if self._categories.get(nxt) == "equipment":
+                        unisolated.add(nxt)
+                    following.append(nxt)
+            frontier = following
+        return {"valves": sorted(valves), "unisolated": sorted(unisolated)}
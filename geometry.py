@@ -0,0 +1,240 @@
+"""
+Vectorized bounding-box checks for a whole document.
+
+Every category's `bounding_box` values are packed into one (n, 4) NumPy array, so
+validation, clipping to the 0-1000 frame and overlap detection run in bulk instead
+of one dict at a time. Overlaps are found with a uniform grid sized from the typical
+box: only boxes sharing a grid cell are compared, which keeps the work close to linear
+for real sheets instead of O(n^2) over all pairs. Partial overlaps count only within a
+category (a bubble drawn inside an equipment outline, or a tag over its symbol, is
+normal); near-identical boxes are duplicates whatever their categories.
+"""
+import numpy as np
+
+# Normalized image frame requested by the prompt
+FRAME_MIN = 0
+FRAME_MAX = 1000
+# Lines (and junctions on them) legitimately cross the symbols they connect
+OVERLAP_EXCLUDED = frozenset({"lines", "junctions", "control_relationships"})
+# Intersection / smaller box area from which two boxes count as overlapping
+OVERLAP_MIN_FRACTION = 0.1
+# Intersection over union from which two boxes count as the same detection
+DUPLICATE_IOU = 0.9
+# Grid entries per block; bounds the size of the candidate pair arrays
+PAIR_BLOCK = 4096
+
+# pack_boxes status codes
+BOX_OK, BOX_MISSING, BOX_INVALID = 0, 1, 2
+
+
+def polyline_points(polyline):
+    """[[x, y], ...] or a flat [x1, y1, x2, y2, ...] list as (m, 2) floats, or None."""
+    if not isinstance(polyline, list) or not polyline:
+        return None
+    try:
+        if all(isinstance(p, (list, tuple)) for p in polyline):
+            points = np.array([p[:2] for p in polyline], dtype=np.float64)
+        elif len(polyline) % 2 == 0:
+            points = np.array(polyline, dtype=np.float64).reshape(-1, 2)
+        else:
+            return None
+    except (TypeError, ValueError, IndexError):
+        return None
+    if points.ndim != 2 or points.shape[1] != 2 or len(points) < 2 or not np.isfinite(points).all():
+        return None
+    return points
+
+
+def polyline_box_distance(box, points):
+    """
+    Gap between a [x1, y1, x2, y2] box and a polyline given as (m, 2) points: 0 where a
+    segment crosses the box, else the shortest distance from a segment end to the box
+    or from a box corner to a segment.
+    """
+    a, d = points[:-1], points[1:] - points[:-1]
+    # Clip every segment to the box (Liang-Barsky); any segment left means a crossing
+    t0, t1 = np.zeros(len(a)), np.ones(len(a))
+    for axis in (0, 1):
+        lo, hi, start, step = box[axis], box[axis + 2], a[:, axis], d[:, axis]
+        parallel = step == 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ta, tb = (lo - start) / step, (hi - start) / step
+        inside = (start >= lo) & (start <= hi)
+        t0 = np.maximum(t0, np.where(parallel, np.where(inside, 0.0, np.inf), np.minimum(ta, tb)))
+        t1 = np.minimum(t1, np.where(parallel, np.where(inside, 1.0, -np.inf), np.maximum(ta, tb)))
+    if (t0 <= t1).any():
+        return 0.0
+    dx = np.maximum(0.0, np.maximum(box[0] - points[:, 0], points[:, 0] - box[2]))
+    dy = np.maximum(0.0, np.maximum(box[1] - points[:, 1], points[:, 1] - box[3]))
+    corners = np.array([[box[0], box[1]], [box[2], box[1]], [box[0], box[3]], [box[2], box[3]]], dtype=np.float64)
+    length = np.maximum((d ** 2).sum(axis=1), 1e-12)
+    t = np.clip(((corners[:, None, :] - a[None]) * d[None]).sum(axis=2) / length, 0.0, 1.0)
+    nearest = a[None] + t[..., None] * d[None]
+    return float(min(np.hypot(dx, dy).min(), np.hypot(*(corners[:, None, :] - nearest).transpose(2, 0, 1)).min()))
+
+
+def pack_boxes(data, categories=None):
+    """
+    Collects bounding boxes of all list categories into one float array.
+
+    Returns (boxes, status, refs): `boxes` is (n, 4) with NaN rows where no usable box
+    exists, `status` holds BOX_OK / BOX_MISSING / BOX_INVALID per row and `refs` is the
+    list of (category, item) pairs in row order.
+    """
+    refs = []
+    rows = []
+    status = []
+    nan_row = [np.nan] * 4
+    for category, items in data.items():
+        if not isinstance(items, list) or (categories is not None and category not in categories):
+            continue
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            refs.append((category, item))
+            if "bounding_box" not in item:
+                rows.append(nan_row)
+                status.append(BOX_MISSING)
+                continue
+            bb = item["bounding_box"]
+            if isinstance(bb, list) and len(bb) == 4:
+                rows.append(bb)
+                status.append(BOX_OK)
+            else:
+                rows.append(nan_row)
+                status.append(BOX_INVALID)
+
+    status = np.array(status, dtype=np.int8)
+    if not rows:
+        return np.empty((0, 4)), status, refs
+    try:
+        boxes = np.array(rows, dtype=np.float64)
+    except (TypeError, ValueError):
+        # Some box holds non-numeric values; convert row by row
+        boxes = np.full((len(rows), 4), np.nan)
+        for i, row in enumerate(rows):
+            try:
+                boxes[i] = np.array(row, dtype=np.float64)
+            except (TypeError, ValueError):
+                pass
+    status[(status == BOX_OK) & ~np.isfinite(boxes).all(axis=1)] = BOX_INVALID
+    return boxes, status, refs
+
+
+def overlap_pairs(boxes, min_fraction=OVERLAP_MIN_FRACTION, cell_size=None):
+    """
+    Finds pairs of overlapping boxes with a uniform grid.
+
+    Each box is entered into every grid cell it touches; only boxes sharing a cell are
+    compared, and a pair is reported only from the cell holding the top-left corner of
+    its intersection, so it is found exactly once. `boxes` must be well-formed
+    (x1 < x2, y1 < y2). Returns (i, j, iou) arrays with i < j indexing `boxes`, for pairs
+    whose intersection covers at least `min_fraction` of the smaller box.
+    """
+    n = len(boxes)
+    empty = (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0))
+    if n < 2:
+        return empty
+    extent = np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+    if cell_size is None:
+        cell_size = max(2.0 * float(np.median(extent)), 1e-9)
+    origin = boxes[:, :2].min(axis=0)
+    cells = np.floor((boxes - np.tile(origin, 2)) / cell_size).astype(np.int64)
+    columns = int(cells[:, 2].max()) + 1
+    nx = cells[:, 2] - cells[:, 0] + 1
+    ny = cells[:, 3] - cells[:, 1] + 1
+
+    # One entry per (box, cell) it covers, sorted by cell
+    per_box = nx * ny
+    box_of = np.repeat(np.arange(n), per_box)
+    local = np.arange(len(box_of)) - np.repeat(np.cumsum(per_box) - per_box, per_box)
+    cell_of = (cells[box_of, 1] + local // nx[box_of]) * columns + cells[box_of, 0] + local % nx[box_of]
+    order = np.argsort(cell_of, kind="stable")
+    box_of, cell_of = box_of[order], cell_of[order]
+    group_end = np.searchsorted(cell_of, cell_of, side="right")
+    area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+    out_i, out_j, out_iou = [], [], []
+    for lo in range(0, len(box_of), PAIR_BLOCK):
+        rows = np.arange(lo, min(len(box_of), lo + PAIR_BLOCK))
+        counts = group_end[rows] - rows - 1
+        total = int(counts.sum())
+        if not total:
+            continue
+        k = np.repeat(rows, counts)
+        m = k + 1 + (np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts))
+        a, b, cell = box_of[k], box_of[m], cell_of[k]
+
+        rx = np.maximum(boxes[a, 0], boxes[b, 0])
+        ry = np.maximum(boxes[a, 1], boxes[b, 1])
+        ix = np.minimum(boxes[a, 2], boxes[b, 2]) - rx
+        iy = np.minimum(boxes[a, 3], boxes[b, 3]) - ry
+        ref_cell = (np.floor((ry - origin[1]) / cell_size).astype(np.int64) * columns
+                    + np.floor((rx - origin[0]) / cell_size).astype(np.int64))
+        hit = (ix > 0) & (iy > 0) & (ref_cell == cell)
+        a, b, inter = a[hit], b[hit], (ix * iy)[hit]
+        keep = inter >= min_fraction * np.minimum(area[a], area[b])
+        a, b, inter = a[keep], b[keep], inter[keep]
+        out_i.append(np.minimum(a, b))
+        out_j.append(np.maximum(a, b))
+        out_iou.append(inter / (area[a] + area[b] - inter))
+
+    if not out_i:
+        return empty
+    return np.concatenate(out_i), np.concatenate(out_j), np.concatenate(out_iou)
+
+
+def _add_flag(item, flag):
+    flags = item.get("flags") or []
+    if flag not in flags:
+        item["flags"] = sorted(set(flags) | {flag})
+
+
+def apply_geometry(data, clip=True, overlap_excluded=OVERLAP_EXCLUDED):
+    """
+    Validates, clips and cross-checks every bounding box of a document in bulk and
+    writes the results back to the items (changed items get a new flags list and,
+    when clipped, a new bounding_box list):
+    missing_bbox, invalid_bbox, bbox_not_tight, bbox_clipped, bbox_overlap (with another
+    item of the same category), duplicate_bbox (any category). Returns counts per flag.
+    """
+    boxes, status, refs = pack_boxes(data)
+    counts = {}
+
+    def flag_rows(mask, flag):
+        rows = np.flatnonzero(mask)
+        for row in rows:
+            _add_flag(refs[row][1], flag)
+        if len(rows):
+            counts[flag] = counts.get(flag, 0) + len(rows)
+
+    flag_rows(status == BOX_MISSING, "missing_bbox")
+    flag_rows(status == BOX_INVALID, "invalid_bbox")
+    if not len(refs):
+        return counts
+
+    ok = status == BOX_OK
+    clipped = np.clip(boxes, FRAME_MIN, FRAME_MAX)
+    outside = ok & (clipped != boxes).any(axis=1)
+    flag_rows(outside, "bbox_clipped")
+    if clip:
+        for row in np.flatnonzero(outside):
+            item = refs[row][1]
+            item["bounding_box"] = [int(v) if float(v).is_integer() else float(v) for v in clipped[row]]
+
+    geom = clipped if clip else boxes
+    not_tight = ok & ((geom[:, 2] <= geom[:, 0]) | (geom[:, 3] <= geom[:, 1]))
+    flag_rows(not_tight, "bbox_not_tight")
+
+    excluded = np.array([category in overlap_excluded for category, _ in refs], dtype=bool)
+    candidates = np.flatnonzero(ok & ~not_tight & ~excluded)
+    i, j, iou = overlap_pairs(geom[candidates])
+    duplicate = iou >= DUPLICATE_IOU
+    category = np.array([c for c, _ in refs], dtype=object)[candidates]
+    same_category = category[i] == category[j]
+    for flag, mask in (("duplicate_bbox", duplicate), ("bbox_overlap", ~duplicate & same_category)):
+        rows = np.zeros(len(refs), dtype=bool)
+        rows[candidates[i[mask]]] = True
+        rows[candidates[j[mask]]] = True
+        flag_rows(rows, flag)
+    return counts
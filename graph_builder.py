@@ -1,42 +1,77 @@
+import io
+import threading
+from collections import OrderedDict
+
 import networkx as nx
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from layout import compute_layout
+from process_graph import document_hash, get_process_graph, line_subgraph, normalize_tag
+
+# Above this many nodes the plot drops arrows, edge labels and node types (one text and
+# one patch per edge make matplotlib slow, and they are unreadable at that size anyway)
+DETAILED_PLOT_MAX_NODES = 200
+# ... and above this it is an unlabelled overview (text drawing dominates the render time)
+LABELED_PLOT_MAX_NODES = 500
+# Rendered images kept in memory, least recently used evicted first
+RENDER_CACHE_SIZE = 16
+
+_renders = OrderedDict()
+_lock = threading.Lock()
 
-def build_and_visualize_graph(data):
-    """Builds a graph from the AI data and returns a plot."""
-    G = nx.DiGraph()
 
-    equipment = data.get("equipment", [])
-    lines = data.get("lines", [])
+def build_and_visualize_graph(data, fmt="png", layout="auto"):
+    """
+    Plots the process flow (line edges of the shared process graph) and returns the image
+    as bytes ("png" or "svg"), or None if there is nothing to plot. Rendering uses an Agg
+    canvas of its own, never pyplot or a file, so concurrent calls do not interfere.
+    """
+    key = (document_hash(data), fmt, layout)
+    with _lock:
+        if key in _renders:
+            _renders.move_to_end(key)
+            return _renders[key]
 
-    # Add nodes
-    for item in equipment:
-        if 'tag' in item:
-            G.add_node(item['tag'], label=f"{item['tag']}\n({item['type']})")
+    flow = line_subgraph(get_process_graph(data))
 
-    # Add edges 
-    for line in lines:
-        if 'source_tag' in line and 'destination_tag' in line:
-            if G.has_node(line['source_tag']) and G.has_node(line['destination_tag']):
-                G.add_edge(line['source_tag'], line['destination_tag'], label=line.get('line_number_tag', ''))
+    # Equipment plus everything a line reaches (valves, junctions, instruments)
+    nodes = [n for n, attrs in flow.nodes(data=True) if attrs['category_key'] == 'equipment' or flow.degree(n)]
+    G = flow.subgraph(nodes)
 
     if not G.nodes():
-        return None 
+        return None
 
     # Create plot
-    plt.figure(figsize=(16, 10))
-    pos = nx.spring_layout(G, k=0.9, iterations=50) 
-    node_labels = nx.get_node_attributes(G, 'label')
-    edge_labels = nx.get_edge_attributes(G, 'label')
+    fig = Figure(figsize=(16, 10))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    # Revisions of the same drawing extend its previous layout; other drawings never do
+    lineage = normalize_tag((data.get("metadata") or {}).get("drawing_number"))
+    pos = compute_layout(G, method=layout, lineage=lineage)
+    detailed = len(G) <= DETAILED_PLOT_MAX_NODES
+    if detailed:
+        node_labels = {n: f"{n}\n({attrs['attributes'].get('type') or attrs['category']})" for n, attrs in G.nodes(data=True)}
+    else:
+        node_labels = {n: n for n in G.nodes}
+    node_size = 3000 if len(G) <= 50 else max(20, 150000 // len(G))
 
-    nx.draw(G, pos, with_labels=False, node_size=3000, node_color='skyblue', font_size=10, width=1.5, edge_color='gray')
-    nx.draw_networkx_labels(G, pos, labels=node_labels, font_size=8)
-    nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_color='red', font_size=7)
+    nx.draw(G, pos, ax=ax, with_labels=False, arrows=detailed, node_size=node_size, node_color='skyblue', font_size=10, width=1.5, edge_color='gray')
+    if len(G) <= LABELED_PLOT_MAX_NODES:
+        nx.draw_networkx_labels(G, pos, ax=ax, labels=node_labels, font_size=8 if len(G) <= 50 else 5)
+    if detailed:
+        edge_labels = {(u, v): label for u, v, label in G.edges(data='label')}
+        nx.draw_networkx_edge_labels(G, pos, ax=ax, edge_labels=edge_labels, font_color='red', font_size=7)
 
-    plt.title("P&ID Process Flow Diagram")
+    ax.set_title("P&ID Process Flow Diagram")
 
-    # Saveplot
-    plot_path = "temp_plot.png"
-    plt.savefig(plot_path)
-    plt.close()
+    # Render to memory
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt)
+    image = buffer.getvalue()
 
-    return plot_path
\ No newline at end of file
+    with _lock:
+        _renders[key] = image
+        while len(_renders) > RENDER_CACHE_SIZE:
+            _renders.popitem(last=False)
+    return image
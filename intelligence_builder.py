@@ -1,20 +1,203 @@
 from pyvis.network import Network
+import json
 import os
+import shutil
+import tempfile
+from functools import lru_cache
 
-def build_knowledge_graph_from_tables(data):
+import networkx as nx
+import pyvis
+
+from layout import layered_layout
+from process_graph import get_process_graph
+from tag_grammar import parse_equipment, parse_instrument
+
+# Graphs with more nodes than this use the large-graph mode (server-side layout, physics off)
+LARGE_GRAPH_NODES = int(os.getenv("PID_GRAPH_LARGE_NODES", "300"))
+# ... and above this collapse to one node per plant unit
+COLLAPSE_GRAPH_NODES = int(os.getenv("PID_GRAPH_COLLAPSE_NODES", "2000"))
+# vis-network script loaded by the large-graph page; the default is the copy served by Streamlit
+# static file serving (see ensure_static_asset), so browsers cache it across renders
+VIS_JS_URL = os.getenv("PID_VIS_JS_URL", "app/static/vis-network.min.js")
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+CATEGORY_PROPERTIES = {
+    "Equipment": {"color": "#3498db", "shape": "box", "size": 30},
+    "Instrumentation": {"color": "#f1c40f", "shape": "ellipse", "size": 20},
+    "Valves": {"color": "#2ecc71", "shape": "triangle", "size": 15},
+    "Junctions": {"color": "#7f8c8d", "shape": "dot", "size": 8},
+    "Safety Devices": {"color": "#e74c3c", "shape": "diamond", "size": 15},
+}
+DEFAULT_PROPERTIES = {"color": "#95a5a6", "shape": "dot"}
+# Server-side layout spacing in vis.js pixels
+LAYER_SPACING, ROW_SPACING, UNIT_GAP = 180, 70, 300
+
+LARGE_GRAPH_OPTIONS = {
+    "physics": {"enabled": False},
+    "edges": {"smooth": False, "arrows": {"to": {"enabled": True, "scaleFactor": 0.5}}},
+    "interaction": {"hideEdgesOnDrag": True, "tooltipDelay": 200},
+    "nodes": {"font": {"size": 12}},
+}
+
+LARGE_GRAPH_TEMPLATE = """<html>
+<head>
+<meta charset="utf-8">
+<script src="{js_url}"></script>
+<style>body {{ margin: 0; background: #f0f2f6; }} #graph {{ width: 100%; height: {height}; }}</style>
+</head>
+<body>
+<div id="graph"></div>
+<script>
+var nodes = new vis.DataSet({nodes});
+var edges = new vis.DataSet({edges});
+new vis.Network(document.getElementById("graph"), {{nodes: nodes, edges: edges}}, {options});
+</script>
+</body>
+</html>
+"""
+
+
+@lru_cache(maxsize=1)
+def ensure_static_asset():
+    """
+    Copies pyvis' bundled vis-network.min.js to ./static once, for Streamlit to serve
+    (server.enableStaticServing) at app/static/vis-network.min.js. Returns the path.
     """
-    Builds an interactive knowledge graph from the category-based AI data,
-    using a clean hierarchical layout.
+    target = os.path.join(STATIC_DIR, "vis-network.min.js")
+    if not os.path.exists(target):
+        source = os.path.join(os.path.dirname(pyvis.__file__), "templates", "lib", "vis-9.1.2", "vis-network.min.js")
+        os.makedirs(STATIC_DIR, exist_ok=True)
+        shutil.copyfile(source, target)
+    return target
+
+
+def node_unit(tag, item):
     """
+    Plant unit of a node: an explicit unit/area field, the area prefix of its tag, or the
+    hundreds of its tag number (P-101 and FT-120 are in unit 1). "unassigned" otherwise.
+    """
+    for key in ("unit", "area"):
+        if item.get(key):
+            return str(item[key])
+    parsed = parse_instrument(tag) or parse_equipment(tag)
+    if parsed:
+        if parsed["area"]:
+            return parsed["area"]
+        number = parsed.get("loop_id") or parsed.get("number")
+        if len(number) >= 3:
+            return number[:-2]
+    return "unassigned"
+
+
+def _layered_positions(graph, nodes):
+    """
+    Positions for `nodes`, one block per unit laid left to right; inside a block, the
+    unit's subgraph gets the layered layout (columns follow the process flow).
+    """
+    units = {}
+    for node in nodes:
+        units.setdefault(graph.nodes[node]["unit"], nx.DiGraph()).add_node(node)
+    for u, v in graph.edges():
+        unit = graph.nodes[u]["unit"]
+        if unit == graph.nodes[v]["unit"] and u in units[unit] and v in units[unit]:
+            units[unit].add_edge(u, v)
+    positions = {}
+    offset = 0
+    for unit in sorted(units):
+        block = layered_layout(units[unit])
+        for node, (x, y) in block.items():
+            positions[node] = (offset + x * LAYER_SPACING, y * ROW_SPACING)
+        offset += (max(x for x, _ in block.values()) + 1) * LAYER_SPACING + UNIT_GAP
+    return positions
+
+
+def _plain_title(tag, category, item):
+    lines = [f"Tag: {tag}", f"Category: {category}"]
+    lines += [f"{key.replace('_', ' ').capitalize()}: {value}" for key, value in item.items()
+              if key not in ("tag", "bounding_box") and value not in (None, "", [])]
+    return "\n".join(lines)
+
+
+def _large_graph_elements(graph):
+    """vis.js node and edge dicts for every node, placed by _layered_positions."""
+    positions = _layered_positions(graph, list(graph.nodes))
+    nodes = []
+    for tag, node in graph.nodes(data=True):
+        x, y = positions[tag]
+        props = CATEGORY_PROPERTIES.get(node["category"], DEFAULT_PROPERTIES)
+        nodes.append({"id": tag, "label": tag, "x": x, "y": y, "color": props["color"], "shape": props["shape"],
+                      "size": props.get("size", 10), "title": _plain_title(tag, node["category"], node["attributes"])})
+    edges = [{"from": u, "to": v, "title": edge["label"], "dashes": edge["kind"] != "line"}
+             for u, v, edge in graph.edges(data=True)]
+    return nodes, edges
+
+
+def _unit_summary_elements(graph):
+    """One vis.js node per unit (sized by member count) and one edge per connected unit pair."""
+    members = {}
+    for tag, node in graph.nodes(data=True):
+        members.setdefault(node["unit"], {}).setdefault(node["category"], 0)
+        members[node["unit"]][node["category"]] += 1
+    links = {}
+    for u, v, edge in graph.edges(data=True):
+        a, b = graph.nodes[u]["unit"], graph.nodes[v]["unit"]
+        if a != b:
+            links[(a, b)] = links.get((a, b), 0) + 1
+    nodes = []
+    for i, unit in enumerate(sorted(members)):
+        total = sum(members[unit].values())
+        detail = "\n".join(f"{category}: {count}" for category, count in sorted(members[unit].items()))
+        nodes.append({"id": f"unit:{unit}", "label": f"Unit {unit}\n{total} items", "shape": "box",
+                      "color": "#3498db", "x": (i % 8) * 2 * LAYER_SPACING, "y": (i // 8) * 2 * LAYER_SPACING,
+                      "title": f"Unit {unit}\n{detail}", "value": total})
+    edges = [{"from": f"unit:{a}", "to": f"unit:{b}", "label": str(count), "value": count,
+              "title": f"{count} connection(s)"} for (a, b), count in sorted(links.items())]
+    return nodes, edges
+
+
+def _render_large_graph(nodes, edges, height="800px"):
+    def to_js(value):
+        return json.dumps(value).replace("</", "<\\/")
+
+    if VIS_JS_URL == "app/static/vis-network.min.js":
+        ensure_static_asset()
+    return LARGE_GRAPH_TEMPLATE.format(js_url=VIS_JS_URL, height=height, nodes=to_js(nodes), edges=to_js(edges),
+                                       options=to_js(LARGE_GRAPH_OPTIONS))
+
+
+def _unit_graph(graph):
+    """The process graph with a "unit" attribute on every node (a thawed copy of the shared graph)."""
+    units = graph.__class__(graph)
+    for tag, node in units.nodes(data=True):
+        node["unit"] = node_unit(tag, node["attributes"])
+    return units
+
+
+def render_knowledge_graph(data, large=None, collapse=None):
+    """
+    HTML of the interactive knowledge graph. Small graphs keep the hierarchical pyvis
+    view; above LARGE_GRAPH_NODES (or with large=True) nodes are placed on the server
+    with physics off and vis-network is loaded from VIS_JS_URL instead of being inlined;
+    above COLLAPSE_GRAPH_NODES (or with collapse=True) the graph is summarized per plant unit.
+    """
+    graph = get_process_graph(data)
+    n = graph.number_of_nodes()
+    collapse = n > COLLAPSE_GRAPH_NODES if collapse is None else collapse
+    large = collapse or (n > LARGE_GRAPH_NODES if large is None else large)
+    if large:
+        units = _unit_graph(graph)
+        nodes, edges = _unit_summary_elements(units) if collapse else _large_graph_elements(units)
+        return _render_large_graph(nodes, edges)
+
     net = Network(height="800px", width="100%", bgcolor="#f0f2f6", font_color="black", notebook=True, cdn_resources='in_line', directed=True)
-    
-   
+
+
     net.set_options("""
     var options = {
       "layout": {
         "hierarchical": {
           "enabled": true,
-          "direction": "UD", 
+          "direction": "UD",
           "sortMethod": "directed"
         }
       },
@@ -33,47 +216,34 @@ def build_knowledge_graph_from_tables(data):
     }
     """)
 
-  
-    category_properties = {
-        "Equipment": {"color": "#3498db", "shape": "box", "size": 30},
-        "Instrumentation": {"color": "#f1c40f", "shape": "ellipse", "size": 20},
-        "Valves": {"color": "#2ecc71", "shape": "triangle", "size": 15},
-    }
+    for tag, node in graph.nodes(data=True):
+        category_name = node['category']
+        props = CATEGORY_PROPERTIES.get(category_name, DEFAULT_PROPERTIES)
+        title = f"<b>Tag:</b> {tag}<br><b>Category:</b> {category_name}<br>"
+        for key, value in node['attributes'].items():
+            if key not in ['tag', 'bounding_box']:
+                title += f"<b>{key.replace('_', ' ').capitalize()}:</b> {value}<br>"
+        net.add_node(tag, label=tag, title=title, **props)
+
+    for source, dest, edge in graph.edges(data=True):
+        if edge['kind'] == 'line':
+            net.add_edge(source, dest, title=edge['label'])
+        else:
+            net.add_edge(source, dest, title=edge['label'], dashes=True)
 
-    def add_nodes_from_category(category_name, category_key):
-        if category_key in data and data[category_key]:
-            props = category_properties.get(category_name, {"color": "#95a5a6", "shape": "dot"})
-            for item in data[category_key]:
-                tag = item.get('tag')
-                if tag and tag not in net.get_nodes():
-                    title = f"<b>Tag:</b> {tag}<br><b>Category:</b> {category_name}<br>"
-                    for key, value in item.items():
-                        if key not in ['tag', 'bounding_box']:
-                            title += f"<b>{key.replace('_', ' ').capitalize()}:</b> {value}<br>"
-                    net.add_node(tag, label=tag, title=title, **props)
-    
-    add_nodes_from_category("Equipment", "equipment")
-    add_nodes_from_category("Instrumentation", "instrumentation")
-    add_nodes_from_category("Valves", "valves")
-    
-
-    if "lines" in data and data["lines"]:
-        all_nodes = net.get_nodes()
-        for line in data["lines"]:
-            source = line.get('source_tag')
-            dest = line.get('destination_tag')
-            if source and dest:
-                if source in all_nodes and dest in all_nodes:
-                    net.add_edge(source, dest, title=line.get('line_number_tag', ''))
-    
+    return net.generate_html()
 
+def build_knowledge_graph_from_tables(data):
+    """
+    Builds an interactive knowledge graph from the category-based AI data
+    (through the shared process graph) and writes it to a new temporary HTML file,
+    whose path is returned. See render_knowledge_graph.
+    """
+    html_content = render_knowledge_graph(data)
     output_dir = "temp_uploads"
     os.makedirs(output_dir, exist_ok=True)
-    output_path = os.path.join(output_dir, "pid_knowledge_graph.html")
-    
-    html_content = net.generate_html()
-    with open(output_path, 'w', encoding='utf-8') as f:
+    fd, output_path = tempfile.mkstemp(prefix="pid_knowledge_graph_", suffix=".html", dir=output_dir)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
         f.write(html_content)
-        
-    return output_path
 
+    return output_path
@@ -0,0 +1,247 @@
+import json
+import re
+
+# Characters that matter outside / inside JSON strings; everything else is skipped in bulk
+_STRUCTURAL = re.compile(r'["{}\[\],:]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_OPENERS = "{["
+_CLOSERS = "}]"
+
+
+class IncrementalJSONParser:
+    """
+    Incremental parser for a streamed top-level JSON object.
+
+    Text is fed chunk by chunk; as soon as a top-level member (e.g. the "equipment"
+    array) closes, `feed` returns it as a (key, value) pair, so downstream stages can
+    start before the model has finished generating. Anything before the first "{"
+    (such as a ```json fence) is ignored. The scanner is string-aware and only
+    inspects structural characters, so total work is linear in the response length.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.string_start = None
+        self.started = False
+        self.done = False
+        self.key = None
+        self.expect = "key"      # at depth 1: key -> colon -> value -> comma -> key ...
+        self.value_start = None
+        self.members = {}
+        self.errors = []
+
+    def _emit(self, end, events):
+        raw = self.buffer[self.value_start:end].strip()
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError as e:
+            self.errors.append(f"{self.key}: {e}")
+        else:
+            self.members[self.key] = value
+            events.append((self.key, value))
+        self.key = None
+        self.value_start = None
+        self.expect = "comma"
+
+    def _compact(self):
+        """Drops already-consumed text once no member is pending."""
+        if not self.in_string and self.value_start is None and self.pos > 65536:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+
+    def feed(self, chunk):
+        """Adds a chunk of text; returns the list of (key, value) members completed by it."""
+        events = []
+        if self.done or not chunk:
+            return events
+        self.buffer += chunk
+        buf = self.buffer
+        n = len(buf)
+
+        while self.pos < n and not self.done:
+            if self.in_string:
+                m = _STRING_SPECIAL.search(buf, self.pos)
+                if not m:
+                    self.pos = n
+                    break
+                i = m.start()
+                if buf[i] == "\\":
+                    if i + 1 >= n:
+                        # Escape sequence split across chunks; wait for more text
+                        self.pos = i
+                        break
+                    self.pos = i + 2
+                    continue
+                self.in_string = False
+                self.pos = i + 1
+                if self.depth == 1:
+                    if self.expect == "key":
+                        self.key = json.loads(buf[self.string_start:i + 1])
+                        self.expect = "colon"
+                    elif self.expect == "value":
+                        self._emit(i + 1, events)
+                continue
+
+            m = _STRUCTURAL.search(buf, self.pos)
+            if not m:
+                self.pos = n
+                break
+            i = m.start()
+            ch = buf[i]
+            self.pos = i + 1
+
+            if not self.started:
+                if ch == "{":
+                    self.started = True
+                    self.depth = 1
+                continue
+
+            if ch == '"':
+                self.in_string = True
+                self.string_start = i
+            elif ch in _OPENERS:
+                self.depth += 1
+            elif ch in _CLOSERS:
+                self.depth -= 1
+                if self.depth == 1 and self.expect == "value":
+                    self._emit(i + 1, events)
+                elif self.depth == 0:
+                    if self.expect == "value":
+                        # Scalar as the last member
+                        self._emit(i, events)
+                    self.done = True
+            elif self.depth == 1:
+                if ch == ":" and self.expect == "colon":
+                    self.expect = "value"
+                    self.value_start = i + 1
+                elif ch == ",":
+                    if self.expect == "value":
+                        self._emit(i, events)
+                    self.expect = "key"
+
+        self._compact()
+        return events
+
+    def result(self):
+        """All members parsed so far, as a dict."""
+        return dict(self.members)
+
+
+# Marker added to documents salvaged from truncated model output
+PARTIAL_KEY = "_partial"
+
+_DECODER = json.JSONDecoder()
+
+
+def _is_item_boundary(stack):
+    """
+    True where cutting the text keeps only whole items: between top-level members, or
+    between elements of an array that sits directly in an object at depth <= 2
+    (e.g. the items of "equipment").
+    """
+    depth = len(stack)
+    if depth == 1:
+        return True
+    return stack[-1] == "[" and depth <= 3 and stack[-2] == "{"
+
+
+# One token per structural character or whole string; "trunc" matches a string cut off by the end of text
+_TOKEN = re.compile(
+    r'(?P<str>"[^"\\]*(?:\\.[^"\\]*)*")|(?P<trunc>"[^"\\]*(?:\\.[^"\\]*)*\\?\Z)|[{}\[\],]',
+    re.DOTALL,
+)
+
+
+def scan_json_object(text, start=0):
+    """
+    Single pass, string-aware scan of the object starting at text[start] == "{".
+
+    Returns (end, cut, cut_stack): `end` is the index just past the balancing "}" or
+    None if the text ends first; `cut`/`cut_stack` mark the last item boundary seen and
+    the containers open there, which is what repair_truncated_json needs.
+    """
+    stack = []
+    cut, cut_stack = None, ""
+    for m in _TOKEN.finditer(text, start):
+        kind = m.lastgroup
+        if kind == "str":
+            continue
+        if kind == "trunc":
+            break
+        ch = m.group()
+        i = m.start()
+        if ch in _OPENERS:
+            stack.append(ch)
+            if len(stack) == 1 or _is_item_boundary(stack):
+                cut, cut_stack = i + 1, "".join(stack)
+        elif ch in _CLOSERS:
+            if not stack:
+                return None, cut, cut_stack
+            stack.pop()
+            if not stack:
+                return i + 1, cut, cut_stack
+            if _is_item_boundary(stack):
+                cut, cut_stack = i + 1, "".join(stack)
+        elif _is_item_boundary(stack):
+            cut, cut_stack = i, "".join(stack)
+    return None, cut, cut_stack
+
+
+def repair_truncated_json(text, start, cut, cut_stack):
+    """
+    Closes a truncated object at its last item boundary: every complete item and member
+    is kept, the trailing incomplete one is dropped. Returns the parsed dict or None.
+    """
+    if cut is None:
+        return None
+    closers = "".join("}" if opener == "{" else "]" for opener in reversed(cut_stack))
+    candidate = text[start:cut].rstrip().rstrip(",") + closers
+    try:
+        data = json.loads(candidate)
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def extract_json_object(text, allow_partial=True, max_candidates=32):
+    """
+    Finds and parses the first JSON object in free-form model output in linear time.
+
+    Nested objects (e.g. metadata) are handled by balanced, string-aware scanning.
+    If the output was cut off (token limit), the object is repaired by closing it at
+    the last complete item and marked with PARTIAL_KEY = True. Returns None if nothing
+    usable is found.
+    """
+    if not isinstance(text, str):
+        return None
+    start = text.find("{")
+    candidates = 0
+    while start != -1 and candidates < max_candidates:
+        candidates += 1
+        # Fast path: a complete object decodes in one C-level pass
+        try:
+            data, _ = _DECODER.raw_decode(text, start)
+        except json.JSONDecodeError:
+            data = None
+        if isinstance(data, dict):
+            return data
+
+        end, cut, cut_stack = scan_json_object(text, start)
+        if end is not None:
+            try:
+                data = json.loads(text[start:end])
+            except json.JSONDecodeError:
+                data = None
+            if isinstance(data, dict):
+                return data
+        elif allow_partial:
+            data = repair_truncated_json(text, start, cut, cut_stack)
+            if data is not None:
+                data[PARTIAL_KEY] = True
+                return data
+        # Not a usable object (e.g. braces in surrounding prose); try the next "{"
+        start = text.find("{", start + 1)
+    return None
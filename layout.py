@@ -0,0 +1,139 @@
+"""
+Graph layouts for the process-flow plots, cached per graph structure.
+
+layered_layout places a directed graph in columns by longest path from its sources
+(cycles are collapsed first), ordering each column by the mean row of its
+predecessors; it is linear in the graph size. spring_layout is kept for small graphs,
+where it reads better: when a drawing's graph grows by a few nodes, its previous
+positions are reused and only the new nodes are placed, next to their neighbours.
+compute_layout picks one, and serves repeated requests for the same structure from a
+cache.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import networkx as nx
+
+# Graphs with more nodes than this never go through the quadratic spring layout
+SPRING_LAYOUT_MAX_NODES = int(os.getenv("PID_SPRING_LAYOUT_MAX_NODES", "150"))
+# Layouts kept in memory, least recently used evicted first
+LAYOUT_CACHE_SIZE = 32
+# Share of a graph's nodes the previous spring layout of its lineage must already place
+# for that layout to be extended; below it the graph is laid out again
+EXTEND_MIN_COVERAGE = 0.8
+
+_cache = OrderedDict()
+_lineages = OrderedDict()   # lineage -> latest spring layout of that drawing
+_lock = threading.Lock()
+
+
+def graph_key(graph):
+    """Hash of a graph's structure (nodes and directed edges; attributes do not matter)."""
+    payload = json.dumps([sorted(map(str, graph.nodes)), sorted((str(u), str(v)) for u, v in graph.edges())],
+                         separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def layered_layout(graph):
+    """
+    {node: (x, y)} with x the node's layer (longest path from a source) and y its row
+    in that layer, rows centred on 0. Nodes on a cycle share a layer.
+    """
+    condensed = nx.condensation(graph)
+    members = condensed.graph["mapping"]
+    layer = {}
+    for c in nx.topological_sort(condensed):
+        layer[c] = max((layer[p] + 1 for p in condensed.predecessors(c)), default=0)
+
+    layers = {}
+    for node in graph.nodes:
+        layers.setdefault(layer[members[node]], []).append(node)
+    pos = {}
+    for x in sorted(layers):
+        column = layers[x]
+        # Barycentre of already placed predecessors keeps edges short and crossings few
+        def weight(node):
+            rows = [pos[p][1] for p in graph.predecessors(node) if p in pos]
+            return sum(rows) / len(rows) if rows else float("inf")
+        column.sort(key=weight)
+        for row, node in enumerate(column):
+            pos[node] = (float(x), row - (len(column) - 1) / 2)
+    return pos
+
+
+def place_new_nodes(graph, known, spacing=0.1):
+    """
+    Positions for every node of `graph`: nodes in `known` keep theirs, the others are
+    put at the mean of their placed neighbours, or beside the drawing if they have none.
+    """
+    pos = {n: known[n] for n in graph.nodes if n in known}
+    new = [n for n in graph.nodes if n not in pos]
+    right = max((x for x, _ in pos.values()), default=0.0)
+    pending = list(new)
+    while pending:
+        waiting = []
+        for i, node in enumerate(pending):
+            neighbours = [pos[m] for m in nx.all_neighbors(graph, node) if m in pos]
+            if neighbours:
+                x = sum(p[0] for p in neighbours) / len(neighbours)
+                y = sum(p[1] for p in neighbours) / len(neighbours)
+                # Offset so the node does not land exactly on its neighbour
+                pos[node] = (x + spacing, y + spacing * ((i % 3) - 1))
+            else:
+                waiting.append(node)
+        if len(waiting) == len(pending):
+            # Nothing left touches the drawing: start a new column on its right
+            right += 2 * spacing
+            pos[waiting[0]] = (right, 0.0)
+            waiting = waiting[1:]
+        pending = waiting
+    return pos
+
+
+def compute_layout(graph, method="auto", seed=0, lineage=None):
+    """
+    Cached {node: (x, y)} for `graph`. method is "layered", "spring" or "auto" (spring up to
+    SPRING_LAYOUT_MAX_NODES nodes, layered above). `lineage` names the drawing the graph
+    belongs to (e.g. its drawing number): when the drawing's graph only gained nodes
+    since its last spring layout, and that layout already places at least
+    EXTEND_MIN_COVERAGE of them, it is extended instead of recomputed. Without a
+    lineage every new graph gets a full layout.
+    """
+    if method == "auto":
+        method = "spring" if graph.number_of_nodes() <= SPRING_LAYOUT_MAX_NODES else "layered"
+    key = (graph_key(graph), method)
+    with _lock:
+        pos = _cache.get(key)
+        if pos is not None:
+            _cache.move_to_end(key)
+            if method == "spring" and lineage is not None:
+                _lineages[lineage] = pos
+            return dict(pos)
+        previous = _lineages.get(lineage) if lineage is not None else None
+
+    if method == "layered":
+        pos = layered_layout(graph)
+    elif method == "spring":
+        nodes = set(graph.nodes)
+        if (previous is not None and previous.keys() <= nodes
+                and len(previous) >= EXTEND_MIN_COVERAGE * len(nodes)):
+            pos = place_new_nodes(graph, previous)
+        else:
+            pos = {n: tuple(map(float, p)) for n, p in nx.spring_layout(graph, k=0.9, iterations=50, seed=seed).items()}
+    else:
+        raise ValueError(f"Unknown layout method: {method}")
+
+    with _lock:
+        _cache[key] = pos
+        _cache.move_to_end(key)
+        while len(_cache) > LAYOUT_CACHE_SIZE:
+            _cache.popitem(last=False)
+        if method == "spring" and lineage is not None:
+            _lineages[lineage] = pos
+            _lineages.move_to_end(lineage)
+            while len(_lineages) > LAYOUT_CACHE_SIZE:
+                _lineages.popitem(last=False)
+    return dict(pos)
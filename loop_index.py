@@ -0,0 +1,230 @@
+"""
+Plant-wide control-loop index.
+
+Instruments, control valves and control_relationships from every sheet are grouped by
+(area, loop number) using the shared tag grammar. Each member gets an ISA-5.1 role
+from its function letters (sensor, controller, final element, ...), which is enough to
+report incomplete loops (a transmitter with no controller, a controller with no final
+element or no measurement) and duplicated loop numbers. Sheets are added (or replaced)
+one at a time and only the loops they touch are re-checked, so a plant with hundreds
+of sheets is never rescanned as a whole. The index is saved as JSON with the last
+issues and a content hash per sheet, so a later run loads it instead of re-reading
+every sheet and re-indexes only sheets that are new or changed.
+"""
+import json
+
+from exporter import atomic_write
+from process_graph import document_hash
+from tag_grammar import parse_instrument
+
+FORMAT_VERSION = 1
+
+# Member roles, from the succeeding letters of an ISA-5.1 tag
+SENSOR, CONTROLLER, FINAL_ELEMENT, INDICATOR, SAFETY, OTHER = (
+    "sensor", "controller", "final_element", "indicator", "safety", "other")
+# Words in an item's type used when the tag letters are not conclusive
+TYPE_ROLES = [("valve", FINAL_ELEMENT), ("controller", CONTROLLER), ("transmitter", SENSOR),
+              ("element", SENSOR), ("indicator", INDICATOR), ("gauge", INDICATOR)]
+
+
+def function_role(function):
+    """Role of an instrument from its ISA function letters: FT -> sensor, FIC -> controller, FCV -> final_element."""
+    succeeding = (function or "")[1:]
+    if not succeeding:
+        return OTHER
+    if succeeding.endswith("V") or succeeding.endswith("Z"):
+        # PSV, PRV, TSV: self-actuated safety devices, not part of a control loop
+        return SAFETY if succeeding in ("SV", "RV", "SE") else FINAL_ELEMENT
+    if "C" in succeeding:
+        return CONTROLLER
+    if "T" in succeeding or succeeding == "E":
+        return SENSOR
+    if "I" in succeeding or "G" in succeeding:
+        return INDICATOR
+    return OTHER
+
+
+def type_role(item_type):
+    text = (item_type or "").lower()
+    for word, role in TYPE_ROLES:
+        if word in text:
+            return role
+    return OTHER
+
+
+def _member(sheet_id, category, item, tag, default_area, role=None):
+    """Loop key and member record for one tagged item, or (None, None) if it has no loop."""
+    parsed = parse_instrument(tag)
+    if parsed:
+        key = (parsed["area"] or default_area, parsed["loop_id"])
+        function = parsed["function"]
+        tag = tag.strip().upper()
+    elif item.get("loop_id"):
+        key = (default_area, str(item["loop_id"]))
+        function = None
+    else:
+        return None, None
+    if role is None:
+        role = function_role(function) if function else OTHER
+        if role == OTHER:
+            role = FINAL_ELEMENT if category == "valves" else type_role(item.get("type"))
+    return key, {"tag": tag, "function": function, "role": role, "category": category, "sheet": sheet_id}
+
+
+def sheet_members(sheet_id, data, area=None):
+    """(loop key, member) pairs for every loop participant on one sheet."""
+    pairs = []
+    by_tag = {}
+    for category in ("instrumentation", "valves"):
+        for item in data.get(category) or []:
+            if not isinstance(item, dict) or not isinstance(item.get("tag"), str):
+                continue
+            key, member = _member(sheet_id, category, item, item["tag"], area)
+            if key is not None:
+                pairs.append((key, member))
+                by_tag[member["tag"]] = key
+    # A controlled element whose own tag carries no loop number joins its controller's loop
+    for rel in data.get("control_relationships") or []:
+        if not isinstance(rel, dict) or rel.get("relationship_type") != "controls":
+            continue
+        source, target = str(rel.get("source_tag") or "").upper(), str(rel.get("destination_tag") or "").upper()
+        if source in by_tag and target and target not in by_tag and not parse_instrument(target):
+            member = {"tag": target, "function": None, "role": FINAL_ELEMENT,
+                      "category": "control_relationships", "sheet": sheet_id}
+            pairs.append((by_tag[source], member))
+            by_tag[target] = by_tag[source]
+    return pairs
+
+
+def check_loop(key, members):
+    """Issues of one loop, given all its members across sheets."""
+    area, loop = key
+    name = f"{area}-{loop}" if area else loop
+    roles = {m["role"] for m in members}
+    tags = sorted({m["tag"] for m in members})
+    sheets = sorted({str(m["sheet"]) for m in members})
+    issues = []
+
+    def issue(issue_type, details):
+        issues.append({"area": area, "loop": loop, "issue_type": issue_type, "details": details,
+                       "tags": tags, "sheets": sheets})
+
+    if SENSOR in roles and CONTROLLER not in roles:
+        issue("Incomplete Loop", f"Loop {name} has a transmitter but no controller.")
+    if CONTROLLER in roles and FINAL_ELEMENT not in roles:
+        issue("Incomplete Loop", f"Loop {name} has a controller but no final element.")
+    if CONTROLLER in roles and SENSOR not in roles:
+        issue("Incomplete Loop", f"Loop {name} has a controller but no measurement.")
+    variables = sorted({m["function"][0] for m in members if m["function"] and m["role"] != SAFETY})
+    if len(variables) > 1:
+        issue("Duplicate Loop Number",
+              f"Loop number {name} is used for several measured variables ({', '.join(variables)}).")
+    seen = {}
+    for m in members:
+        seen[(m["sheet"], m["tag"])] = seen.get((m["sheet"], m["tag"]), 0) + 1
+    for (sheet, tag), count in sorted(seen.items(), key=lambda kv: (str(kv[0][0]), kv[0][1])):
+        if count > 1:
+            issue("Duplicate Tag", f"Tag {tag} appears {count} times on sheet {sheet}.")
+    return issues
+
+
+class LoopIndex:
+    """
+    Loops of a whole plant keyed by (area, loop number). add_sheet replaces a sheet's
+    contribution and marks only the loops it touches for re-checking; issues() re-checks
+    those and serves every other loop from the previous result.
+    """
+
+    def __init__(self):
+        self._sheets = {}   # sheet id -> [(key, member)]
+        self._hashes = {}   # sheet id -> content hash of the data it was indexed from
+        self._loops = {}    # key -> {sheet id: [member]}
+        self._issues = {}   # key -> issues as of the last check
+        self._dirty = set()
+
+    def __len__(self):
+        return len(self._loops)
+
+    def __contains__(self, key):
+        return key in self._loops
+
+    @property
+    def sheets(self):
+        return list(self._sheets)
+
+    def add_sheet(self, sheet_id, data, area=None):
+        """
+        Indexes (or re-indexes) one sheet; tags without an area prefix get `area`. A sheet
+        indexed before from the same content is left as it is. Returns its member count.
+        """
+        digest = document_hash([data, area])
+        if self._hashes.get(sheet_id) == digest:
+            return len(self._sheets[sheet_id])
+        self.remove_sheet(sheet_id)
+        pairs = sheet_members(sheet_id, data, area)
+        self._sheets[sheet_id] = pairs
+        self._hashes[sheet_id] = digest
+        for key, member in pairs:
+            self._loops.setdefault(key, {}).setdefault(sheet_id, []).append(member)
+            self._dirty.add(key)
+        return len(pairs)
+
+    def remove_sheet(self, sheet_id):
+        self._hashes.pop(sheet_id, None)
+        for key, _ in self._sheets.pop(sheet_id, []):
+            per_sheet = self._loops.get(key)
+            if per_sheet is None:
+                continue
+            per_sheet.pop(sheet_id, None)
+            if not per_sheet:
+                del self._loops[key]
+            self._dirty.add(key)
+
+    def members(self, key):
+        """All members of a loop across sheets."""
+        return [m for members in self._loops.get(key, {}).values() for m in members]
+
+    def loops(self):
+        return {key: self.members(key) for key in self._loops}
+
+    def issues(self):
+        """Issues of every loop, re-checking only loops changed since the last call."""
+        for key in self._dirty:
+            if key in self._loops:
+                self._issues[key] = check_loop(key, self.members(key))
+            else:
+                self._issues.pop(key, None)
+        self._dirty.clear()
+        return [issue for key in sorted(self._issues, key=lambda k: (k[0] or "", k[1])) for issue in self._issues[key]]
+
+    def save(self, path):
+        """Saves the sheets' members and hashes and the issues as last checked."""
+        self.issues()
+        payload = {
+            "version": FORMAT_VERSION,
+            "sheets": {sheet_id: {"hash": self._hashes.get(sheet_id), "members": [[*key, m] for key, m in pairs]}
+                       for sheet_id, pairs in self._sheets.items()},
+            "issues": [[*key, issues] for key, issues in self._issues.items()],
+        }
+        atomic_write(path, json.dumps(payload, separators=(",", ":"), default=str))
+
+    @classmethod
+    def load(cls, path):
+        """The index saved at `path`, or an empty one if there is none (or it is unreadable)."""
+        index = cls()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return index
+        if payload.get("version") != FORMAT_VERSION:
+            print(f"---/// Ignoring loop index {path}: unsupported version {payload.get('version')}")
+            return index
+        for sheet_id, record in payload["sheets"].items():
+            pairs = [((area, loop), member) for area, loop, member in record["members"]]
+            index._sheets[sheet_id] = pairs
+            index._hashes[sheet_id] = record["hash"]
+            for key, member in pairs:
+                index._loops.setdefault(key, {}).setdefault(sheet_id, []).append(member)
+        index._issues = {(area, loop): issues for area, loop, issues in payload["issues"]}
+        return index
@@ -1,48 +1,231 @@
 import json
 import os
+import glob
+import time
+import asyncio
 import argparse
-from analyzer import analyze_pid
-from exporter import save_to_csv
+from analyzer import get_client, DEFAULT_CONCURRENCY
+from exporter import save_to_csv, atomic_write
+from normalizer import normalize_document
+from batch_manifest import JobManifest
+from document_diff import diff_documents, changed_categories
+from loop_index import LoopIndex
+from plant_model import PlantModel
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+DEFAULT_INPUT_DIR = os.path.join("..", "data", "input_pids")
+DEFAULT_OUTPUT_DIR = os.path.join("..", "data")
+
+def collect_inputs(inputs):
+    """
+    Expands files, directories and glob patterns into a sorted, de-duplicated list of image paths.
+    Bare file names that do not exist are looked up in ../data/input_pids/ as before.
+    """
+    found = []
+    for entry in inputs:
+        if any(ch in entry for ch in "*?["):
+            candidates = glob.glob(entry, recursive=True)
+        elif os.path.isdir(entry):
+            candidates = [
+                os.path.join(root, name)
+                for root, _, names in os.walk(entry)
+                for name in names
+            ]
+        elif os.path.exists(entry):
+            candidates = [entry]
+        else:
+            candidates = [os.path.join(DEFAULT_INPUT_DIR, entry)]
+            if not os.path.exists(candidates[0]):
+                print(f"****** Error: Input file not found at {entry} or {candidates[0]}")
+                continue
+        found.extend(
+            os.path.abspath(path) for path in candidates
+            if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS)
+        )
+    return sorted(set(found))
+
+def input_root(paths):
+    """Deepest folder holding every input; output names mirror the layout below it."""
+    return os.path.commonpath([os.path.dirname(path) for path in paths]) if paths else ""
+
+def output_names(paths, manifest, root=None):
+    """
+    Output name of each input: the one the manifest recorded in an earlier run, so a
+    drawing keeps its outputs when later runs select inputs with another root, else
+    output_name below `root` (default: input_root of `paths`).
+    """
+    root = root or input_root(paths)
+    return {path: manifest.output_name(path) or output_name(path, root) for path in paths}
+
+def output_name(input_path, root=None):
+    """
+    Output file stem of a drawing: its path below `root` without the extension, so
+    a/P-1.png and b/P-1.png get a/P-1 and b/P-1. Just the file name without a root.
+    """
+    relative = os.path.relpath(input_path, root) if root else os.path.basename(input_path)
+    return os.path.splitext(relative)[0]
+
+def load_previous(json_output_path):
+    """The results written by an earlier run, or None."""
+    try:
+        with open(json_output_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def write_outputs(data, input_path, json_output_dir, csv_output_dir, root=None, name=None):
+    """
+    Writes the JSON and per-category CSV outputs atomically, named `name` (default:
+    output_name below `root`); returns their paths. When re-processing a drawing, only
+    outputs whose content changed are rewritten.
+    """
+    base_filename = name or output_name(input_path, root)
+
+    json_output_path = os.path.join(json_output_dir, base_filename + ".json")
+    previous = load_previous(json_output_path)
+    changed = None
+    if previous is not None:
+        delta = diff_documents(previous, data)
+        summary = ", ".join(
+            f"{category}: +{len(d['added'])} -{len(d['removed'])} ~{len(d['changed'])}" for category, d in delta.items()
+        )
+        print(f"---/// Changes since last run: {summary or 'none'}")
+        changed = changed_categories(previous, data)
+
+    if previous != data:
+        atomic_write(json_output_path, json.dumps(data, indent=2))
+        print(f"\n JSON results saved to {json_output_path}")
+
+    csv_paths = save_to_csv(data, csv_output_dir, base_filename, only=changed)
+    return [json_output_path] + csv_paths
+
+async def run_batch(paths, manifest, json_output_dir, csv_output_dir, concurrency, use_cache, loops=None, plant=None,
+                    names=None):
+    """
+    Analyzes `paths` with bounded concurrency, recording every outcome in the manifest.
+    Outputs are named by `names` (input path -> output name, default output_names).
+    Finished sheets are added to `loops` (a LoopIndex) and `plant` (a PlantModel) as they complete.
+    """
+    names = names or output_names(paths, manifest)
+    client = get_client()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    stats = {"done": 0, "failed": 0, "busy_s": 0.0}
+
+    async def run_one(path):
+        async with semaphore:
+            manifest.mark_running(path)
+            start = time.perf_counter()
+            try:
+                extracted_data = await client.analyze_async(path, use_cache=use_cache)
+                if not extracted_data:
+                    raise RuntimeError("AI returned no data")
+                data = normalize_document(extracted_data)
+                outputs = write_outputs(data, path, json_output_dir, csv_output_dir, name=names[path])
+                if loops is not None:
+                    loops.add_sheet(path, data)
+                if plant is not None:
+                    plant.add_sheet(path, data)
+            except Exception as e:
+                duration = time.perf_counter() - start
+                manifest.mark_failed(path, duration, e)
+                stats["failed"] += 1
+                stats["busy_s"] += duration
+                print(f"****** Failed: {path}: {e}")
+                return
+            duration = time.perf_counter() - start
+            manifest.mark_done(path, duration, outputs, output_name=names[path])
+            stats["done"] += 1
+            stats["busy_s"] += duration
+
+    await asyncio.gather(*(run_one(path) for path in paths))
+    return stats
 
 def main():
     """
     Main function to run the P&ID Digitizer application.
     """
-   
-    parser = argparse.ArgumentParser(description="Digitize P&ID diagrams using AI.")
-    parser.add_argument("filename", type=str, help="The name of the P&ID image file located in the data/input_pids/ folder.")
-    
-    args = parser.parse_args()
-    input_filename = args.filename
-
 
-    input_path = os.path.join("..", "data", "input_pids", input_filename)
-    json_output_dir = os.path.join("..", "data", "output_json")
-    csv_output_dir = os.path.join("..", "data", "output_csv") 
+    parser = argparse.ArgumentParser(description="Digitize P&ID diagrams using AI.")
+    parser.add_argument("inputs", type=str, nargs="+",
+                        help="Image files, directories or glob patterns. Bare file names are looked up in data/input_pids/.")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR,
+                        help="Root folder for output_json/, output_csv/ and the batch manifest.")
+    parser.add_argument("--manifest", default=None,
+                        help="SQLite job manifest used to resume interrupted runs (default: <output-dir>/batch_manifest.db).")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Maximum drawings analyzed at the same time.")
+    parser.add_argument("--input-root", default=None,
+                        help="Folder output names are relative to (default: the deepest folder holding every input). "
+                             "Drawings processed before keep the names recorded in the manifest.")
+    parser.add_argument("--force", action="store_true", help="Re-process drawings the manifest marks as done.")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the analysis result cache.")
 
+    args = parser.parse_args()
 
+    json_output_dir = os.path.join(args.output_dir, "output_json")
+    csv_output_dir = os.path.join(args.output_dir, "output_csv")
     os.makedirs(json_output_dir, exist_ok=True)
     os.makedirs(csv_output_dir, exist_ok=True)
-    
-  
-    if not os.path.exists(input_path):
-        print(f"****** Error: Input file not found at {input_path}")
+
+    paths = collect_inputs(args.inputs)
+    if not paths:
+        print("****** Error: No input images found.")
+        return
+
+    root = os.path.abspath(args.input_root) if args.input_root else None
+    if root and any(os.path.commonpath([root, path]) != root for path in paths):
+        print(f"****** Error: Some inputs are not inside --input-root {root}")
         return
 
+    manifest = JobManifest(args.manifest or os.path.join(args.output_dir, "batch_manifest.db"))
+    names = output_names(paths, manifest, root)
+    pending = paths if args.force else [p for p in paths if not manifest.is_done(p)]
+    skipped = len(paths) - len(pending)
+    print(f"---/// {len(paths)} drawing(s) found, {skipped} already done, {len(pending)} to process.")
 
-    extracted_data = analyze_pid(input_path)
+    # The loop index and plant model keep sheets finished in earlier runs in their own saved
+    # copies; a sheet's results are read back only when one of them does not have it yet
+    loops_path = os.path.join(args.output_dir, "loop_index.json")
+    loops = LoopIndex.load(loops_path)
+    plant_path = os.path.join(args.output_dir, "plant_model.json")
+    plant = PlantModel.load(plant_path)
+    indexed = set(loops.sheets)
+    for path in paths:
+        if path not in pending and (path not in indexed or path not in plant):
+            previous = load_previous(os.path.join(json_output_dir, names[path] + ".json"))
+            if previous:
+                loops.add_sheet(path, previous)
+                if path not in plant:
+                    plant.add_sheet(path, previous)
 
-   
-    if extracted_data:
-        base_filename = os.path.splitext(input_filename)[0]
-        
-        # Save as JSON
-        json_output_path = os.path.join(json_output_dir, base_filename + ".json")
-        with open(json_output_path, "w") as f:
-            json.dump(extracted_data, f, indent=2)
-        print(f"\n JSON results saved to {json_output_path}")
+    start = time.perf_counter()
+    try:
+        stats = asyncio.run(run_batch(
+            pending, manifest, json_output_dir, csv_output_dir, args.concurrency, not args.no_cache, loops, plant, names
+        ))
+    finally:
+        totals = manifest.counts()
+        manifest.close()
+    elapsed = time.perf_counter() - start
+
+    processed = stats["done"] + stats["failed"]
+    print("\n========== Batch summary ==========")
+    print(f" Processed: {processed}  (done {stats['done']}, failed {stats['failed']}, skipped {skipped})")
+    print(f" Wall time: {elapsed:.1f} s")
+    if processed:
+        print(f" Throughput: {processed / elapsed * 60:.1f} drawings/min")
+        print(f" Mean time per drawing: {stats['busy_s'] / processed:.1f} s")
+    print(f" Manifest totals: {totals}")
+
+    loop_issues = loops.issues()
+    report_path = os.path.join(args.output_dir, "loop_report.json")
+    atomic_write(report_path, json.dumps({"loops": len(loops), "issues": loop_issues}, indent=2))
+    print(f" Control loops: {len(loops)} across {len(loops.sheets)} sheet(s), {len(loop_issues)} issue(s) -> {report_path}")
+    loops.save(loops_path)
 
-        save_to_csv(extracted_data, csv_output_dir, base_filename)
+    plant.save(plant_path)
+    print(f" Plant model: {len(plant)} sheet(s), {plant.graph.number_of_nodes()} nodes, "
+          f"{plant.stitched_edges()} cross-sheet connection(s) -> {plant_path}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import threading
+import time
+
+
+class VertexBackend:
+    """
+    Gemini on Vertex AI. The SDK is initialised and the model object built once,
+    when the backend is created; every request afterwards reuses them.
+    `credentials_info` is a service account key (dict) used in memory; without it the
+    SDK falls back to application default credentials.
+    """
+
+    def __init__(self, project_id, location, model_id, credentials_info=None):
+        import vertexai
+        from vertexai.generative_models import GenerativeModel, Part, HarmCategory, HarmBlockThreshold
+
+        credentials = None
+        if credentials_info:
+            from google.oauth2 import service_account
+            credentials = service_account.Credentials.from_service_account_info(
+                credentials_info, scopes=["https://www.googleapis.com/auth/cloud-platform"]
+            )
+        vertexai.init(project=project_id, location=location, credentials=credentials)
+        self.model_id = model_id
+        self._model = GenerativeModel(model_id)
+        self._part = Part
+        self._safety_settings = {
+            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+        }
+
+    def _contents(self, image_bytes, mime, prompt):
+        return [self._part.from_data(data=image_bytes, mime_type=mime), prompt]
+
+    def generate(self, image_bytes, mime, prompt):
+        """Blocking call; returns the response text."""
+        response = self._model.generate_content(
+            self._contents(image_bytes, mime, prompt), safety_settings=self._safety_settings
+        )
+        return response.text
+
+    async def generate_async(self, image_bytes, mime, prompt):
+        """Non-blocking call built on the SDK's async generate; returns the response text."""
+        response = await self._model.generate_content_async(
+            self._contents(image_bytes, mime, prompt), safety_settings=self._safety_settings
+        )
+        return response.text
+
+    def generate_stream(self, image_bytes, mime, prompt):
+        """Streaming call; yields response text chunks as the model produces them."""
+        responses = self._model.generate_content(
+            self._contents(image_bytes, mime, prompt), safety_settings=self._safety_settings, stream=True
+        )
+        for chunk in responses:
+            text = chunk.text
+            if text:
+                yield text
+
+
+class LocalBackend:
+    """
+    Offline stand-in for the model, used for tests and benchmarks.
+
+    Returns `response_text` (or `responder(image_bytes, prompt)` when given) after
+    sleeping `latency` seconds, and records how many requests were in flight at once.
+    Streaming yields the response in `chunk_size` pieces spread over `latency`.
+    """
+
+    model_id = "local-stand-in"
+
+    def __init__(self, response_text=None, latency=0.0, responder=None, chunk_size=64):
+        if response_text is None:
+            response_text = json.dumps({"metadata": {"drawing_title": None}, "equipment": []})
+        self.response_text = response_text
+        self.latency = latency
+        self.responder = responder
+        self.chunk_size = chunk_size
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _enter(self):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _respond(self, image_bytes, prompt):
+        if self.responder:
+            return self.responder(image_bytes, prompt)
+        return self.response_text
+
+    def generate(self, image_bytes, mime, prompt):
+        self._enter()
+        try:
+            time.sleep(self.latency)
+            return self._respond(image_bytes, prompt)
+        finally:
+            self._exit()
+
+    async def generate_async(self, image_bytes, mime, prompt):
+        self._enter()
+        try:
+            await asyncio.sleep(self.latency)
+            return self._respond(image_bytes, prompt)
+        finally:
+            self._exit()
+
+    def generate_stream(self, image_bytes, mime, prompt):
+        self._enter()
+        try:
+            text = self._respond(image_bytes, prompt)
+            pieces = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+            for piece in pieces:
+                time.sleep(self.latency / max(1, len(pieces)))
+                yield piece
+        finally:
+            self._exit()
+
+
+class ThrottlingBackend:
+    """
+    Fake endpoint that injects throttling in front of another backend.
+
+    `script` is consumed one entry per request: None lets the request through, an int
+    status (e.g. 429 or 503) or a (status, retry_after) tuple raises ThrottledError.
+    Once the script is exhausted every request succeeds, so tests are deterministic.
+    """
+
+    def __init__(self, inner, script=()):
+        self.inner = inner
+        self.model_id = inner.model_id
+        self.script = list(script)
+        self.attempts = 0
+        self._lock = threading.Lock()
+
+    def _maybe_throttle(self):
+        from request_scheduler import ThrottledError
+
+        with self._lock:
+            self.attempts += 1
+            outcome = self.script.pop(0) if self.script else None
+        if outcome is None:
+            return
+        status, retry_after = outcome if isinstance(outcome, tuple) else (outcome, None)
+        raise ThrottledError(status, retry_after)
+
+    def generate(self, image_bytes, mime, prompt):
+        self._maybe_throttle()
+        return self.inner.generate(image_bytes, mime, prompt)
+
+    async def generate_async(self, image_bytes, mime, prompt):
+        self._maybe_throttle()
+        return await self.inner.generate_async(image_bytes, mime, prompt)
+
+    def generate_stream(self, image_bytes, mime, prompt):
+        self._maybe_throttle()
+        yield from self.inner.generate_stream(image_bytes, mime, prompt)
@@ -1,9 +1,11 @@
 # normalizer.py
-import re
 import copy
 
-# --- ISA tag patterns: FT-101, TIC-203A, PSV-1001 etc.
-TAG_RE = re.compile(r"^([A-Z]{1,4})[-\s]?(\d{2,5}[A-Z]?)$")
+from postprocessing import collect_tags, postprocess_item
+from tag_grammar import parse_instrument, parse_line_number
+from geometry import apply_geometry
+from spatial_index import infer_associations
+from topology import build_topology
 
 ISA_FUNCTION_MAP = {
     # leading letter(s) -> measured variable
@@ -42,12 +44,11 @@ LINE_STYLE_TO_TYPE = {
 }
 
 def parse_tag(tag: str):
-    if not tag or not isinstance(tag, str):
+    # ISA tags (FT-101, TIC-203A, PSV-1001 ...) via the shared grammar in tag_grammar
+    parsed = parse_instrument(tag)
+    if not parsed:
         return None, None
-    m = TAG_RE.match(tag.strip())
-    if not m:
-        return None, None
-    return m.group(1), m.group(2)  # (prefix, number)
+    return parsed["function"], parsed["loop_id"]  # (prefix, loop number)
 
 def infer_measured_variable(tag_prefix: str):
     if not tag_prefix: return None
@@ -57,8 +58,8 @@ def infer_measured_variable(tag_prefix: str):
     # try first letter
     return ISA_FUNCTION_MAP.get(tag_prefix[0], None)
 
-def normalize_instrument(inst):
-    inst = copy.deepcopy(inst)
+# --- In-place enrichment; the normalize_* wrappers below copy first ---
+def _enrich_instrument(inst):
     prefix, loop = parse_tag(inst.get("tag",""))
     inst["loop_id"] = inst.get("loop_id") or loop
     if not inst.get("measured_variable"):
@@ -73,21 +74,24 @@ def normalize_instrument(inst):
         else: inst["isa_function"] = None
     return inst
 
-def normalize_valve(v):
-    v = copy.deepcopy(v)
+def _enrich_valve(v):
     v["standard_reference"] = VALVE_TYPE_TO_ISA.get(v.get("type",""), "ISA-5.1")
     if "fail_position" not in v: v["fail_position"] = None
     return v
 
-def normalize_equipment(eq):
-    eq = copy.deepcopy(eq)
+def _enrich_equipment(eq):
     eq["standard_reference"] = "ISO 15926"
     eq["iso15926_class"] = EQUIPMENT_TO_ISO15926.get(eq.get("type",""), "Equipment")
     return eq
 
-def normalize_line(ln):
-    ln = copy.deepcopy(ln)
+def _enrich_line(ln):
     ln["standard_reference"] = "ISO 10628"
+    # 4"-P-1001-A1A -> nominal_size, service, spec (model values win)
+    parts = parse_line_number(ln.get("line_number_tag"))
+    if parts:
+        for key in ("nominal_size", "service", "spec"):
+            if not ln.get(key) and parts[key]:
+                ln[key] = parts[key]
     if not ln.get("line_type"):
         hint = (ln.get("style_hint") or "").lower()
         for k,v in LINE_STYLE_TO_TYPE.items():
@@ -98,6 +102,27 @@ def normalize_line(ln):
             ln["line_type"] = "unknown"
     return ln
 
+ENRICHERS = {
+    "equipment": _enrich_equipment,
+    "valves": _enrich_valve,
+    "instrumentation": _enrich_instrument,
+    "lines": _enrich_line,
+}
+PASS_THROUGH_CATEGORIES = ["junctions","control_relationships","annotations","safety_devices","unrecognized_symbols"]
+STANDARDS_REFERENCED = ["ISA-5.1","ISO 10628","ISO 14617","ISO 15926"]
+
+def normalize_instrument(inst):
+    return _enrich_instrument(copy.deepcopy(inst))
+
+def normalize_valve(v):
+    return _enrich_valve(copy.deepcopy(v))
+
+def normalize_equipment(eq):
+    return _enrich_equipment(copy.deepcopy(eq))
+
+def normalize_line(ln):
+    return _enrich_line(copy.deepcopy(ln))
+
 def attach_flags(item):
     flags = []
     if "bounding_box" in item:
@@ -117,21 +142,79 @@ def attach_flags(item):
         item["flags"] = sorted(list(set(item.get("flags", []) + flags)))
     return item
 
-def normalize_all(data):
-    data = copy.deepcopy(data)
-    data["metadata"] = data.get("metadata", {})
-    data["metadata"]["standards_referenced"] = ["ISA-5.1","ISO 10628","ISO 14617","ISO 15926"]
+def attach_tag_flags(item):
+    """The non-geometric part of attach_flags; box checks run in bulk in geometry.apply_geometry."""
+    if "tag" in item and (item.get("tag") in [None,"","Unknown","UNK"]):
+        item["flags"] = sorted(list(set(item.get("flags", []) + ["missing_tag"])))
+    return item
+
+def _normalize_metadata(metadata):
+    """Copies metadata into a fresh dict; a list of partial objects is merged."""
+    if isinstance(metadata, list):
+        merged = {}
+        for part in metadata:
+            if isinstance(part, dict):
+                merged.update(part)
+        metadata = merged
+    metadata = dict(metadata) if isinstance(metadata, dict) else {}
+    metadata["standards_referenced"] = list(STANDARDS_REFERENCED)
+    return metadata
+
+def normalize_item(category, item, used=None, clean_tags=True, check_geometry=True):
+    """
+    A normalized shallow copy of one item: tag cleaning (unique within `used`), enrichment
+    and flags. Sheet-wide stages (geometry, topology, inferred links) are not run; with
+    check_geometry the box flags the item already carries are kept as they are.
+    """
+    item = dict(item)
+    if clean_tags:
+        postprocess_item(category, item, used)
+    enrich = ENRICHERS.get(category)
+    if enrich:
+        enrich(item)
+    return attach_tag_flags(item) if check_geometry else attach_flags(item)
 
-    data["equipment"] = [attach_flags(normalize_equipment(e)) for e in data.get("equipment", [])]
-    data["valves"] = [attach_flags(normalize_valve(v)) for v in data.get("valves", [])]
-    data["instrumentation"] = [attach_flags(normalize_instrument(i)) for i in data.get("instrumentation", [])]
-    data["lines"] = [attach_flags(normalize_line(l)) for l in data.get("lines", [])]
+def normalize_document(data, clean_tags=True, check_geometry=True, infer_topology=True, infer_links=True):
+    """
+    Single pass over a document: tag cleaning (postprocessing rules), ISA/ISO enrichment
+    and flagging, item by item, followed by the vectorized bounding-box checks of
+    geometry.apply_geometry (clipping, overlaps, duplicates) over the whole sheet,
+    line connectivity from drawn endpoints (topology.build_topology) and
+    proximity-based filling of missing links (spatial_index.infer_associations).
+
+    Copy-on-write: the input is never modified. Each item is copied once, shallowly,
+    before it is changed; nested values (bounding boxes, lists of tags) are shared with
+    the input because no stage mutates them. Equivalent to
+    normalize_all(postprocess_pid_data(data)) without the deep copies
+    (with check_geometry, infer_topology and infer_links off, exactly so).
+    """
+    if not isinstance(data, dict):
+        return data
 
-    # Pass-through categories
-    for k in ["junctions","control_relationships","annotations","safety_devices","unrecognized_symbols"]:
-        data[k] = [attach_flags(x) for x in data.get(k, [])]
+    out = dict(data)
+    used = collect_tags(data) if clean_tags else None
+    out["metadata"] = _normalize_metadata(data.get("metadata"))
+    for category in list(ENRICHERS) + PASS_THROUGH_CATEGORIES:
+        items = []
+        for item in data.get(category) or []:
+            if not isinstance(item, dict):
+                continue
+            items.append(normalize_item(category, item, used, clean_tags, check_geometry))
+        out[category] = items
+    if check_geometry:
+        apply_geometry(out)
+    if infer_topology:
+        build_topology(out)
+    if infer_links:
+        infer_associations(out)
+    return out
 
-    return data
+def normalize_all(data):
+    """
+    Enrichment and per-item flagging only, as before normalize_document: no tag cleaning,
+    no sheet-wide geometry checks, topology or link inference.
+    """
+    return normalize_document(data, clean_tags=False, check_geometry=False, infer_topology=False, infer_links=False)
 
 # --- ISO 15926 export (lean JSON) ---
 def to_iso15926(data):
@@ -0,0 +1,312 @@
+"""
+Plant-wide process graph stitched together from per-sheet results.
+
+Each sheet contributes its tagged items as nodes (equipment, instruments and valves are
+keyed by tag plant-wide, junctions by sheet and junction id) and its lines as edges.
+Lines that leave the sheet (one end UNKNOWN) and off-page connectors (junctions with
+off_page set) are entered in a hash index by line number and by connector key. Entries
+of the same key on different sheets are stitched with edges marked "stitched".
+Adding or revising a sheet replaces only that sheet's nodes and edges and re-stitches
+only the keys it touches. The model is saved as JSON, stitches included, so a large unit
+loads without matching again. save_sheet adds one sheet to the saved model, reloading
+it under a lock first so concurrent sessions do not drop each other's sheets.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import networkx as nx
+
+from exporter import atomic_write
+from postprocessing import TAG_KEYS
+from process_graph import NODE_CATEGORIES, document_hash, normalize_tag
+
+PLANT_MODEL_PATH = os.getenv("PID_PLANT_MODEL_PATH", os.path.join("data", "plant_model.json"))
+FORMAT_VERSION = 1
+
+_save_lock = threading.Lock()
+
+
+def sheet_key(data, upload=None):
+    """
+    Plant model key of a sheet: its drawing number (a new revision replaces the old one).
+    When the title block was not read, a hash of the uploaded file's bytes, so
+    re-analysing the same upload replaces its sheet; the content hash is only used
+    when the upload is not known.
+    """
+    metadata = data.get("metadata") or {}
+    drawing = normalize_tag(metadata.get("drawing_number"))
+    if drawing:
+        return drawing
+    if upload is not None:
+        return f"upload:{hashlib.sha1(upload).hexdigest()[:16]}"
+    return f"sha1:{document_hash(data)[:16]}"
+
+
+def connector_key(drawing, junction):
+    """
+    Index key of an off-page connector: the two drawings it joins (in either order) and
+    its label, so both halves of a connector pair get the same key.
+    """
+    ref = normalize_tag(junction.get("page_ref"))
+    if not ref:
+        return None
+    label = normalize_tag(junction.get("label")) or ""
+    return "connector:" + "|".join(sorted([drawing, ref]) + [label])
+
+
+def sheet_record(sheet_id, data):
+    """
+    A sheet's contribution to the plant: nodes [node, category key, item], edges
+    [source, destination, line number] and index entries [key, node, role]. Role is
+    "out" for a line leaving the sheet or a connector lines flow into, "in" for the
+    reverse, and None when a connector's direction cannot be told.
+    """
+    metadata = data.get("metadata") or {}
+    drawing = normalize_tag(metadata.get("drawing_number")) or normalize_tag(sheet_id)
+    nodes, local = [], {}
+    for key in NODE_CATEGORIES:
+        tag_key = TAG_KEYS.get(key, "tag")
+        for item in data.get(key) or []:
+            if not isinstance(item, dict):
+                continue
+            tag = normalize_tag(item.get(tag_key))
+            if tag is None:
+                continue
+            # Junction ids are only unique within their sheet
+            node = f"{sheet_id}:{tag}" if key == "junctions" else tag
+            local.setdefault(tag, node)
+            nodes.append([node, key, item])
+
+    edges, entries, roles = [], [], {}
+    for item in data.get("lines") or []:
+        if not isinstance(item, dict):
+            continue
+        source, destination = normalize_tag(item.get("source_tag")), normalize_tag(item.get("destination_tag"))
+        source, destination = local.get(source, source), local.get(destination, destination)
+        line = normalize_tag(item.get("line_number_tag"))
+        if source and destination:
+            edges.append([source, destination, line or ""])
+            roles.setdefault(destination, set()).add("out")
+            roles.setdefault(source, set()).add("in")
+        elif line and (source or destination):
+            entries.append([f"line:{line}", source or destination, "out" if source else "in"])
+
+    for item in data.get("junctions") or []:
+        if isinstance(item, dict) and item.get("off_page"):
+            key = connector_key(drawing, item)
+            node = local.get(normalize_tag(item.get("junction_id")))
+            if key and node:
+                role = roles.get(node, set())
+                entries.append([key, node, next(iter(role)) if len(role) == 1 else None])
+    return {"drawing": drawing, "nodes": nodes, "edges": edges, "entries": entries}
+
+
+def stitch(key, entries):
+    """
+    Stitch edges for one index key from its [sheet, node, role] entries: every "out"
+    end meets every "in" end of another sheet. Connectors of unknown direction are
+    joined both ways.
+    """
+    label = key.split(":", 1)[1] if key.startswith("line:") else ""
+    edges = []
+    for sheet_a, node_a, role_a in entries:
+        for sheet_b, node_b, role_b in entries:
+            if sheet_a == sheet_b or node_a == node_b:
+                continue
+            # out -> in; an end of unknown direction pairs with either
+            if role_a != "in" and role_b != "out":
+                edges.append([node_a, node_b, label])
+    return edges
+
+
+class PlantModel:
+    """
+    The plant graph (a networkx MultiDiGraph, see `graph`) built from sheets added one by
+    one. add_sheet replaces a sheet's contribution and re-stitches only the index keys
+    it had or has; save and load keep the whole model, stitches included.
+    """
+
+    def __init__(self):
+        self.graph = nx.MultiDiGraph()
+        self._sheets = {}     # sheet id -> sheet record
+        self._index = {}      # index key -> {sheet id: [[node, role]]}
+        self._stitches = {}   # index key -> stitch edges
+        self._defined = {}    # node -> {sheet id: (category key, item)}
+        self._refs = {}       # node -> number of records and edges using it
+
+    def __len__(self):
+        return len(self._sheets)
+
+    def __contains__(self, sheet_id):
+        return sheet_id in self._sheets
+
+    @property
+    def sheets(self):
+        return list(self._sheets)
+
+    def stitched_edges(self):
+        return sum(len(edges) for edges in self._stitches.values())
+
+    def _ref(self, node, delta):
+        count = self._refs.get(node, 0) + delta
+        if count > 0:
+            self._refs[node] = count
+            if node not in self.graph:
+                # Referenced (by a line or stitch) but maybe not drawn on any sheet yet
+                self.graph.add_node(node, category=None, category_key=None, attributes={}, sheets=[])
+        else:
+            self._refs.pop(node, None)
+            if node in self.graph:
+                self.graph.remove_node(node)
+
+    def _node_attrs(self, node):
+        """Node attributes from the first sheet that draws the node."""
+        defined = self._defined.get(node)
+        if not defined:
+            return {"category": None, "category_key": None, "attributes": {}, "sheets": []}
+        key, item = next(iter(defined.values()))
+        return {"category": NODE_CATEGORIES[key], "category_key": key, "attributes": item,
+                "sheets": sorted(map(str, defined))}
+
+    def _refresh_node(self, node):
+        if node in self.graph:
+            attrs = self.graph.nodes[node]
+            attrs.clear()
+            attrs.update(self._node_attrs(node))
+
+    def _apply(self, sheet_id, record, sign):
+        touched = set()
+        for node, key, item in record["nodes"]:
+            if sign > 0:
+                self._ref(node, 1)
+                self._defined.setdefault(node, {}).setdefault(sheet_id, (key, item))
+            else:
+                self._defined.get(node, {}).pop(sheet_id, None)
+                if not self._defined.get(node):
+                    self._defined.pop(node, None)
+            touched.add(node)
+        for i, (source, destination, line) in enumerate(record["edges"]):
+            edge_key = f"{sheet_id}|{i}"
+            if sign > 0:
+                self._ref(source, 1)
+                self._ref(destination, 1)
+                self.graph.add_edge(source, destination, key=edge_key, kind="line", label=line,
+                                    sheet=sheet_id, stitched=False)
+            else:
+                self.graph.remove_edge(source, destination, key=edge_key)
+                self._ref(source, -1)
+                self._ref(destination, -1)
+        for key, node, role in record["entries"]:
+            if sign > 0:
+                self._ref(node, 1)
+                self._index.setdefault(key, {}).setdefault(sheet_id, []).append([node, role])
+            else:
+                self._index.get(key, {}).pop(sheet_id, None)
+                if not self._index.get(key):
+                    self._index.pop(key, None)
+                self._ref(node, -1)
+        if sign < 0:
+            for node, _, _ in record["nodes"]:
+                self._ref(node, -1)
+        for node in touched:
+            self._refresh_node(node)
+        return {key for key, _, _ in record["entries"]}
+
+    def _set_stitches(self, key, edges):
+        for i, (source, destination, _) in enumerate(self._stitches.pop(key, [])):
+            self.graph.remove_edge(source, destination, key=f"stitch|{key}|{i}")
+            self._ref(source, -1)
+            self._ref(destination, -1)
+        if edges:
+            self._stitches[key] = edges
+        for i, (source, destination, label) in enumerate(edges):
+            self._ref(source, 1)
+            self._ref(destination, 1)
+            self.graph.add_edge(source, destination, key=f"stitch|{key}|{i}", kind="line", label=label,
+                                sheet=None, stitched=True)
+
+    def add_sheet(self, sheet_id, data):
+        """
+        Adds a sheet, or replaces it if it was added before, and re-stitches the line
+        numbers and connectors it touches. Returns the number of index keys re-stitched.
+        """
+        dirty = self.remove_sheet(sheet_id, restitch=False)
+        record = sheet_record(sheet_id, data)
+        self._sheets[sheet_id] = record
+        dirty |= self._apply(sheet_id, record, 1)
+        for key in dirty:
+            entries = [[sheet, node, role] for sheet, pairs in self._index.get(key, {}).items() for node, role in pairs]
+            self._set_stitches(key, stitch(key, entries))
+        return len(dirty)
+
+    def remove_sheet(self, sheet_id, restitch=True):
+        """Removes a sheet's nodes, edges and stitches; returns the index keys it had."""
+        record = self._sheets.pop(sheet_id, None)
+        if record is None:
+            return set()
+        # Stitches go first: they hold references to this sheet's nodes
+        keys = {key for key, _, _ in record["entries"]}
+        for key in keys:
+            self._set_stitches(key, [])
+        self._apply(sheet_id, record, -1)
+        if restitch:
+            for key in keys:
+                entries = [[sheet, node, role] for sheet, pairs in self._index.get(key, {}).items() for node, role in pairs]
+                self._set_stitches(key, stitch(key, entries))
+        return keys
+
+    def save(self, path=PLANT_MODEL_PATH):
+        payload = {"version": FORMAT_VERSION, "sheets": self._sheets, "stitches": self._stitches}
+        atomic_write(path, json.dumps(payload, separators=(",", ":"), default=str))
+
+    @classmethod
+    def load(cls, path=PLANT_MODEL_PATH):
+        """The model saved at `path`, or an empty one if there is none (or it is unreadable)."""
+        model = cls()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return model
+        if payload.get("version") != FORMAT_VERSION:
+            print(f"---/// Ignoring plant model {path}: unsupported version {payload.get('version')}")
+            return model
+        # Bulk construction from the saved records and stitches: no matching, no per-edge bookkeeping
+        edges = []
+        for sheet_id, record in payload["sheets"].items():
+            model._sheets[sheet_id] = record
+            for node, key, item in record["nodes"]:
+                model._defined.setdefault(node, {}).setdefault(sheet_id, (key, item))
+                model._refs[node] = model._refs.get(node, 0) + 1
+            for i, (source, destination, line) in enumerate(record["edges"]):
+                edges.append((source, destination, f"{sheet_id}|{i}",
+                              {"kind": "line", "label": line, "sheet": sheet_id, "stitched": False}))
+            for key, node, role in record["entries"]:
+                model._index.setdefault(key, {}).setdefault(sheet_id, []).append([node, role])
+                model._refs[node] = model._refs.get(node, 0) + 1
+        for key, stitches in payload["stitches"].items():
+            model._stitches[key] = stitches
+            for i, (source, destination, label) in enumerate(stitches):
+                edges.append((source, destination, f"stitch|{key}|{i}",
+                              {"kind": "line", "label": label, "sheet": None, "stitched": True}))
+        for source, destination, _, _ in edges:
+            model._refs[source] = model._refs.get(source, 0) + 1
+            model._refs[destination] = model._refs.get(destination, 0) + 1
+        model.graph.add_nodes_from((node, model._node_attrs(node)) for node in model._refs)
+        model.graph.add_edges_from(edges)
+        return model
+
+
+def save_sheet(sheet_id, data, path=PLANT_MODEL_PATH):
+    """
+    Adds (or replaces) one sheet in the model saved at `path`. The file is reloaded and
+    saved under a lock, so sheets other sessions saved in the meantime are kept.
+    Returns the merged model.
+    """
+    with _save_lock:
+        model = PlantModel.load(path)
+        model.add_sheet(sheet_id, data)
+        model.save(path)
+    return model
@@ -1,25 +1,133 @@
-import re
-import uuid
+import hashlib
+import itertools
+import json
 
-def normalize_line_number(tag: str) -> str:
+from tag_grammar import canonical_instrument_tag, format_instrument_tag
+
+# Keys that hold an item's tag, per category
+TAG_KEYS = {"lines": "line_number_tag", "junctions": "junction_id"}
+# Re-hash attempts before falling back to a numeric suffix on ID collisions
+ID_HASH_ATTEMPTS = 16
+
+def stable_digest(category: str, item: dict = None, salt: int = 0) -> str:
+    """
+    Content-derived hex digest of an item: its category, bounding box and type.
+    The same drawing therefore always yields the same synthesized IDs.
+    """
+    item = item or {}
+    payload = json.dumps(
+        [category, item.get("bounding_box"), item.get("type") or item.get("line_type"), salt],
+        default=str,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def _claim(candidates, used):
+    """Returns the first candidate not in `used` (if given) and records it there."""
+    for candidate in candidates:
+        if used is None or candidate not in used:
+            break
+    if used is not None:
+        used.add(candidate)
+    return candidate
+
+def _with_suffixes(base):
+    yield base
+    for n in itertools.count(2):
+        yield f"{base}-{n}"
+
+def _hashed_candidates(make, category, item):
+    """IDs built by `make(digest)`, re-hashed with a salt on collision, then suffixed."""
+    for salt in range(ID_HASH_ATTEMPTS):
+        yield make(stable_digest(category, item, salt))
+    yield from _with_suffixes(make(stable_digest(category, item)))
+
+def stable_id(prefix: str, category: str, item: dict = None, used: set = None) -> str:
+    """Deterministic `PREFIX-XXXX` ID for an item without a tag, unique within `used`."""
+    return _claim(_hashed_candidates(lambda d: f"{prefix}-{d[:4].upper()}", category, item), used)
+
+def collect_tags(data: dict) -> set:
+    """All tags already present in a document, so synthesized IDs never collide with them."""
+    used = set()
+    for category, items in data.items():
+        if not isinstance(items, list):
+            continue
+        key = TAG_KEYS.get(category, "tag")
+        for item in items:
+            if isinstance(item, dict) and isinstance(item.get(key), str) and item[key].strip():
+                used.add(item[key].strip().upper())
+    return used
+
+def normalize_line_number(tag: str, item: dict = None, used: set = None) -> str:
     """
     Normalize line numbers to a consistent format.
     """
     if not tag or not isinstance(tag, str) or tag.strip() == "":
-        return f'UNSPECIFIED-LINE-{uuid.uuid4().hex[:4].upper()}'
+        return stable_id("UNSPECIFIED-LINE", "lines", item, used)
     return tag.strip().upper()
 
 def normalize_instrument_tag(tag: str, measured_variable: str = None,
-                             function: str = None, loop_id: str = None) -> str:
+                             function: str = None, loop_id: str = None,
+                             item: dict = None, used: set = None) -> str:
     """
-    Normalize instrument tags to ISA convention if the tag is missing.
+    Normalize instrument tags to ISA convention: existing tags are respelled through the
+    shared tag grammar (ft 101 -> FT-101), missing ones are built from the measured
+    variable, function and loop.
     """
     if not tag or not isinstance(tag, str) or tag.strip() == "":
-        loop_number = str(loop_id) if loop_id else str(uuid.uuid4().int % 1000).zfill(3)
         measured_var = (measured_variable[0].upper() if measured_variable else "X")
         func = (function[0].upper() if function else "I")
-        return f"{measured_var}{func}-{loop_number}"
-    return str(tag).strip().upper()
+        if loop_id:
+            candidates = _with_suffixes(format_instrument_tag(f"{measured_var}{func}", loop_id))
+        else:
+            candidates = _hashed_candidates(
+                lambda d: format_instrument_tag(f"{measured_var}{func}", str(int(d, 16) % 1000).zfill(3)),
+                "instrumentation", item
+            )
+        return _claim(candidates, used)
+    return canonical_instrument_tag(tag)
+
+def postprocess_item(category: str, item: dict, used: set = None) -> dict:
+    """
+    Standardizes a single item of the given category in place and returns it.
+    Categories without cleaning rules are returned unchanged. Missing tags are
+    replaced by deterministic IDs that are unique within `used` (the document's tags).
+    """
+    if category == "lines":
+        item["line_number_tag"] = normalize_line_number(item.get("line_number_tag"), item, used)
+        item["source_tag"] = str(item.get("source_tag") or "UNKNOWN").upper()
+        item["destination_tag"] = str(item.get("destination_tag") or "UNKNOWN").upper()
+        item["line_type"] = str(item.get("line_type") or "unknown").strip().lower()
+
+    elif category == "instrumentation":
+        item["tag"] = normalize_instrument_tag(
+            item.get("tag"),
+            item.get("measured_variable"),
+            item.get("type"),
+            item.get("loop_id"),
+            item,
+            used,
+        )
+
+    elif category == "equipment":
+        item["tag"] = str(item.get("tag") or stable_id("EQUIP", category, item, used)).upper()
+
+    elif category == "valves":
+        item["tag"] = str(item.get("tag") or stable_id("VALVE", category, item, used)).upper()
+
+    return item
+
+def postprocess_category(category: str, items, used: set = None):
+    """
+    Standardizes the items of a single category in place, so streamed categories
+    can be cleaned as soon as they arrive. Returns the items.
+    """
+    if not isinstance(items, list):
+        return items
+    if used is None:
+        used = collect_tags({category: items})
+    for item in items:
+        postprocess_item(category, item, used)
+    return items
 
 def postprocess_pid_data(data: dict) -> dict:
     """
@@ -38,25 +146,9 @@ def postprocess_pid_data(data: dict) -> dict:
             data[key] = [] if key != "metadata" else {}
 
     # --- Standardize Items in Each Category ---
-    for item in data.get("lines", []):
-        item["line_number_tag"] = normalize_line_number(item.get("line_number_tag"))
-        item["source_tag"] = str(item.get("source_tag") or "UNKNOWN").upper()
-        item["destination_tag"] = str(item.get("destination_tag") or "UNKNOWN").upper()
-        item["line_type"] = str(item.get("line_type") or "unspecified").strip().lower()
-
-    for item in data.get("instrumentation", []):
-        item["tag"] = normalize_instrument_tag(
-            item.get("tag"),
-            item.get("measured_variable"),
-            item.get("type"),
-            item.get("loop_id")
-        )
-
-    for item in data.get("equipment", []):
-        item["tag"] = str(item.get("tag") or f"EQUIP-{uuid.uuid4().hex[:4].upper()}").upper()
-    
-    for item in data.get("valves", []):
-        item["tag"] = str(item.get("tag") or f"VALVE-{uuid.uuid4().hex[:4].upper()}").upper()
+    used = collect_tags(data)
+    for key in ("lines", "instrumentation", "equipment", "valves"):
+        postprocess_category(key, data.get(key, []), used)
 
     print("---------------/////////// Postprocessing completed.")
     return data
@@ -1,45 +1,184 @@
 import cv2
 import numpy as np
 import os
+from concurrent.futures import ProcessPoolExecutor
 
-def preprocess_image(image_path):
+# --- TILED PREPROCESSING SETTINGS ---
+# Sheets larger than this (in pixels) are split into tiles and processed in a process pool.
+TILED_MIN_PIXELS = int(os.getenv("PID_TILED_MIN_PIXELS", 16_000_000))
+TILE_SIZE = int(os.getenv("PID_TILE_SIZE", 2048))
+PREPROCESS_WORKERS = int(os.getenv("PID_PREPROCESS_WORKERS", os.cpu_count() or 1))
+
+# Each tile is processed with a halo of neighbouring pixels so the kept core sees the same
+# neighbourhood as the monolithic pass. The halo is the chain's reach (see chain_reach; 20 px
+# with the default parameters) plus this margin, which makes tiled output match the
+# monolithic output (tolerance: <= 0.1% differing pixels, in practice identical).
+TILE_HALO_MARGIN = 12
+TILED_TOLERANCE = 0.001
+
+# Parameters of the preprocessing chain; part of the analysis cache key, so changing any of
+# them invalidates cached model results.
+PREPROCESS_PARAMS = {
+    "denoise_h": 10,
+    "template_window": 7,
+    "search_window": 21,
+    "threshold_block": 15,
+    "threshold_c": 4,
+    "open_kernel": 1,
+}
+
+
+def chain_reach(params=None):
+    """
+    How far (px) a pixel of the chain's output depends on its input: the filters run one
+    after another, so their radii add up (searchWindowSize//2 + templateWindowSize//2 for
+    the denoise, blockSize//2 for the threshold, the opening kernel's radius).
+    """
+    p = params or PREPROCESS_PARAMS
+    return (p["search_window"] // 2 + p["template_window"] // 2
+            + p["threshold_block"] // 2 + p["open_kernel"] // 2)
+
+
+def _preprocess_chain(img):
+    """
+    Runs the denoise -> adaptive threshold -> morphology chain on a grayscale array.
+    """
+    p = PREPROCESS_PARAMS
+    # 1. Denoising to reduce random noise from scans
+    denoised_img = cv2.fastNlMeansDenoising(
+        img, None, h=p["denoise_h"],
+        templateWindowSize=p["template_window"], searchWindowSize=p["search_window"]
+    )
+
+    # 2. Adaptive Thresholding is excellent for handling uneven lighting
+    binary_img = cv2.adaptiveThreshold(
+        denoised_img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY, p["threshold_block"], p["threshold_c"]
+    )
+
+    # 3. Morphological Operations to clean up small specks and dots
+    kernel = np.ones((p["open_kernel"], p["open_kernel"]), np.uint8)
+    return cv2.morphologyEx(binary_img, cv2.MORPH_OPEN, kernel, iterations=1)
+
+
+def _tile_grid(height, width, tile_size, overlap):
+    """
+    Yields (core, padded) windows as (y1, y2, x1, x2) tuples covering the image.
+    The core windows tile the image exactly; padded windows extend them by `overlap` px.
+    """
+    for y in range(0, height, tile_size):
+        for x in range(0, width, tile_size):
+            core = (y, min(y + tile_size, height), x, min(x + tile_size, width))
+            padded = (
+                max(core[0] - overlap, 0), min(core[1] + overlap, height),
+                max(core[2] - overlap, 0), min(core[3] + overlap, width),
+            )
+            yield core, padded
+
+
+def _process_tile(args):
+    """Worker entry point: processes one padded tile and returns its core region."""
+    tile, core_offset = args
+    cy1, cy2, cx1, cx2 = core_offset
+    return _preprocess_chain(tile)[cy1:cy2, cx1:cx2]
+
+
+def preprocess_tiled(img, workers=None, tile_size=None, overlap=None):
+    """
+    Tile-parallel version of the preprocessing chain for large-format scans.
+    - Splits the sheet into tiles with an overlapping halo (`overlap`, default the chain's
+      reach under the current PREPROCESS_PARAMS plus TILE_HALO_MARGIN).
+    - Processes tiles in a process pool (`workers`, default PREPROCESS_WORKERS).
+    - Stitches the tile cores back together; the halo is discarded so seams carry no border artifacts.
+    """
+    workers = workers or PREPROCESS_WORKERS
+    tile_size = tile_size or TILE_SIZE
+    reach = chain_reach()
+    if overlap is None:
+        overlap = reach + TILE_HALO_MARGIN
+    elif overlap < reach:
+        raise ValueError(f"Tile overlap {overlap} px is smaller than the preprocessing chain's reach ({reach} px)")
+    height, width = img.shape[:2]
+
+    windows = list(_tile_grid(height, width, tile_size, overlap))
+    jobs = []
+    for (y1, y2, x1, x2), (py1, py2, px1, px2) in windows:
+        core_offset = (y1 - py1, y2 - py1, x1 - px1, x2 - px1)
+        jobs.append((img[py1:py2, px1:px2], core_offset))
+
+    output = np.empty_like(img)
+    if workers <= 1 or len(jobs) == 1:
+        results = map(_process_tile, jobs)
+        for ((y1, y2, x1, x2), _), core in zip(windows, results):
+            output[y1:y2, x1:x2] = core
+        return output
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for ((y1, y2, x1, x2), _), core in zip(windows, pool.map(_process_tile, jobs)):
+            output[y1:y2, x1:x2] = core
+    return output
+
+
+def load_image(source):
+    """
+    Decodes an image once into a BGR NumPy array that every pipeline stage can share.
+    Accepts a file path, raw bytes, a file-like object (e.g. a Streamlit UploadedFile)
+    or an already decoded array (returned unchanged).
+    """
+    if source is None or isinstance(source, np.ndarray):
+        return source
+    if isinstance(source, (str, os.PathLike)):
+        return cv2.imread(str(source), cv2.IMREAD_COLOR)
+    if hasattr(source, "getvalue"):
+        source = source.getvalue()
+    elif hasattr(source, "read"):
+        source = source.read()
+    buffer = np.frombuffer(source, np.uint8)
+    if buffer.size == 0:
+        return None
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+def to_grayscale(img):
+    """Returns a single-channel view of a decoded image."""
+    if img.ndim == 2:
+        return img
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def preprocess_image(image, tiled=None, workers=None):
     """
     Applies a series of preprocessing steps to enhance P&ID image quality.
     - Converts to grayscale for uniform processing.
     - Applies adaptive thresholding to create a clean black & white (binary) image.
     - Removes small noise specks (morphological opening).
+
+    `image` may be a path, bytes, a file-like object or a decoded array (see load_image).
+    Returns the processed grayscale array, the unprocessed grayscale array if preprocessing
+    fails, or None if the image cannot be decoded.
+
+    `tiled` forces (True) or disables (False) the tile-parallel path; by default it is used
+    for sheets above TILED_MIN_PIXELS. `workers` overrides PREPROCESS_WORKERS.
     """
+    img = load_image(image)
+    if img is None:
+        print("Warning: Could not decode image with OpenCV.")
+        return None
+    img = to_grayscale(img)
+
     try:
-        print(f"----------------//////// Preprocessing image: {os.path.basename(image_path)}...")
-        img = cv2.imread(str(image_path), cv2.IMREAD_GRAYSCALE)
-
-        if img is None:
-            print("Warning: Could not read image with OpenCV. Skipping preprocessing.")
-            return image_path
-
-        # 1. Denoising to reduce random noise from scans
-        denoised_img = cv2.fastNlMeansDenoising(img, None, h=10, templateWindowSize=7, searchWindowSize=21)
-
-        # 2. Adaptive Thresholding is excellent for handling uneven lighting
-        binary_img = cv2.adaptiveThreshold(
-            denoised_img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-            cv2.THRESH_BINARY, 15, 4
-        )
-
-        # 3. Morphological Operations to clean up small specks and dots
-        kernel = np.ones((1, 1), np.uint8)
-        opening = cv2.morphologyEx(binary_img, cv2.MORPH_OPEN, kernel, iterations=1)
-
-        # Save the processed image to a temporary file
-        temp_dir = "temp_uploads"
-        os.makedirs(temp_dir, exist_ok=True)
-        processed_path = os.path.join(temp_dir, f"processed_{os.path.basename(image_path)}")
-        
-        cv2.imwrite(processed_path, opening)
-        print(f"----------------//////// Image preprocessed and saved to {processed_path}")
-        return processed_path
+        print(f"----------------//////// Preprocessing image ({img.shape[1]}x{img.shape[0]})...")
+        if tiled is None:
+            tiled = img.shape[0] * img.shape[1] >= TILED_MIN_PIXELS
+
+        if tiled:
+            processed = preprocess_tiled(img, workers=workers)
+        else:
+            processed = _preprocess_chain(img)
+
+        print("----------------//////// Image preprocessed.")
+        return processed
 
     except Exception as e:
         print(f"⚠️ Error during image preprocessing: {e}. Using original image.")
-        return image_path 
-
+        return img
@@ -0,0 +1,109 @@
+"""
+One process graph per document, shared by every graph consumer.
+
+build_process_graph turns the categorical data into a networkx MultiDiGraph in one
+pass: nodes for equipment, instruments, valves, junctions and safety devices (keyed by
+tag), edges for lines (source -> destination) and control relationships. Each node
+keeps its category and the item itself as `attributes`; each edge keeps its kind
+("line" or "control"). get_process_graph caches the frozen graph per document content
+hash, so graph_builder, intelligence_builder and flow_queries reuse the same one.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import networkx as nx
+
+from postprocessing import TAG_KEYS
+from spatial_index import MISSING_VALUES
+
+# Node categories: document key -> display name
+NODE_CATEGORIES = {
+    "equipment": "Equipment",
+    "instrumentation": "Instrumentation",
+    "valves": "Valves",
+    "junctions": "Junctions",
+    "safety_devices": "Safety Devices",
+}
+# Graphs kept in memory, least recently used evicted first
+GRAPH_CACHE_SIZE = 8
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def document_hash(data):
+    """Content hash of a document (key order and formatting do not matter)."""
+    payload = json.dumps(data, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def normalize_tag(value):
+    """Tag as a node key: stripped and upper-cased, None when missing or UNKNOWN."""
+    return value.strip().upper() if isinstance(value, str) and value.strip() not in MISSING_VALUES else None
+
+
+def build_process_graph(data):
+    """
+    Builds the process graph of a document. A tag seen twice keeps its first item.
+    Edges whose ends are not nodes are counted in graph["dangling_edges"].
+    """
+    graph = nx.MultiDiGraph()
+    by_category = {key: [] for key in NODE_CATEGORIES}
+    duplicates = []
+    for key, category in NODE_CATEGORIES.items():
+        tag_key = TAG_KEYS.get(key, "tag")
+        for item in data.get(key) or []:
+            if not isinstance(item, dict):
+                continue
+            tag = normalize_tag(item.get(tag_key))
+            if tag is None:
+                continue
+            if tag in graph:
+                duplicates.append(tag)
+                continue
+            graph.add_node(tag, category=category, category_key=key, attributes=item)
+            by_category[key].append(tag)
+
+    dangling = 0
+    edges = []
+    for kind, key in (("line", "lines"), ("control", "control_relationships")):
+        for item in data.get(key) or []:
+            if not isinstance(item, dict):
+                continue
+            source, target = normalize_tag(item.get("source_tag")), normalize_tag(item.get("destination_tag"))
+            if source in graph and target in graph:
+                label = item.get("line_number_tag") if kind == "line" else item.get("relationship_type")
+                edges.append((source, target, {"kind": kind, "label": label or "", "attributes": item}))
+            else:
+                dangling += 1
+    graph.add_edges_from(edges)
+    graph.graph.update(by_category=by_category, duplicate_tags=duplicates, dangling_edges=dangling)
+    return graph
+
+
+def get_process_graph(data, refresh=False):
+    """
+    The process graph of `data`, built once per document content and then served from
+    an in-memory cache. The graph is frozen: consumers read it and never modify it.
+    """
+    key = document_hash(data)
+    with _lock:
+        graph = _cache.get(key)
+        if graph is not None and not refresh:
+            _cache.move_to_end(key)
+            return graph
+    graph = nx.freeze(build_process_graph(data))
+    with _lock:
+        _cache[key] = graph
+        _cache.move_to_end(key)
+        while len(_cache) > GRAPH_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return graph
+
+
+def line_subgraph(graph):
+    """View of the graph with only line edges (process flow, no control signals)."""
+    return nx.subgraph_view(graph, filter_edge=lambda u, v, k: graph.edges[u, v, k]["kind"] == "line")
+
@@ -0,0 +1,257 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+# --- RATE LIMIT SETTINGS ---
+REQUESTS_PER_MINUTE = float(os.getenv("PID_REQUESTS_PER_MINUTE", 30))
+TOKENS_PER_MINUTE = float(os.getenv("PID_TOKENS_PER_MINUTE", 1_000_000))
+MAX_ATTEMPTS = int(os.getenv("PID_MAX_ATTEMPTS", 6))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable",
+    "InternalServerError", "BadGateway", "GatewayTimeout", "DeadlineExceeded",
+}
+
+
+class ModelUnavailableError(Exception):
+    """The model endpoint kept throttling or failing and the request was given up."""
+
+
+class CircuitOpenError(ModelUnavailableError):
+    """The circuit breaker is open and stayed open longer than the caller was willing to wait."""
+
+
+class ThrottledError(Exception):
+    """A 429/503-style response, as raised by the local fake endpoint."""
+
+    def __init__(self, status=429, retry_after=None, message=None):
+        super().__init__(message or f"HTTP {status}")
+        self.code = status
+        self.retry_after = retry_after
+
+
+def is_retryable(exc):
+    """True for throttling and transient server errors (HTTP 429/5xx) from any client library."""
+    code = getattr(exc, "code", None)
+    if isinstance(code, int) and code in RETRYABLE_STATUS:
+        return True
+    return type(exc).__name__ in RETRYABLE_ERROR_NAMES
+
+
+def retry_after_seconds(exc):
+    """Extracts a Retry-After hint (seconds) from an exception, if the server sent one."""
+    value = getattr(exc, "retry_after", None)
+    if value is None:
+        response = getattr(exc, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        value = headers.get("Retry-After") if hasattr(headers, "get") else None
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate_per_minute`, holding at most `capacity`.
+
+    `reserve(amount)` debits the bucket immediately and returns how long the caller must
+    wait before proceeding. The balance may go negative, so concurrent callers queue up
+    in arrival order instead of racing for refilled tokens.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount=1.0):
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+            if self.tokens >= 0 or self.rate <= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def adjust(self, delta):
+        """Credits (positive) or debits (negative) tokens once the real cost of a request is known."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + delta)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive throttling failures. While open, callers
+    are told how long to wait; after `reset_timeout` one probe request is let through
+    (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def wait_time(self):
+        """Returns 0 if a request may proceed now, else the seconds until it should try again."""
+        with self._lock:
+            if self.state == "closed":
+                return 0.0
+            remaining = self.opened_at + self.reset_timeout - self.clock()
+            if remaining > 0:
+                return remaining
+            if self._probe_in_flight:
+                # Someone is already probing; check back shortly
+                return min(1.0, self.reset_timeout)
+            self.state = "half_open"
+            self._probe_in_flight = True
+            return 0.0
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = self.clock()
+
+
+class RequestScheduler:
+    """
+    Admission control and retries around model calls:
+    - request and token buckets (requests/min, tokens/min),
+    - exponential backoff with full jitter, never shorter than a server Retry-After,
+    - a circuit breaker that makes callers wait out an outage instead of piling on.
+
+    `clock`, `sleep`/`async_sleep` and `rng` are injectable so behaviour can be tested
+    deterministically against the fake endpoint in model_backends.
+    """
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE,
+                 max_attempts=MAX_ATTEMPTS, base_delay=1.0, max_delay=60.0, breaker=None,
+                 max_breaker_wait=300.0, clock=time.monotonic, sleep=time.sleep,
+                 async_sleep=asyncio.sleep, rng=None):
+        self.request_bucket = TokenBucket(requests_per_minute, clock=clock)
+        self.token_bucket = TokenBucket(tokens_per_minute, clock=clock)
+        self.breaker = breaker or CircuitBreaker(clock=clock)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_breaker_wait = max_breaker_wait
+        self.clock = clock
+        self.sleep = sleep
+        self.async_sleep = async_sleep
+        self.rng = rng or random.Random()
+        self.stats = {"calls": 0, "retries": 0, "throttled": 0, "waited_s": 0.0}
+
+    def backoff(self, attempt, retry_after=None):
+        """Full-jitter exponential delay for the given (0-based) retry attempt."""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = self.rng.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _admission_delay(self, est_tokens):
+        return max(self.request_bucket.reserve(1), self.token_bucket.reserve(est_tokens))
+
+    def _handle_error(self, exc, attempt, est_tokens):
+        """Returns the delay before the next attempt, or raises if the error is final."""
+        if not is_retryable(exc):
+            # The endpoint answered (e.g. a 400); that says nothing about overload
+            self.breaker.record_success()
+            raise exc
+        self.stats["throttled"] += 1
+        self.breaker.record_failure()
+        if attempt + 1 >= self.max_attempts:
+            raise ModelUnavailableError(
+                f"Model endpoint still unavailable after {self.max_attempts} attempts: {exc}"
+            ) from exc
+        self.stats["retries"] += 1
+        # The rejected request consumed nothing; give its tokens back
+        self.token_bucket.adjust(est_tokens)
+        return self.backoff(attempt, retry_after_seconds(exc))
+
+    def _check_breaker_budget(self, waited, wait):
+        if waited + wait > self.max_breaker_wait:
+            raise CircuitOpenError(
+                f"Model endpoint circuit open; gave up after waiting {waited:.0f} s"
+            )
+
+    def call(self, fn, est_tokens=0):
+        """Runs the blocking `fn()` under rate limits, retries and the circuit breaker."""
+        breaker_waited = 0.0
+        attempt = 0
+        while True:
+            wait = self.breaker.wait_time()
+            if wait > 0:
+                self._check_breaker_budget(breaker_waited, wait)
+                breaker_waited += wait
+                self.stats["waited_s"] += wait
+                self.sleep(wait)
+                continue
+            delay = self._admission_delay(est_tokens)
+            if delay > 0:
+                self.stats["waited_s"] += delay
+                self.sleep(delay)
+            self.stats["calls"] += 1
+            try:
+                result = fn()
+            except Exception as exc:
+                delay = self._handle_error(exc, attempt, est_tokens)
+                attempt += 1
+                self.stats["waited_s"] += delay
+                self.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def run(self, fn, est_tokens=0):
+        """Async variant of `call`: awaits the coroutine returned by `fn()`."""
+        breaker_waited = 0.0
+        attempt = 0
+        while True:
+            wait = self.breaker.wait_time()
+            if wait > 0:
+                self._check_breaker_budget(breaker_waited, wait)
+                breaker_waited += wait
+                self.stats["waited_s"] += wait
+                await self.async_sleep(wait)
+                continue
+            delay = self._admission_delay(est_tokens)
+            if delay > 0:
+                self.stats["waited_s"] += delay
+                await self.async_sleep(delay)
+            self.stats["calls"] += 1
+            try:
+                result = await fn()
+            except Exception as exc:
+                delay = self._handle_error(exc, attempt, est_tokens)
+                attempt += 1
+                self.stats["waited_s"] += delay
+                await self.async_sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
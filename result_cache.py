@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+# --- CACHE SETTINGS ---
+CACHE_DIR = os.getenv("PID_CACHE_DIR", os.path.join("data", "analysis_cache"))
+CACHE_MAX_BYTES = int(float(os.getenv("PID_CACHE_MAX_MB", 256)) * 1024 * 1024)
+CACHE_ENABLED = os.getenv("PID_CACHE_DISABLE", "").lower() not in ("1", "true", "yes")
+
+
+def make_cache_key(image_bytes: bytes, prompt: str, model_id: str, params: dict) -> str:
+    """
+    Builds a content-addressed key from everything that determines a model result:
+    the preprocessed image bytes, the prompt text, the model id and the preprocessing parameters.
+    Changing any of them yields a new key, so stale entries are never served.
+    """
+    h = hashlib.sha256()
+    for part in (
+        hashlib.sha256(image_bytes).digest(),
+        hashlib.sha256(prompt.encode("utf-8")).digest(),
+        model_id.encode("utf-8"),
+        json.dumps(params, sort_keys=True).encode("utf-8"),
+    ):
+        h.update(len(part).to_bytes(8, "big"))
+        h.update(part)
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    Persistent cache of parsed analysis results, one JSON file per key.
+
+    Entries are evicted least-recently-used first (by file mtime, refreshed on every hit)
+    once the directory grows beyond `max_bytes`. Hit/miss counters are kept per process.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _entries(self):
+        """Returns (mtime, size, path) for every cache file."""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def get(self, key):
+        """Returns the cached result for `key` or None, updating the hit/miss counters."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Stores `data` under `key` atomically and evicts old entries if over budget."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        payload = json.dumps(data).encode("utf-8")
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_bytes += len(payload) - previous
+            if self._total_bytes > self.max_bytes:
+                self._evict(keep=path)
+
+    def _evict(self, keep=None):
+        """Removes least-recently-used entries until the cache fits in max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def clear(self):
+        """Deletes every cached entry."""
+        with self._lock:
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._total_bytes = 0
+
+    def stats(self):
+        """Returns hit/miss counters and the current on-disk footprint."""
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """Returns the process-wide cache instance, creating it on first use."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResultCache()
+    return _default_cache
@@ -1,80 +1,407 @@
-import pandas as pd
-from tag_parser import parse_instrument_tag, parse_equipment_tag
+"""
+Rule-based review of a normalized document.
 
-def generate_review_queue(data):
+ReviewIndex reads the category lists once into one row per item (category, position,
+id, tag, confidence, flags, ...), NumPy columns over those rows, and the indexes rules
+share: tag -> first row and the number of lines and control relationships at each tag.
+Each rule in REVIEW_RULES takes an array of row numbers and the index and selects the
+rows it flags with column masks; review_rule registers a new one.
+generate_review_queue runs them all. ReviewSession keeps the findings of a document
+while a reviewer edits it, re-checking only the rows an edit can affect.
+"""
+import bisect
+import os
+from collections import Counter, namedtuple
+
+import numpy as np
+
+from normalizer import normalize_item
+from postprocessing import TAG_KEYS
+from process_graph import NODE_CATEGORIES, normalize_tag
+from schema_validator import item_errors
+from tag_grammar import parse
+
+# Detections below this confidence are sent for review
+MIN_CONFIDENCE = float(os.getenv("PID_REVIEW_MIN_CONFIDENCE", "0.85"))
+# Item flags (from normalizer.attach_flags and geometry.apply_geometry) reported as findings
+FLAG_ISSUES = {
+    "missing_bbox": ("Missing Bounding Box", "No bounding box was detected."),
+    "invalid_bbox": ("Invalid Bounding Box", "The bounding box is not four numbers."),
+    "bbox_not_tight": ("Invalid Bounding Box", "The bounding box has no area."),
+    "bbox_clipped": ("Bounding Box Outside Drawing", "The bounding box extends past the drawing."),
+    "duplicate_bbox": ("Duplicate Detection", "Another item has the same bounding box."),
+    "bbox_overlap": ("Overlapping Detection", "The bounding box partly overlaps another item of the same category."),
+    "missing_tag": ("Missing Tag", "The item has no readable tag."),
+}
+# Categories whose items are not checked (no detections of their own)
+SKIPPED_CATEGORIES = ("metadata",)
+# Tagged categories whose tags are checked against the shared tag grammar
+TAG_FORMATS = {
+    "instrumentation": ("instrument", "Instrument tag '{}' does not follow standard ISA-5.1 format."),
+    "equipment": ("equipment", "Equipment tag '{}' does not follow a standard format."),
+}
+# Edge-like categories: (category, endpoint fields)
+EDGE_CATEGORIES = (("lines", ("source_tag", "destination_tag")),
+                   ("control_relationships", ("source_tag", "destination_tag")))
+# Fields normalize_item derives from the tag (and keeps when already set)
+TAG_DERIVED_FIELDS = {
+    "instrumentation": ("loop_id", "measured_variable", "isa_function"),
+    "lines": ("nominal_size", "service", "spec"),
+}
+
+Rule = namedtuple("Rule", "name issue_type severity check shared")
+Row = namedtuple("Row", "category index id tag confidence flag_for_review review_reason flags linked bounding_box")
+REVIEW_RULES = {}
+
+
+def review_rule(name, issue_type=None, severity="warning", shared=False):
     """
-    Analyzes the AI's graph data to flag potential errors and warnings for human review.
+    Registers a review rule. The decorated function takes (rows, index): an array of
+    ReviewIndex row numbers and the index itself. It returns the flagged rows as
+    (row, details) pairs, or (row, issue_type, details) for rules that report several
+    kinds of issue. A rule that reads the shared indexes (by_tag, degree, or the first
+    and node_degree columns) must say so with shared=True, so ReviewSession re-runs it
+    when another item changes them.
+    """
+    def register(check):
+        REVIEW_RULES[name] = Rule(name, issue_type or name, severity, check, shared)
+        return check
+    return register
+
+
+def item_row(category, position, item):
+    """The ReviewIndex row of one item."""
+    tag = normalize_tag(item.get(TAG_KEYS.get(category, "tag"))) if category in NODE_CATEGORIES else None
+    if tag is not None:
+        item_id = tag
+    else:
+        value = item.get("line_number_tag" if category == "lines" else TAG_KEYS.get(category, "tag"))
+        item_id = value if normalize_tag(value) else f"{category}[{position}]"
+    confidence = item.get("confidence")
+    linked = bool(item.get("connected_lines") or normalize_tag(item.get("connected_to_tag"))
+                  or normalize_tag(item.get("installed_on_line_tag")))
+    return Row(category, position, item_id, tag,
+               float(confidence) if isinstance(confidence, (int, float)) else np.nan,
+               item.get("flag_for_review") is True, item.get("review_reason"), item.get("flags") or [],
+               linked, item.get("bounding_box"))
+
+
+def edge_ends(category, item):
+    """Normalized (source, destination) tags of a line or control relationship."""
+    fields = dict(EDGE_CATEGORIES).get(category, ())
+    return tuple(normalize_tag(item.get(field)) for field in fields) if isinstance(item, dict) else ()
+
+
+class ReviewIndex:
+    """Rows, columns and shared indexes of one document, built in a single pass over its items."""
+
+    def __init__(self, data):
+        self.data = data
+        self.rows = []
+        for category, items in data.items():
+            if category in SKIPPED_CATEGORIES or not isinstance(items, list):
+                continue
+            for position, item in enumerate(items):
+                if isinstance(item, dict):
+                    self.rows.append(item_row(category, position, item))
+        self.row_of = {(r.category, r.index): row for row, r in enumerate(self.rows)}
+
+        # Rows of each node tag, and the first of them, as in the process graph
+        self.tag_rows = {}
+        for row, r in enumerate(self.rows):
+            if r.tag is not None:
+                self.tag_rows.setdefault(r.tag, []).append(row)
+        self.by_tag = {tag: rows[0] for tag, rows in self.tag_rows.items()}
+        # Lines and control relationships at each node tag; an edge counts only when both ends are nodes
+        self.degree = Counter()
+        self.counted = set()   # (category, position) of the edges counted in degree
+        self.edges_at = {}     # tag -> (category, position) of every edge with an end there
+        for category, _ in EDGE_CATEGORIES:
+            for position, item in enumerate(data.get(category) or []):
+                self._add_edge(category, position, item)
+
+        n = len(self.rows)
+        self.category = np.array([r.category for r in self.rows], dtype=object)
+        self.confidence = np.fromiter((r.confidence for r in self.rows), dtype=float, count=n)
+        self.flag_for_review = np.fromiter((r.flag_for_review for r in self.rows), dtype=bool, count=n)
+        self.has_flags = np.fromiter((bool(r.flags) for r in self.rows), dtype=bool, count=n)
+        self.linked = np.fromiter((r.linked for r in self.rows), dtype=bool, count=n)
+        self.first = np.fromiter((r.tag is not None and self.by_tag[r.tag] == row for row, r in enumerate(self.rows)),
+                                 dtype=bool, count=n)
+        self.node_degree = np.fromiter((self.degree.get(r.tag, 0) for r in self.rows), dtype=int, count=n)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def all_rows(self):
+        return np.arange(len(self.rows))
+
+    def _add_edge(self, category, position, item):
+        ends = edge_ends(category, item)
+        for end in ends:
+            if end is not None:
+                self.edges_at.setdefault(end, set()).add((category, position))
+        if ends and all(end in self.by_tag for end in ends):
+            self.degree.update(ends)
+            self.counted.add((category, position))
+
+    def _remove_edge(self, category, position, item):
+        ends = edge_ends(category, item)
+        for end in ends:
+            self.edges_at.get(end, set()).discard((category, position))
+        if (category, position) in self.counted:
+            self.counted.discard((category, position))
+            for end in ends:
+                self.degree[end] -= 1
+                if not self.degree[end]:
+                    del self.degree[end]
+
+    def _retag(self, row, old, new):
+        """Moves `row` from tag `old` to `new`; returns the tags that became or stopped being nodes."""
+        if old is not None:
+            self.tag_rows[old].remove(row)
+            if not self.tag_rows[old]:
+                del self.tag_rows[old]
+        if new is not None:
+            bisect.insort(self.tag_rows.setdefault(new, []), row)
+        changed = []
+        for tag in {old, new} - {None}:
+            was = tag in self.by_tag
+            if tag in self.tag_rows:
+                self.by_tag[tag] = self.tag_rows[tag][0]
+            else:
+                self.by_tag.pop(tag, None)
+            if was != (tag in self.by_tag):
+                changed.append(tag)
+        return changed
+
+    def replace(self, category, position, item):
+        """
+        Puts `item` at `position` of `category` in self.data (the caller owns that list)
+        and updates its row, the shared indexes and the columns. Returns the rows whose
+        values may have changed: the edited row and the rows of every tag it named
+        before or after the edit, edge ends included.
+        """
+        row = self.row_of[(category, position)]
+        old_item = self.data[category][position]
+        old, new = self.rows[row], item_row(category, position, item)
+        edge = category in dict(EDGE_CATEGORIES)
+        tags = {old.tag, new.tag}
+        if edge:
+            tags.update(edge_ends(category, old_item))
+            self._remove_edge(category, position, old_item)
+        self.data[category][position] = item
+        self.rows[row] = new
+        if old.tag != new.tag:
+            # A tag that became (or stopped being) a node changes which edges at it count
+            for tag in self._retag(row, old.tag, new.tag):
+                for key in list(self.edges_at.get(tag, ())):
+                    edge_item = self.data[key[0]][key[1]]
+                    self._remove_edge(*key, edge_item)
+                    self._add_edge(*key, edge_item)
+                    tags.update(edge_ends(key[0], edge_item))
+        if edge:
+            self._add_edge(category, position, item)
+            tags.update(edge_ends(category, item))
+
+        self.confidence[row] = new.confidence
+        self.flag_for_review[row] = new.flag_for_review
+        self.has_flags[row] = bool(new.flags)
+        self.linked[row] = new.linked
+        affected = {row}
+        for tag in tags - {None}:
+            affected.update(self.tag_rows.get(tag, ()))
+        affected = np.array(sorted(affected))
+        for r in affected:
+            tag = self.rows[r].tag
+            self.first[r] = tag is not None and self.by_tag[tag] == r
+            self.node_degree[r] = self.degree.get(tag, 0)
+        return affected
+
+
+@review_rule("orphan", "Orphan Node", shared=True)
+def orphan_rule(rows, index):
+    orphans = rows[index.first[rows] & (index.node_degree[rows] == 0) & ~index.linked[rows]]
+    return [(row, f"Component '{index.rows[row].tag}' is not connected to any lines.") for row in orphans]
+
+
+@review_rule("ai_flagged", "AI Flagged")
+def ai_flagged_rule(rows, index):
+    return [(row, index.rows[row].review_reason or "AI detected a potential ambiguity.")
+            for row in rows[index.flag_for_review[rows]]]
+
+
+@review_rule("low_confidence", "Low Confidence")
+def low_confidence_rule(rows, index):
+    return [(row, f"Detection confidence is only {index.confidence[row]:.2f}.")
+            for row in rows[index.confidence[rows] < MIN_CONFIDENCE]]
 
-    Checks for:
+
+@review_rule("tag_format", "Invalid Tag Format")
+def tag_format_rule(rows, index):
+    found = []
+    for category, (kind, message) in TAG_FORMATS.items():
+        for row in rows[index.category[rows] == category]:
+            tag = index.rows[row].tag
+            # parse is memoized: a tag repeated across rows or sheets is parsed once
+            if tag is not None and parse(kind, tag) is None:
+                found.append((row, message.format(tag)))
+    return found
+
+
+@review_rule("item_flags")
+def item_flags_rule(rows, index):
+    return [(row, *FLAG_ISSUES[flag]) for row in rows[index.has_flags[rows]]
+            for flag in index.rows[row].flags if flag in FLAG_ISSUES]
+
+
+def run_rules(rows, index, rules=None):
+    """Findings of `rules` (default: every registered rule) on an array of index rows."""
+    findings = []
+    for rule in (rules or REVIEW_RULES.values()):
+        for hit in rule.check(rows, index):
+            row, issue_type, details = hit if len(hit) == 3 else (hit[0], rule.issue_type, hit[1])
+            record = index.rows[row]
+            findings.append({
+                "id": record.id,
+                "issue_type": issue_type,
+                "details": details,
+                "bounding_box": record.bounding_box,
+                "category": record.category,
+                "index": record.index,
+                "rule": rule.name,
+                "severity": rule.severity,
+            })
+    return findings
+
+
+def _schema_finding(index, row, errors):
+    record = index.rows[row]
+    return {"id": record.id, "issue_type": "Schema Violation", "details": "; ".join(errors),
+            "bounding_box": record.bounding_box, "category": record.category, "index": record.index,
+            "rule": "schema", "severity": "error"}
+
+
+def schema_violations(quarantined):
+    """Review-queue errors for items quarantined by schema_validator.validate_document."""
+    errors = []
+    for entry in quarantined or []:
+        item = entry.get("item") if isinstance(entry.get("item"), dict) else {}
+        errors.append({
+            "id": entry.get("id") or f"{entry.get('category')}[{entry.get('index')}]",
+            "issue_type": "Schema Violation",
+            "details": "; ".join(entry.get("errors", [])),
+            "bounding_box": item.get("bounding_box")
+        })
+    return errors
+
+
+def generate_review_queue(data, quarantined=None, rules=None):
+    """
+    Runs the review rules (default: all of REVIEW_RULES) over the document and returns
+    {"errors": [...], "warnings": [...]} by rule severity. Built-in rules check:
     1. Items explicitly flagged for review by the AI.
     2. Low-confidence detections.
     3. Orphan nodes (components not connected to any lines).
     4. Non-standard tag formats.
+    5. Item flags from normalization (bounding boxes, missing tags).
+    Items quarantined by schema validation are listed as errors.
     """
     print("🔍 Running Review Engine...")
+    errors = schema_violations(quarantined)
     warnings = []
-    
-    nodes = data.get('nodes', [])
-    if not nodes:
-     
-        return {"errors": [], "warnings": []}
-
-    node_ids = {node.get('id') for node in nodes if node.get('id')}
-    connected_nodes = set()
-    for edge in data.get('edges', []):
-        connected_nodes.add(edge.get('source'))
-        connected_nodes.add(edge.get('target'))
-    
-    orphan_nodes = node_ids - connected_nodes
-    
-    for orphan_id in orphan_nodes:
-        orphan_node_data = next((node for node in nodes if node.get('id') == orphan_id), {})
-        warnings.append({
-            "id": orphan_id,
-            "issue_type": "Orphan Node",
-            "details": f"Component '{orphan_id}' is not connected to any lines.",
-            "bounding_box": orphan_node_data.get('attributes', {}).get('bounding_box')
-        })
+    index = ReviewIndex(data)
+    if len(index):
+        for finding in run_rules(index.all_rows(), index, rules):
+            (errors if finding["severity"] == "error" else warnings).append(finding)
 
+    print(f"Review complete. Found {len(warnings)} potential issues.")
+    return {"errors": errors, "warnings": warnings}
 
-    for node in nodes:
-        attributes = node.get('attributes', {})
-        node_id = node.get('id')
-        category = node.get('category')
-        if attributes.get("flag_for_review") is True:
-            warnings.append({
-                "id": node_id,
-                "issue_type": "AI Flagged",
-                "details": attributes.get("review_reason", "AI detected a potential ambiguity."),
-                "bounding_box": attributes.get('bounding_box')
-            })
 
-        
-        confidence = attributes.get('confidence', 1.0)
-        if confidence < 0.85:  
-             warnings.append({
-                "id": node_id,
-                "issue_type": "Low Confidence",
-                "details": f"Detection confidence is only {confidence:.2f}.",
-                "bounding_box": attributes.get('bounding_box')
-            })
-            
-
-        if category == 'Instrumentation' and not parse_instrument_tag(node_id):
-            warnings.append({
-                "id": node_id,
-                "issue_type": "Invalid Tag Format",
-                "details": f"Instrument tag '{node_id}' does not follow standard ISA-5.1 format.",
-                "bounding_box": attributes.get('bounding_box')
-            })
-        elif category == 'Equipment' and not parse_equipment_tag(node_id):
-             warnings.append({
-                "id": node_id,
-                "issue_type": "Invalid Tag Format",
-                "details": f"Equipment tag '{node_id}' does not follow a standard format.",
-                "bounding_box": attributes.get('bounding_box')
-            })
+class ReviewSession:
+    """
+    The review queue of one document, kept current while a reviewer edits its items.
 
-    print(f"Review complete. Found {len(warnings)} potential issues.")
-    return {"errors": [], "warnings": warnings}
+    Every finding is stored under the row it was raised on: it depends on that item and,
+    for shared rules, on the tag indexes of the item's tag. apply_edit normalizes and
+    validates only the edited item, updates the indexes for the tags it touches (its
+    old and new tag, and the ends of an edited line), then re-runs every rule on the
+    edited row and the shared rules on the rows of those tags. The document is
+    copy-on-write: the input is never modified, session.data is the edited one.
+    """
+
+    def __init__(self, data, quarantined=None, rules=None):
+        self.data = dict(data)
+        self.rules = list(rules or REVIEW_RULES.values())
+        self.quarantined = schema_violations(quarantined)
+        self.index = ReviewIndex(self.data)
+        self._order = {rule.name: i for i, rule in enumerate(self.rules)}
+        self._shared = [rule for rule in self.rules if rule.shared]
+        self._owned = set()   # categories whose lists were copied for editing
+        self._findings = {}   # row -> findings raised on it
+        if len(self.index):
+            self._store(run_rules(self.index.all_rows(), self.index, self.rules))
+
+    def _store(self, findings):
+        for finding in findings:
+            self._findings.setdefault(self.index.row_of[(finding["category"], finding["index"])], []).append(finding)
+
+    def queue(self):
+        """{"errors": [...], "warnings": [...]} as generate_review_queue reports them."""
+        found = sorted(((self._order.get(f["rule"], -1), row, f) for row, findings in self._findings.items()
+                        for f in findings), key=lambda entry: entry[:2])
+        errors, warnings = list(self.quarantined), []
+        for _, _, finding in found:
+            (errors if finding["severity"] == "error" else warnings).append(finding)
+        return {"errors": errors, "warnings": warnings}
+
+    def apply_edit(self, category, position, changes):
+        """
+        Applies `changes` (field -> value) to item `position` of `category` and returns the
+        delta {"added": [...], "resolved": [...], "rechecked": rows re-checked}.
+        """
+        if category not in self._owned:
+            self.data[category] = list(self.data[category])
+            self._owned.add(category)
+        old = self.data[category][position]
+        item = dict(old, **changes)
+        # A new tag derives its own fields; ones the edit sets itself are kept
+        key = TAG_KEYS.get(category, "tag")
+        if normalize_tag(item.get(key)) != normalize_tag(old.get(key)):
+            for field in TAG_DERIVED_FIELDS.get(category, ()):
+                if field not in changes:
+                    item.pop(field, None)
+        # Tag flags are derived again; box flags stay (they need the whole sheet)
+        flags = [flag for flag in item.get("flags") or [] if flag != "missing_tag"]
+        if flags:
+            item["flags"] = flags
+        else:
+            item.pop("flags", None)
+        # Synthesized ids must not collide with the other node tags
+        item = normalize_item(category, item, set(self.index.by_tag))
+        errors = item_errors(category, item)
+
+        affected = self.index.replace(category, position, item)
+        row = self.index.row_of[(category, position)]
+        before = {r: self._findings.pop(r, []) for r in affected}
+        shared = {rule.name for rule in self._shared}
+        for r in affected:
+            if r != row:
+                self._findings[r] = [f for f in before[r] if f["rule"] not in shared]
+        others = affected[affected != row]
+        found = run_rules(np.array([row]), self.index, self.rules)
+        if len(others) and self._shared:
+            found += run_rules(others, self.index, self._shared)
+        if errors:
+            found.append(_schema_finding(self.index, row, errors))
+        self._store(found)
 
+        delta = {"added": [], "resolved": [], "rechecked": len(affected)}
+        for r in affected:
+            after = self._findings.get(r, [])
+            delta["added"] += [f for f in after if f not in before[r]]
+            delta["resolved"] += [f for f in before[r] if f not in after]
+            if not after:
+                self._findings.pop(r, None)
+        return delta
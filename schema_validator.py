@@ -0,0 +1,99 @@
+"""
+Schema validation against PID_SCHEMA_V2 with validators compiled once at import.
+
+jsonschema.validate() checks the schema and builds a new validator on every call and
+stops at the first error, so one malformed detection rejected the whole sheet.
+validate_document instead validates the document skeleton once and then every item
+against its category's precompiled item validator, collecting all errors with
+iter_errors; only the offending items are quarantined (for the review queue) and the
+rest of the sheet is kept.
+"""
+import copy
+
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
+
+from postprocessing import TAG_KEYS
+from schema import PID_SCHEMA_V2
+
+
+def _compile(schema):
+    cls = validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
+
+
+def _skeleton(schema):
+    """The document schema with item schemas dropped: only top-level shapes are checked."""
+    skeleton = copy.deepcopy(schema)
+    for prop in skeleton.get("properties", {}).values():
+        if prop.get("type") == "array":
+            prop.pop("items", None)
+    return skeleton
+
+
+PID_VALIDATOR = _compile(PID_SCHEMA_V2)
+DOCUMENT_VALIDATOR = _compile(_skeleton(PID_SCHEMA_V2))
+ITEM_VALIDATORS = {
+    category: _compile(prop["items"])
+    for category, prop in PID_SCHEMA_V2["properties"].items()
+    if prop.get("type") == "array" and "items" in prop
+}
+
+
+def _describe(error):
+    path = "/".join(str(p) for p in error.absolute_path)
+    return f"{path}: {error.message}" if path else error.message
+
+
+def item_errors(category, item):
+    """All schema violations of one item of `category`, as 'path: message' strings."""
+    validator = ITEM_VALIDATORS.get(category)
+    if validator is None:
+        return []
+    return [_describe(e) for e in validator.iter_errors(item)]
+
+
+def validate_document(data, per_item=True):
+    """
+    Validates a document with the precompiled validators.
+
+    With per_item=False this is jsonschema.validate(data, PID_SCHEMA_V2) without
+    rebuilding the validator: the first error raises. Otherwise returns
+    (kept, quarantined): `kept` is a shallow copy of `data` without the invalid items and
+    `quarantined` lists {category, index, id, item, errors} for each of them. Problems
+    with the document itself (not an object, a category that is not a list) still raise
+    ValidationError, since no item can be trusted then.
+    """
+    if not per_item:
+        error = best_match(PID_VALIDATOR.iter_errors(data))
+        if error is not None:
+            raise error
+        return data, []
+
+    error = best_match(DOCUMENT_VALIDATOR.iter_errors(data))
+    if error is not None:
+        raise error
+    kept = dict(data)
+    quarantined = []
+    for category, validator in ITEM_VALIDATORS.items():
+        items = data.get(category)
+        if not items:
+            continue
+        good = []
+        for index, item in enumerate(items):
+            errors = [_describe(e) for e in validator.iter_errors(item)]
+            if not errors:
+                good.append(item)
+                continue
+            quarantined.append({
+                "category": category,
+                "index": index,
+                "id": item.get(TAG_KEYS.get(category, "tag")) if isinstance(item, dict) else None,
+                "item": item,
+                "errors": errors,
+            })
+        if len(good) != len(items):
+            kept[category] = good
+    return kept, quarantined
+
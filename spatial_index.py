@@ -0,0 +1,241 @@
+"""
+Spatial index over detections and proximity-based association.
+
+GridIndex buckets bounding boxes into a uniform grid so range and k-nearest queries
+only look at nearby cells. infer_associations uses it to fill links the model left
+empty: annotation -> nearest tagged symbol, instrument -> nearest line, and
+valve -> the line it sits on. Distances to a line with a drawn polyline are measured
+to its segments; its bounding box, which covers a whole diagonal or L-shaped run, only
+pre-filters candidates. Inferred links are marked with the "inferred_association"
+flag and an association_confidence between 0 and 1.
+"""
+import numpy as np
+
+from geometry import BOX_OK, pack_boxes, polyline_box_distance, polyline_points
+from postprocessing import TAG_KEYS
+
+# Categories whose items carry a tag an annotation can point at
+TAGGED_CATEGORIES = ("equipment", "instrumentation", "valves", "safety_devices")
+# (source category, field to fill, target categories, max gap in normalized 0-1000 units)
+ASSOCIATION_RULES = [
+    ("annotations", "associated_tag", TAGGED_CATEGORIES, 60.0),
+    ("instrumentation", "connected_to_tag", ("lines",), 80.0),
+    ("valves", "installed_on_line_tag", ("lines",), 15.0),
+]
+MISSING_VALUES = (None, "", "UNKNOWN", "Unknown")
+
+
+def box_distances(box, boxes):
+    """Gap between `box` and each row of `boxes` (0 where they touch or overlap)."""
+    dx = np.maximum(0.0, np.maximum(boxes[:, 0] - box[2], box[0] - boxes[:, 2]))
+    dy = np.maximum(0.0, np.maximum(boxes[:, 1] - box[3], box[1] - boxes[:, 3]))
+    return np.hypot(dx, dy)
+
+
+# Cell coordinates are packed into one int64 key: (cy + _OFFSET) * _STRIDE + (cx + _OFFSET)
+_OFFSET = 1 << 20
+_STRIDE = 1 << 21
+
+
+def _cell_keys(cx, cy):
+    return (cy + _OFFSET) * _STRIDE + (cx + _OFFSET)
+
+
+def _expand_cells(boxes, cell_size, margin=0.0):
+    """(row, key) arrays for every grid cell each box, grown by `margin`, covers."""
+    lo = np.floor((boxes[:, :2] - margin) / cell_size).astype(np.int64)
+    hi = np.floor((boxes[:, 2:] + margin) / cell_size).astype(np.int64)
+    nx = np.maximum(hi[:, 0] - lo[:, 0] + 1, 1)
+    ny = np.maximum(hi[:, 1] - lo[:, 1] + 1, 1)
+    per_box = nx * ny
+    row = np.repeat(np.arange(len(boxes)), per_box)
+    local = np.arange(len(row)) - np.repeat(np.cumsum(per_box) - per_box, per_box)
+    return row, _cell_keys(lo[row, 0] + local % nx[row], lo[row, 1] + local // nx[row])
+
+
+def default_cell_size(boxes):
+    """About one box per cell on average: sqrt(covered area / n), never below the median box width."""
+    if not len(boxes):
+        return 1.0
+    span = boxes[:, 2:].max(axis=0) - boxes[:, :2].min(axis=0)
+    density_cell = float(np.sqrt(max(span[0] * span[1], 1e-12) / len(boxes)))
+    thickness = np.minimum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+    return max(density_cell, float(np.median(thickness)), 1e-6)
+
+
+class GridIndex:
+    """
+    Uniform grid over an (n, 4) array of [x1, y1, x2, y2] boxes.
+
+    Every box is registered in each cell it covers; a query visits only the cells its
+    (expanded) box covers and measures exact distances to the boxes found there.
+    """
+
+    def __init__(self, boxes, cell_size=None):
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        n = len(self.boxes)
+        if cell_size is None:
+            cell_size = default_cell_size(self.boxes)
+        self.cell_size = max(cell_size, 1e-6)
+        row, keys = _expand_cells(self.boxes, self.cell_size)
+        order = np.argsort(keys, kind="stable")
+        self.entries = row[order]
+        self.keys = keys[order]
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def _candidates(self, box, margin):
+        _, keys = _expand_cells(np.asarray(box, dtype=np.float64).reshape(1, 4), self.cell_size, margin)
+        starts = np.searchsorted(self.keys, keys, side="left")
+        ends = np.searchsorted(self.keys, keys, side="right")
+        parts = [self.entries[s:e] for s, e in zip(starts, ends) if e > s]
+        if not parts:
+            return np.empty(0, dtype=np.intp)
+        return np.unique(np.concatenate(parts))
+
+    def query_range(self, box, margin=0.0):
+        """Indices of boxes within `margin` of `box` (touching or overlapping for 0)."""
+        candidates = self._candidates(box, margin)
+        if not len(candidates):
+            return candidates
+        return candidates[box_distances(box, self.boxes[candidates]) <= margin]
+
+    def nearest(self, box, k=1, max_distance=None):
+        """
+        The k boxes closest to `box` as a list of (index, distance), nearest first.
+        The search radius doubles until k boxes are found within it or it exceeds
+        `max_distance` (unbounded if None).
+        """
+        if not len(self.boxes):
+            return []
+        limit = np.inf if max_distance is None else max_distance
+        margin = min(self.cell_size, limit)
+        while True:
+            candidates = self._candidates(box, margin)
+            if len(candidates):
+                d = box_distances(box, self.boxes[candidates])
+                inside = d <= margin
+                if inside.sum() >= k or margin >= limit or len(candidates) == len(self.boxes):
+                    candidates, d = candidates[inside], d[inside]
+                    top = np.lexsort((candidates, d))[:k]
+                    return [(int(candidates[t]), float(d[t])) for t in top]
+            if margin >= limit:
+                return []
+            margin = min(margin * 2, limit)
+
+    def nearest_many(self, queries, max_distance):
+        """
+        Nearest indexed box for every row of `queries`, vectorized over all queries.
+        Like `nearest`, the search radius doubles from one cell up to `max_distance`;
+        each round only re-queries the rows still unresolved. Returns (index, distance)
+        arrays; index is -1 where nothing lies within `max_distance`. Ties go to the
+        lower index.
+        """
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 4)
+        best = np.full(len(queries), -1, dtype=np.intp)
+        best_d = np.full(len(queries), np.inf)
+        if not len(self.boxes) or not len(queries):
+            return best, best_d
+        pending = np.arange(len(queries))
+        margin = min(self.cell_size, max_distance)
+        while len(pending):
+            q, t, d = self.pairs_within(queries[pending], margin)
+            if len(q):
+                # Per query, keep the smallest (distance, index)
+                order = np.lexsort((t, d, q))
+                q, t, d = q[order], t[order], d[order]
+                first = np.ones(len(q), dtype=bool)
+                first[1:] = q[1:] != q[:-1]
+                rows = pending[q[first]]
+                best[rows] = t[first]
+                best_d[rows] = d[first]
+            if margin >= max_distance:
+                break
+            pending = pending[best[pending] < 0]
+            margin = min(margin * 2, max_distance)
+        return best, best_d
+
+    def pairs_within(self, queries, margin):
+        """(query row, box index, distance) for all pairs at most `margin` apart."""
+        q_row, q_keys = _expand_cells(queries, self.cell_size, margin)
+        starts = np.searchsorted(self.keys, q_keys, side="left")
+        counts = np.searchsorted(self.keys, q_keys, side="right") - starts
+        total = int(counts.sum())
+        q = np.repeat(q_row, counts)
+        t = self.entries[np.repeat(starts, counts) + np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)]
+        qb, tb = queries[q], self.boxes[t]
+        dx = np.maximum(0.0, np.maximum(tb[:, 0] - qb[:, 2], qb[:, 0] - tb[:, 2]))
+        dy = np.maximum(0.0, np.maximum(tb[:, 1] - qb[:, 3], qb[:, 1] - tb[:, 3]))
+        d = np.hypot(dx, dy)
+        ok = d <= margin
+        return q[ok], t[ok], d[ok]
+
+
+def _tagged_index(data, categories):
+    """
+    GridIndex over items of `categories` that have a tag and a usable box, their tags
+    and their polylines as (m, 2) points (None where there is none).
+    """
+    boxes, status, refs = pack_boxes(data, categories=set(categories))
+    keep = [row for row, (category, item) in enumerate(refs)
+            if status[row] == BOX_OK and item.get(TAG_KEYS.get(category, "tag")) not in MISSING_VALUES]
+    tags = [refs[row][1][TAG_KEYS.get(refs[row][0], "tag")] for row in keep]
+    shapes = [polyline_points(refs[row][1].get("polyline")) for row in keep]
+    return GridIndex(boxes[keep] if keep else np.empty((0, 4))), tags, shapes
+
+
+def _nearest_shapes(index, shapes, queries, max_distance):
+    """
+    Like GridIndex.nearest_many, but the distance to a target with a polyline is the
+    gap to its segments; boxes only select the candidates.
+    """
+    best = np.full(len(queries), -1, dtype=np.intp)
+    best_d = np.full(len(queries), np.inf)
+    q, t, d = index.pairs_within(queries, max_distance)
+    for k in range(len(q)):
+        if shapes[t[k]] is not None:
+            d[k] = polyline_box_distance(queries[q[k]], shapes[t[k]])
+    ok = d <= max_distance
+    q, t, d = q[ok], t[ok], d[ok]
+    order = np.lexsort((t, d, q))
+    q, t, d = q[order], t[order], d[order]
+    first = np.ones(len(q), dtype=bool)
+    first[1:] = q[1:] != q[:-1]
+    best[q[first]] = t[first]
+    best_d[q[first]] = d[first]
+    return best, best_d
+
+
+def infer_associations(data, rules=ASSOCIATION_RULES):
+    """
+    Fills missing link fields from proximity and marks them as inferred, in place.
+    Existing values from the model are never overwritten. Returns counts per field.
+    """
+    counts = {}
+    for category, field, targets, max_distance in rules:
+        items = data.get(category)
+        if not isinstance(items, list) or not items:
+            continue
+        index, tags, shapes = _tagged_index(data, targets)
+        if not len(index):
+            continue
+        boxes, status, refs = pack_boxes({category: items})
+        rows = [row for row, (_, item) in enumerate(refs)
+                if status[row] == BOX_OK and item.get(field) in MISSING_VALUES]
+        if not rows:
+            continue
+        if any(shape is not None for shape in shapes):
+            nearest, distances = _nearest_shapes(index, shapes, boxes[rows], max_distance)
+        else:
+            nearest, distances = index.nearest_many(boxes[rows], max_distance)
+        confidence = np.round(1.0 - distances / max_distance, 3) if max_distance else np.ones(len(rows))
+        for row, i, score in zip(rows, nearest.tolist(), confidence.tolist()):
+            if i < 0:
+                continue
+            item = refs[row][1]
+            item[field] = tags[i]
+            item["association_confidence"] = score
+            item["flags"] = sorted(set(item.get("flags") or []) | {"inferred_association"})
+            counts[field] = counts.get(field, 0) + 1
+    return counts
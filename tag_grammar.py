@@ -0,0 +1,109 @@
+"""
+One grammar for instrument, equipment and line-number tags.
+
+ISA-5.1 instrument tags (FT-101, TIC-203A, 10-PSV-1001), equipment tags (P-101A/B,
+TK-201) and line numbers (4"-P-1001-A1A: nominal size, service, number, piping spec)
+are described once here. The scalar parse_* functions are memoized, so a tag that
+appears in several stages is matched only once per process; parse_column runs the same
+grammar over a whole column with pandas' vectorized str.extract.
+"""
+import re
+from functools import lru_cache
+from types import MappingProxyType
+
+# Optional plant area / unit prefix, e.g. the "10-" in 10-FT-101
+_AREA = r"(?:(?P<area>\d{1,4})[-\s])?"
+
+GRAMMARS = {
+    # First letter: measured variable; then up to four readout/function letters
+    "instrument": re.compile(
+        _AREA + r"(?P<function>[A-Z][A-Z]{1,4})[-\s]?(?P<loop_id>\d{1,6})(?P<suffix>[A-Z]{0,2})"
+    ),
+    "equipment": re.compile(
+        _AREA + r"(?P<equipment_class>[A-Z]{1,3})[-\s]?(?P<number>\d{1,6})(?P<suffix>[A-Z]?(?:/[A-Z])?)"
+    ),
+    # Size: 4", 1-1/2", 0.75", 100MM; spec: A1A, 150#CS; optional insulation code
+    "line": re.compile(
+        r"(?P<nominal_size>\d+(?:-\d+/\d+|[./]\d+)?\s*(?:\"|''|IN|MM)?)[-\s]+"
+        r"(?P<service>[A-Z]{1,4})[-\s]+(?P<number>\d{1,6}[A-Z]?)"
+        r"(?:[-\s]+(?P<spec>[A-Z0-9#]{1,8}))?(?:[-\s]+(?P<insulation>[A-Z]{1,3}))?"
+    ),
+}
+PARSE_CACHE_SIZE = 8192
+
+
+def _clean(tag):
+    return tag.strip().upper() if isinstance(tag, str) else None
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_cached(kind, tag):
+    tag = _clean(tag)
+    m = GRAMMARS[kind].fullmatch(tag) if tag else None
+    return MappingProxyType(m.groupdict()) if m else None
+
+
+def parse(kind, tag):
+    """
+    Components of `tag` under the `kind` grammar ("instrument", "equipment" or "line")
+    as a read-only mapping, or None if the tag does not follow it. Case and surrounding
+    blanks are ignored; results are memoized per tag, so copy before changing them.
+    """
+    try:
+        return _parse_cached(kind, tag)
+    except TypeError:  # unhashable, so not a tag
+        return None
+
+
+def parse_instrument(tag):
+    """ISA-5.1 instrument tag -> {area, function, loop_id, suffix} or None."""
+    return parse("instrument", tag)
+
+
+def parse_equipment(tag):
+    """Equipment tag -> {area, equipment_class, number, suffix} or None."""
+    return parse("equipment", tag)
+
+
+def parse_line_number(tag):
+    """Line number -> {nominal_size, service, number, spec, insulation} or None."""
+    return parse("line", tag)
+
+
+def format_instrument_tag(function, loop_id, suffix="", area=None):
+    """Canonical ISA spelling: [AREA-]FUNCTION-LOOPSUFFIX."""
+    tag = f"{function}-{loop_id}{suffix or ''}"
+    return f"{area}-{tag}" if area else tag
+
+
+def canonical_instrument_tag(tag):
+    """`tag` respelled canonically (ft 101a -> FT-101A), or just cleaned if it does not parse."""
+    parsed = parse_instrument(tag)
+    if parsed is None:
+        return _clean(tag)
+    return format_instrument_tag(parsed["function"], parsed["loop_id"], parsed["suffix"], parsed["area"])
+
+
+def parse_column(values, kind):
+    """
+    Parses a whole column of tags at once with pandas str.extract. Each distinct value
+    is matched once and the results are broadcast back. Returns a DataFrame with one
+    column per grammar component, indexed like `values`; rows that do not parse (or are
+    not strings) are all NA.
+    """
+    import pandas as pd
+
+    series = values if isinstance(values, pd.Series) else pd.Series(list(values), dtype=object)
+    codes, uniques = pd.factorize(series)
+    text = pd.Series([v if isinstance(v, str) else None for v in uniques], dtype="string")
+    parts = text.str.strip().str.upper().str.extract(f"^(?:{GRAMMARS[kind].pattern})$", expand=True)
+    # Missing values have code -1, which reindexes to an all-NA row
+    rows = parts.reindex(codes)
+    rows.index = series.index
+    return rows
+
+
+def matches_column(values, kind):
+    """Boolean Series: which entries of `values` follow the `kind` grammar."""
+    parsed = parse_column(values, kind)
+    return parsed.notna().any(axis=1)
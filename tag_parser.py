@@ -1,41 +1,35 @@
-import re
-ISA_INSTRUMENT_TAG_REGEX = re.compile(r'([A-Z]{2,4})-?(\d+)([A-Z]?)')
-ISA_EQUIPMENT_TAG_REGEX = re.compile(r'([A-Z])-?(\d+)([A-Z]?/?B?)')
+from tag_grammar import parse_column, parse_equipment, parse_instrument
 
 def parse_instrument_tag(tag):
     """
-    Parses a standard ISA instrument tag using regex and extracts its components.
+    Parses a standard ISA instrument tag with the shared tag grammar and extracts its components.
     Returns a dictionary with the parts or None if the tag is non-standard.
     """
-    if not isinstance(tag, str):
+    parsed = parse_instrument(tag)
+    if not parsed:
         return None
-        
-    match = ISA_INSTRUMENT_TAG_REGEX.match(tag.strip())
-    if not match:
-        return None
-    
+
     return {
-        "function": match.group(1),
-        "loop_id": match.group(2),
-        "suffix": match.group(3)
+        "function": parsed["function"],
+        "loop_id": parsed["loop_id"],
+        "suffix": parsed["suffix"],
+        "area": parsed["area"]
     }
 
 def parse_equipment_tag(tag):
     """
-    Parses a standard ISA equipment tag using regex.
+    Parses a standard equipment tag with the shared tag grammar.
     Returns a dictionary with the parts or None if the tag is non-standard.
     """
-    if not isinstance(tag, str):
+    parsed = parse_equipment(tag)
+    if not parsed:
         return None
 
-    match = ISA_EQUIPMENT_TAG_REGEX.match(tag.strip())
-    if not match:
-        return None
-    
     return {
-        "class": match.group(1),
-        "area_or_unit": match.group(2),
-        "suffix": match.group(3)
+        "class": parsed["equipment_class"],
+        "area_or_unit": parsed["number"],
+        "suffix": parsed["suffix"],
+        "area": parsed["area"]
     }
 
 def validate_loop_integrity(instrument_list):
@@ -44,17 +38,13 @@ def validate_loop_integrity(instrument_list):
     Returns a dictionary where keys are loop IDs and values are lists of instrument tags.
     """
     loops = {}
-    if not isinstance(instrument_list, list):
+    if not isinstance(instrument_list, list) or not instrument_list:
         return loops
 
-    for instrument in instrument_list:
-        tag = instrument.get('tag')
-        parsed = parse_instrument_tag(tag)
-        if parsed and parsed['loop_id']:
-            loop_id = parsed['loop_id']
-            if loop_id not in loops:
-                loops[loop_id] = []
-            loops[loop_id].append(tag)
-            
-    return loops
+    tags = [instrument.get('tag') for instrument in instrument_list]
+    parsed = parse_column(tags, "instrument")
+    for tag, loop_id in zip(tags, parsed["loop_id"]):
+        if isinstance(loop_id, str) and loop_id:
+            loops.setdefault(loop_id, []).append(tag)
 
+    return loops
@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import numpy as np
+
+from analyzer import AnalyzerClient, encode_payload
+from model_backends import LocalBackend
+from result_cache import ResultCache
+
+RESPONSE = json.dumps({"equipment": [], "annotations": []})
+
+
+def _images(n):
+    # Distinct tiny sheets so every drawing has its own cache key
+    images = []
+    for i in range(n):
+        img = np.full((32, 32), 255, np.uint8)
+        img[i + 2, 4:28] = 0
+        images.append(img)
+    return images
+
+
+def test_encode_payload_is_lossless_png():
+    import cv2
+
+    image = _images(1)[0]
+    payload, mime = encode_payload(image)
+    assert mime == "image/png"
+    assert np.array_equal(cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_GRAYSCALE), image)
+
+
+def test_analyze_many_bounds_in_flight_requests(tmp_path):
+    backend = LocalBackend(RESPONSE, latency=0.02)
+    client = AnalyzerClient(backend=backend, cache=ResultCache(str(tmp_path)))
+
+    results = asyncio.run(client.analyze_many(_images(12), max_concurrency=3))
+
+    assert len(results) == 12
+    assert all(r == {"equipment": [], "annotations": []} for r in results)
+    assert backend.calls == 12
+    assert 1 < backend.max_in_flight <= 3
+
+
+def test_repeat_analysis_is_served_from_cache(tmp_path):
+    backend = LocalBackend(RESPONSE)
+    client = AnalyzerClient(backend=backend, cache=ResultCache(str(tmp_path)))
+    image = _images(1)[0]
+
+    first = client.analyze(image)
+    second = client.analyze(image)
+    client.analyze(image, refresh_cache=True)
+
+    assert first == second
+    assert backend.calls == 2
+    assert client.cache.hits == 1
+
+
+def test_analyze_stream_yields_categories_then_result(tmp_path):
+    doc = {"metadata": {"drawing_title": "T"}, "equipment": [{"tag": "P-101"}], "lines": []}
+    backend = LocalBackend(json.dumps(doc), chunk_size=8)
+    client = AnalyzerClient(backend=backend, cache=ResultCache(str(tmp_path)))
+
+    events = list(client.analyze_stream(_images(1)[0]))
+
+    assert [(e, k) for e, k, _ in events] == [
+        ("category", "metadata"), ("category", "equipment"), ("category", "lines"), ("result", None),
+    ]
+    assert events[-1][2] == doc
+    # The streamed result is cached like a blocking one
+    assert list(client.analyze_stream(_images(1)[0]))[-1][2] == doc
+    assert backend.calls == 1
+
+
+def test_truncated_response_is_not_cached(tmp_path):
+    truncated = '{"equipment": [{"tag": "P-101"}, {"tag": "P-1'
+    backend = LocalBackend(truncated)
+    client = AnalyzerClient(backend=backend, cache=ResultCache(str(tmp_path)))
+    image = _images(1)[0]
+
+    assert client.analyze(image)["equipment"] == [{"tag": "P-101"}]
+    assert list(client.analyze_stream(image))[-1][2]["equipment"] == [{"tag": "P-101"}]
+    assert backend.calls == 2
+
+    # Cut off before the first complete item: nothing usable, so a failure
+    for text in ('{"metadata": {"drawing_title": "T"}, "equipment": [{"ta', '{"metadata": {"drawing_ti'):
+        client = AnalyzerClient(backend=LocalBackend(text), cache=ResultCache(str(tmp_path)))
+        assert client.analyze(_images(2)[1]) is None
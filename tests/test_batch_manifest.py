@@ -0,0 +1,44 @@
+import sqlite3
+
+from batch_manifest import JobManifest
+
+
+def test_resume_skips_only_finished_unchanged_inputs(tmp_path):
+    image = tmp_path / "sheet.png"
+    image.write_bytes(b"png")
+    output = tmp_path / "sheet.json"
+    manifest = JobManifest(str(tmp_path / "manifest.db"))
+
+    manifest.mark_running(str(image))
+    assert not manifest.is_done(str(image))
+
+    output.write_text("{}")
+    manifest.mark_done(str(image), 1.5, [str(output)])
+    assert manifest.is_done(str(image))
+    assert manifest.counts() == {"done": 1}
+
+    # A missing output or a changed input means the drawing must be redone
+    output.unlink()
+    assert not manifest.is_done(str(image))
+    output.write_text("{}")
+    image.write_bytes(b"png, revised")
+    assert not manifest.is_done(str(image))
+
+
+def test_older_manifest_gains_output_names(tmp_path):
+    path = str(tmp_path / "manifest.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE jobs (input_path TEXT PRIMARY KEY, fingerprint TEXT, status TEXT NOT NULL, "
+                 "started_at REAL, finished_at REAL, duration_s REAL, outputs TEXT, error TEXT)")
+    conn.execute("INSERT INTO jobs (input_path, status) VALUES ('old.png', 'done')")
+    conn.commit()
+    conn.close()
+
+    manifest = JobManifest(path)
+    assert manifest.output_name("old.png") is None
+    image = tmp_path / "new.png"
+    image.write_bytes(b"png")
+    manifest.mark_running(str(image))
+    manifest.mark_done(str(image), 1.0, [], output_name="new")
+    manifest.mark_running(str(image))
+    assert manifest.output_name(str(image)) == "new"
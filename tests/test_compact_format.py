@@ -0,0 +1,73 @@
+import json
+
+from analyzer import AnalyzerClient, COMPACT_PROMPT, MASTER_PROMPT, _EXTRACTION_RULES
+from compact_format import count_tokens, expand_compact, to_compact
+from model_backends import LocalBackend
+from postprocessing import postprocess_pid_data
+from result_cache import ResultCache
+
+from tests.test_analyzer import _images
+
+VERBOSE = {
+    "metadata": {"drawing_title": "Feed Section", "drawing_number": "PID-100", "revision": "B"},
+    "equipment": [
+        {"tag": "P-101", "type": "Pump", "bounding_box": [100, 200, 150, 260],
+         "category_name": "equipment", "label": "P-101"},
+        {"tag": "TK-1", "type": "Tank", "description": "Feed tank", "bounding_box": [10, 10, 90, 90],
+         "category_name": "equipment", "label": "TK-1"},
+    ],
+    "lines": [
+        {"line_number_tag": "2\"-P-1001", "source_tag": "TK-1", "destination_tag": "P-101",
+         "line_type": "process", "bounding_box": [90, 50, 100, 230], "category_name": "lines",
+         "label": "2\"-P-1001"},
+    ],
+    "control_relationships": [
+        {"source_tag": "FT-1", "destination_tag": "FV-1", "relationship_type": "controls",
+         "category_name": "control_relationships", "label": "FT-1 -> FV-1"},
+    ],
+}
+
+
+def test_compact_round_trip_restores_verbose_structure():
+    compact = to_compact(VERBOSE)
+    assert "category_name" not in compact["equipment"]["fields"]
+
+    restored = expand_compact(json.loads(json.dumps(compact)))
+
+    # Columns absent from a row come back as null; everything else is identical
+    stripped = {k: [{f: v for f, v in item.items() if v is not None} for item in items]
+                if isinstance(items, list) else items for k, items in restored.items()}
+    assert stripped == VERBOSE
+    assert count_tokens(json.dumps(compact)) < count_tokens(json.dumps(VERBOSE))
+
+
+def test_short_rows_and_unrecognized_symbols():
+    data = expand_compact({
+        "valves": {"fields": ["tag", "type", "installed_on_line_tag"], "rows": [["V-1", "Gate Valve"]]},
+        "unrecognized_symbols": {"fields": ["description", "bounding_box"], "rows": [["odd", [1, 2, 3, 4]]]},
+    })
+
+    assert data["valves"] == [{"tag": "V-1", "type": "Gate Valve", "installed_on_line_tag": None,
+                               "category_name": "valves", "label": "V-1"}]
+    assert data["unrecognized_symbols"][0]["flag_for_review"] is True
+    assert data["unrecognized_symbols"][0]["label"] == "unrecognized_symbols"
+
+
+def test_compact_mode_feeds_postprocessing_unchanged(tmp_path):
+    backend = LocalBackend(json.dumps(to_compact(VERBOSE)), chunk_size=16)
+    client = AnalyzerClient(backend=backend, cache=ResultCache(str(tmp_path)), output_mode="compact")
+    assert client.prompt == COMPACT_PROMPT
+
+    blocking = client.analyze(_images(1)[0], use_cache=False)
+    events = list(client.analyze_stream(_images(1)[0], use_cache=False))
+
+    assert events[-1][2] == blocking
+    assert dict((k, v) for e, k, v in events if e == "category")["equipment"] == blocking["equipment"]
+    processed = postprocess_pid_data(blocking)
+    assert [item["tag"] for item in processed["equipment"]] == ["P-101", "TK-1"]
+
+
+def test_both_modes_share_the_extraction_rules():
+    for prompt in (MASTER_PROMPT, COMPACT_PROMPT):
+        assert _EXTRACTION_RULES in prompt
+    assert "Round coordinates to nearest integer" in COMPACT_PROMPT
@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+
+import config
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def test_pipeline_import_has_no_side_effects(tmp_path):
+    env = dict(os.environ, GOOGLE_APPLICATION_CREDENTIALS_JSON=json.dumps({"type": "service_account"}),
+               TMPDIR=str(tmp_path))
+    env.pop("GOOGLE_APPLICATION_CREDENTIALS", None)
+    code = (
+        "import os, sys, analyzer, postprocessing, normalizer; "
+        "print([m for m in ('streamlit', 'vertexai', 'cv2') if m in sys.modules]); "
+        "print(os.environ.get('GOOGLE_APPLICATION_CREDENTIALS'))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout.splitlines()
+
+    assert out == ["[]", "None"]
+    assert os.listdir(tmp_path) == []
+
+
+def test_settings_resolve_once_from_environment(monkeypatch):
+    monkeypatch.setenv("GOOGLE_CLOUD_MODEL_ID", "test-model")
+    monkeypatch.setenv("GOOGLE_APPLICATION_CREDENTIALS_JSON", json.dumps({"client_email": "a@b"}))
+    settings = config.get_settings(refresh=True)
+    try:
+        monkeypatch.setenv("GOOGLE_CLOUD_MODEL_ID", "other-model")
+        assert config.get_settings() is settings
+        assert settings.model_id == "test-model"
+        assert settings.credentials_info == {"client_email": "a@b"}
+    finally:
+        monkeypatch.undo()
+        config.get_settings(refresh=True)
+
+
+def test_partial_secrets_fall_back_per_key(monkeypatch):
+    monkeypatch.setattr(config, "_gcp_secrets", lambda: {"project_id": "from-secrets"})
+    monkeypatch.setenv("GOOGLE_CLOUD_LOCATION", "europe-west4")
+    monkeypatch.delenv("GOOGLE_CLOUD_MODEL_ID", raising=False)
+    monkeypatch.delenv("GOOGLE_APPLICATION_CREDENTIALS_JSON", raising=False)
+
+    settings = config.load_settings()
+
+    assert (settings.project_id, settings.location, settings.model_id) == ("from-secrets", "europe-west4", "gemini-2.5-pro")
+    assert settings.credentials_info is None
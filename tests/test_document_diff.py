@@ -0,0 +1,27 @@
+import copy
+
+from document_diff import changed_categories, diff_documents
+
+OLD = {
+    "metadata": {"drawing_title": "Feed"},
+    "equipment": [{"tag": "P-101", "type": "Pump"}, {"tag": "TK-1", "type": "Tank"}],
+    "lines": [{"line_number_tag": "2\"-P-1", "line_type": "process"}],
+    "annotations": [{"text": "NOTE 1", "bounding_box": [0, 0, 5, 5]}],
+}
+
+
+def test_identical_documents_have_no_delta():
+    assert diff_documents(OLD, copy.deepcopy(OLD)) == {}
+    assert changed_categories(OLD, copy.deepcopy(OLD)) == []
+
+
+def test_delta_reports_added_removed_and_changed_items():
+    new = copy.deepcopy(OLD)
+    new["equipment"][0]["description"] = "Feed pump"
+    new["equipment"].pop(1)
+    new["equipment"].append({"tag": "E-1", "type": "Heat Exchanger"})
+
+    delta = diff_documents(OLD, new)
+
+    assert delta == {"equipment": {"added": ["E-1"], "removed": ["TK-1"], "changed": ["P-101"], "unchanged": 0}}
+    assert changed_categories(OLD, new) == ["equipment"]
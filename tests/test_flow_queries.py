@@ -0,0 +1,49 @@
+import copy
+
+from flow_queries import FlowIndex
+
+DOC = {
+    "equipment": [{"tag": "P-101"}, {"tag": "E-201"}, {"tag": "T-301"}, {"tag": "T-302"}, {"tag": "K-1"}, {"tag": "K-2"}],
+    "valves": [
+        {"tag": "V-1", "type": "Gate Valve"}, {"tag": "V-2", "type": "Check Valve"}, {"tag": "V-3", "type": "Ball Valve"},
+        {"tag": "V-4", "type": "Globe Valve", "installed_on_line_tag": "L-5"},
+    ],
+    "lines": [
+        {"line_number_tag": "L-1", "source_tag": "P-101", "destination_tag": "V-1"},
+        {"line_number_tag": "L-2", "source_tag": "V-1", "destination_tag": "E-201"},
+        {"line_number_tag": "L-3", "source_tag": "E-201", "destination_tag": "V-2"},
+        {"line_number_tag": "L-4", "source_tag": "V-2", "destination_tag": "V-3"},
+        {"line_number_tag": "L-5", "source_tag": "E-201", "destination_tag": "T-302"},
+        {"line_number_tag": "L-6", "source_tag": "V-3", "destination_tag": "T-301"},
+        {"line_number_tag": "L-7", "source_tag": "T-301", "destination_tag": "V-3"},
+        {"line_number_tag": "L-8", "source_tag": "K-1", "destination_tag": "K-2"},
+    ],
+}
+
+
+def test_traversal_and_paths():
+    index = FlowIndex(DOC)
+    assert index.downstream("p-101") == ["E-201", "T-301", "T-302", "V-1", "V-2", "V-3"]
+    assert index.upstream("T-301") == ["E-201", "P-101", "V-1", "V-2", "V-3"]
+    assert index.reaches("V-3", "T-301") and index.reaches("T-301", "V-3")
+    assert not index.reaches("T-301", "P-101") and not index.reaches("P-101", "K-2")
+    assert index.flow_path("P-101", "T-301") == ["P-101", "V-1", "E-201", "V-2", "V-3", "T-301"]
+    assert index.flow_path("K-2", "K-1") is None
+    assert index.downstream("NOPE") == [] and "NOPE" not in index
+
+
+def test_isolation_boundary():
+    index = FlowIndex(DOC)
+    # V-2 is a check valve (no isolation); V-4 sits on line L-5 without being a line endpoint
+    assert index.isolation_valves("E-201") == {"valves": ["V-1", "V-3", "V-4"], "unisolated": []}
+    assert index.isolation_valves("K-1") == {"valves": [], "unisolated": ["K-2"]}
+
+
+def test_update_rebuilds_only_changed_parts():
+    index = FlowIndex()
+    assert index.update(DOC) == 3  # the two trains and the inline valve V-4
+    assert index.update(copy.deepcopy(DOC)) == 0
+    changed = copy.deepcopy(DOC)
+    changed["lines"].append({"line_number_tag": "L-9", "source_tag": "K-2", "destination_tag": "K-1"})
+    assert index.update(changed) == 1
+    assert index.reaches("K-2", "K-1") and index.downstream("P-101")[-1] == "V-3"
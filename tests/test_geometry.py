@@ -0,0 +1,60 @@
+import itertools
+
+import numpy as np
+
+from geometry import apply_geometry, overlap_pairs
+
+
+def _brute_force(boxes, min_fraction=0.1):
+    pairs = set()
+    for a, b in itertools.combinations(range(len(boxes)), 2):
+        ix = min(boxes[a, 2], boxes[b, 2]) - max(boxes[a, 0], boxes[b, 0])
+        iy = min(boxes[a, 3], boxes[b, 3]) - max(boxes[a, 1], boxes[b, 1])
+        if ix > 0 and iy > 0:
+            area = lambda k: (boxes[k, 2] - boxes[k, 0]) * (boxes[k, 3] - boxes[k, 1])
+            if ix * iy >= min_fraction * min(area(a), area(b)):
+                pairs.add((a, b))
+    return pairs
+
+
+def test_grid_overlaps_match_all_pairs_scan():
+    rng = np.random.default_rng(7)
+    xy = rng.uniform(0, 950, (400, 2))
+    boxes = np.hstack([xy, xy + rng.uniform(1, 40, (400, 2))])
+    boxes[:3] = [0, 0, 600, 600]  # large boxes spanning many grid cells
+
+    i, j, _ = overlap_pairs(boxes)
+
+    found = list(zip(i.tolist(), j.tolist()))
+    assert len(found) == len(set(found))
+    assert set(found) == _brute_force(boxes)
+
+
+def test_flags_are_written_back_to_items():
+    doc = {
+        "equipment": [
+            {"tag": "P-1", "bounding_box": [10, 10, 50, 50]},
+            {"tag": "P-1B", "bounding_box": [11, 10, 50, 50]},
+            {"tag": "P-2", "bounding_box": [30, 30, 80, 80], "flags": ["low_confidence"]},
+            {"tag": "P-3", "bounding_box": [900, 900, 1200, 950]},
+            {"tag": "P-4", "bounding_box": [5, 5, "x", 9]},
+            {"tag": "P-5", "bounding_box": [70, 5, 60, 9]},
+            {"tag": "P-6"},
+        ],
+        "lines": [{"line_number_tag": "L-1", "bounding_box": [0, 0, 1000, 30]}],
+        # A bubble inside an equipment outline and a copy of P-3's box as an instrument
+        "instrumentation": [{"tag": "PI-2", "bounding_box": [40, 40, 60, 60]},
+                            {"tag": "PI-3", "bounding_box": [900, 900, 1000, 950]}],
+    }
+
+    counts = apply_geometry(doc)
+
+    flags = [item.get("flags") for item in doc["equipment"]]
+    assert flags[0] == ["bbox_overlap", "duplicate_bbox"]
+    assert flags[2] == ["bbox_overlap", "low_confidence"]
+    assert flags[3] == ["bbox_clipped", "duplicate_bbox"] and doc["equipment"][3]["bounding_box"] == [900, 900, 1000, 950]
+    assert flags[4:] == [["invalid_bbox"], ["bbox_not_tight"], ["missing_bbox"]]
+    assert "flags" not in doc["lines"][0]
+    assert "flags" not in doc["instrumentation"][0]
+    assert doc["instrumentation"][1]["flags"] == ["duplicate_bbox"]
+    assert counts["duplicate_bbox"] == 4
@@ -0,0 +1,61 @@
+import json
+import os
+
+import intelligence_builder
+from intelligence_builder import node_unit, render_knowledge_graph
+
+
+def plant(units, per_unit):
+    equipment, lines = [], []
+    for u in range(1, units + 1):
+        tags = [f"P-{u}{n:02d}" for n in range(per_unit)]
+        equipment += [{"tag": tag, "type": "Pump"} for tag in tags]
+        lines += [{"line_number_tag": f"L-{a}", "source_tag": a, "destination_tag": b} for a, b in zip(tags, tags[1:])]
+        if u > 1:
+            lines.append({"line_number_tag": f"X-{u}", "source_tag": f"P-{u - 1}00", "destination_tag": tags[0]})
+    return {"equipment": equipment, "lines": lines}
+
+
+def _dataset(html, name):
+    start = html.index(f"var {name} = new vis.DataSet(") + len(f"var {name} = new vis.DataSet(")
+    return json.loads(html[start:html.index(");\n", start)])
+
+
+def test_node_unit():
+    assert node_unit("10-FT-101", {}) == "10"
+    assert node_unit("P-205", {}) == "2"
+    assert node_unit("P-5", {"unit": "U7"}) == "U7"
+    assert node_unit("J-1", {}) == "unassigned"
+
+
+def test_large_mode_places_nodes_on_the_server(monkeypatch):
+    monkeypatch.setattr(intelligence_builder, "VIS_JS_URL", "https://example.org/vis-network.min.js")
+    html = render_knowledge_graph(plant(3, 5), large=True)
+    assert '<script src="https://example.org/vis-network.min.js">' in html
+    assert "vis-network.min.js" not in html.replace("https://example.org/vis-network.min.js", "")
+    nodes, edges = _dataset(html, "nodes"), _dataset(html, "edges")
+    assert len(nodes) == 15 and len(edges) == 14
+    positions = {n["id"]: (n["x"], n["y"]) for n in nodes}
+    # Each chain is laid out left to right; unit blocks do not overlap
+    assert positions["P-100"][0] < positions["P-101"][0] < positions["P-104"][0] < positions["P-200"][0]
+    assert '"physics": {"enabled": false}' in html
+
+
+def test_collapse_mode_summarizes_units(monkeypatch):
+    monkeypatch.setattr(intelligence_builder, "VIS_JS_URL", "vis.js")
+    html = render_knowledge_graph(plant(3, 5), collapse=True)
+    nodes, edges = _dataset(html, "nodes"), _dataset(html, "edges")
+    assert [n["id"] for n in nodes] == ["unit:1", "unit:2", "unit:3"]
+    assert nodes[0]["value"] == 5
+    assert [(e["from"], e["to"], e["value"]) for e in edges] == [("unit:1", "unit:2", 1), ("unit:2", "unit:3", 1)]
+
+
+def test_small_graphs_keep_pyvis_and_static_asset_is_copied_once(monkeypatch, tmp_path):
+    assert "new vis.Network" in render_knowledge_graph(plant(1, 3))
+    monkeypatch.setattr(intelligence_builder, "STATIC_DIR", str(tmp_path))
+    intelligence_builder.ensure_static_asset.cache_clear()
+    try:
+        path = intelligence_builder.ensure_static_asset()
+        assert os.path.getsize(path) > 100_000
+    finally:
+        intelligence_builder.ensure_static_asset.cache_clear()
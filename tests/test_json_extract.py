@@ -0,0 +1,88 @@
+import json
+import os
+import random
+
+import pytest
+
+from json_stream import PARTIAL_KEY, extract_json_object
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "model_outputs")
+
+# fixture -> (expected top-level keys, partial?) ; None means nothing is recoverable
+EXPECTED = {
+    "fenced.txt": (["metadata", "equipment"], False),
+    "prose_prefix.txt": (["metadata", "valves"], False),
+    "braces_in_strings.txt": (["metadata", "annotations"], False),
+    "truncated_mid_item.txt": (["metadata", "equipment"], True),
+    "truncated_in_string.txt": (["metadata", "instrumentation", "lines"], True),
+    "truncated_after_members.txt": (["metadata", "equipment"], True),
+    "garbage.txt": None,
+}
+
+
+def _read(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_corpus(name):
+    data = extract_json_object(_read(name))
+    expected = EXPECTED[name]
+    if expected is None:
+        assert data is None
+        return
+    keys, partial = expected
+    assert [k for k in data if k != PARTIAL_KEY] == keys
+    assert bool(data.get(PARTIAL_KEY)) == partial
+
+
+def test_nested_metadata_is_not_cut_at_first_brace():
+    data = extract_json_object(_read("fenced.txt"))
+    assert data["metadata"]["revision"] == "B"
+    assert data["equipment"][0]["tag"] == "P-101"
+
+
+def test_truncated_output_keeps_only_complete_items():
+    data = extract_json_object(_read("truncated_mid_item.txt"))
+    assert [e["tag"] for e in data["equipment"]] == ["E-201"]
+    data = extract_json_object(_read("truncated_in_string.txt"))
+    assert data["lines"] == []
+
+
+def _random_document(rng):
+    categories = ["equipment", "instrumentation", "lines", "valves", "annotations"]
+    doc = {"metadata": {"drawing_title": rng.choice(["A {x}", 'say "hi"', None]), "revision": "1"}}
+    for category in rng.sample(categories, rng.randint(1, len(categories))):
+        doc[category] = [
+            {
+                "tag": f"{category[:2].upper()}-{rng.randint(1, 999)}",
+                "label": rng.choice(["plain", "br}ace", "q\"uote", "back\\slash", "ümlaut"]),
+                "bounding_box": [rng.randint(0, 500), rng.randint(0, 500), rng.randint(500, 1000), rng.randint(500, 1000)],
+                "flag_for_review": rng.random() < 0.2,
+            }
+            for _ in range(rng.randint(0, 6))
+        ]
+    return doc
+
+
+def test_fuzz_truncation_never_invents_or_mangles_items():
+    rng = random.Random(42)
+    for _ in range(300):
+        doc = _random_document(rng)
+        text = rng.choice(["", "```json\n", "Result:\n"]) + json.dumps(doc, ensure_ascii=rng.random() < 0.5)
+        cut = rng.randint(1, len(text))
+        data = extract_json_object(text[:cut])
+        if cut == len(text):
+            assert data == doc
+            continue
+        if data is None:
+            continue
+        assert data.pop(PARTIAL_KEY) is True
+        for key, value in data.items():
+            assert key in doc
+            if isinstance(value, list):
+                # Every recovered item is a complete, unmodified prefix of the original list
+                assert value == doc[key][:len(value)]
+            else:
+                assert value == doc[key]
@@ -0,0 +1,37 @@
+import json
+import random
+
+from json_stream import IncrementalJSONParser
+
+DOC = {
+    "metadata": {"drawing_title": "Unit {100}", "revision": None},
+    "equipment": [{"tag": "P-101", "label": "quote \" and brace }]", "bounding_box": [1, 2, 3, 4]}],
+    "lines": [],
+    "count": 5,
+    "complete": True,
+}
+
+
+def test_members_are_emitted_as_they_close_for_any_chunking():
+    text = "```json\n" + json.dumps(DOC) + "\n```"
+    rng = random.Random(0)
+    for _ in range(100):
+        parser = IncrementalJSONParser()
+        keys = []
+        i = 0
+        while i < len(text):
+            step = rng.randint(1, 9)
+            keys += [key for key, _ in parser.feed(text[i:i + step])]
+            i += step
+        assert keys == list(DOC)
+        assert parser.done
+        assert parser.result() == DOC
+
+
+def test_category_is_available_before_the_document_ends():
+    text = json.dumps(DOC)
+    cut = text.index('"lines"')
+    parser = IncrementalJSONParser()
+    events = parser.feed(text[:cut])
+    assert [key for key, _ in events] == ["metadata", "equipment"]
+    assert not parser.done
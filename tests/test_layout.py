@@ -0,0 +1,55 @@
+import networkx as nx
+
+import layout
+from graph_builder import build_and_visualize_graph
+from layout import compute_layout, layered_layout, place_new_nodes
+
+
+def test_layered_layout_follows_flow_and_collapses_cycles():
+    graph = nx.DiGraph([("A", "B"), ("B", "C"), ("A", "C"), ("C", "D"), ("D", "C"), ("X", "Y")])
+    pos = layered_layout(graph)
+    assert [pos[n][0] for n in "ABCD"] == [0.0, 1.0, 2.0, 2.0]
+    assert pos["X"][0] == 0.0 and pos["Y"][0] == 1.0
+    assert len(set(pos.values())) == len(pos)
+
+
+def test_layout_cache_and_incremental_placement(monkeypatch):
+    graph = nx.path_graph(6, create_using=nx.DiGraph)
+    first = compute_layout(graph, method="spring", lineage="D-1")
+    assert compute_layout(graph.copy(), method="spring") == first
+
+    grown = graph.copy()
+    grown.add_edge(5, 6)
+    monkeypatch.setattr(nx, "spring_layout", lambda *a, **k: (_ for _ in ()).throw(AssertionError("recomputed")))
+    pos = compute_layout(grown, method="spring", lineage="D-1")
+    assert all(pos[n] == first[n] for n in graph.nodes) and 6 in pos
+    monkeypatch.undo()
+
+    # Another drawing sharing a few tags, or one that grew a lot, is laid out afresh
+    small = nx.DiGraph([("P-101", "T-101")])
+    compute_layout(small, method="spring", lineage="D-2")
+    other = nx.path_graph(20, create_using=nx.DiGraph)
+    other.add_edges_from([(0, "P-101"), ("P-101", "T-101")])
+    for lineage in ("D-2", "D-3"):
+        pos = compute_layout(nx.relabel_nodes(other, str), method="spring", lineage=lineage)
+        assert len(set(pos.values())) == len(pos)
+
+    # Large graphs are never given to the spring layout
+    monkeypatch.setattr(layout, "SPRING_LAYOUT_MAX_NODES", 3)
+    assert set(compute_layout(nx.path_graph(10, create_using=nx.DiGraph))) == set(range(10))
+
+
+def test_place_new_nodes_without_neighbours():
+    graph = nx.DiGraph([("A", "B")])
+    graph.add_node("C")
+    pos = place_new_nodes(graph, {"A": (0.0, 0.0)})
+    assert pos["A"] == (0.0, 0.0) and pos["C"][0] > pos["A"][0] and len(set(pos.values())) == 3
+
+
+def test_process_flow_renders_to_memory():
+    data = {"equipment": [{"tag": "P-101", "type": "Pump"}, {"tag": "T-201", "type": "Tank"}],
+            "lines": [{"line_number_tag": "L-1", "source_tag": "P-101", "destination_tag": "T-201"}]}
+    png = build_and_visualize_graph(data)
+    assert png.startswith(b"\x89PNG") and build_and_visualize_graph(data) is png
+    assert b"<svg" in build_and_visualize_graph(data, fmt="svg")
+    assert build_and_visualize_graph({}) is None
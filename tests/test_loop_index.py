@@ -0,0 +1,75 @@
+from loop_index import CONTROLLER, FINAL_ELEMENT, SAFETY, SENSOR, LoopIndex, function_role
+
+
+def _issues(index):
+    return [(i["area"], i["loop"], i["issue_type"], i["details"]) for i in index.issues()]
+
+
+def test_function_roles():
+    assert function_role("FT") == SENSOR
+    assert function_role("TIC") == CONTROLLER
+    assert function_role("FCV") == FINAL_ELEMENT
+    assert function_role("PSV") == SAFETY
+
+
+def test_loops_across_sheets_and_relationships():
+    index = LoopIndex()
+    index.add_sheet("S1", {
+        "instrumentation": [{"tag": "FT-101"}, {"tag": "FIC-101"}, {"tag": "LT-300"}, {"tag": "10-PIC-7"}],
+        "valves": [{"tag": "V-55", "type": "Control Valve"}],
+        "control_relationships": [{"source_tag": "LT-300", "destination_tag": "V-55", "relationship_type": "controls"}],
+    })
+    assert ("10", "7") in index and len(index.members((None, "300"))) == 2
+
+    assert _issues(index) == [
+        (None, "101", "Incomplete Loop", "Loop 101 has a controller but no final element."),
+        (None, "300", "Incomplete Loop", "Loop 300 has a transmitter but no controller."),
+        ("10", "7", "Incomplete Loop", "Loop 10-7 has a controller but no final element."),
+        ("10", "7", "Incomplete Loop", "Loop 10-7 has a controller but no measurement."),
+    ]
+
+    # The final element of loop 101 is on another sheet; TT-101 reuses the loop number
+    index.add_sheet("S2", {"valves": [{"tag": "FV-101"}], "instrumentation": [{"tag": "TT-101"}, {"tag": "TT-101"}]})
+    loop_101 = [i for i in _issues(index) if i[1] == "101"]
+    assert [i[2] for i in loop_101] == ["Duplicate Loop Number", "Duplicate Tag"]
+
+    # Re-adding a sheet replaces its contribution; removing it restores the earlier state
+    index.add_sheet("S2", {"valves": [{"tag": "FV-101"}]})
+    assert [i for i in _issues(index) if i[1] == "101"] == []
+    index.remove_sheet("S2")
+    assert _issues(index)[0][1:3] == ("101", "Incomplete Loop")
+
+
+def test_only_touched_loops_are_rechecked(monkeypatch):
+    import loop_index
+
+    index = LoopIndex()
+    for n in range(20):
+        index.add_sheet(n, {"instrumentation": [{"tag": f"FT-{n}"}, {"tag": f"FIC-{n}"}], "valves": [{"tag": f"FV-{n}"}]})
+    assert index.issues() == []
+
+    checked = []
+    original = loop_index.check_loop
+    monkeypatch.setattr(loop_index, "check_loop", lambda key, members: checked.append(key) or original(key, members))
+    index.add_sheet("late", {"instrumentation": [{"tag": "FT-3"}]})
+    index.issues()
+    assert checked == [(None, "3")]
+
+
+def test_saved_index_reloads_and_skips_unchanged_sheets(tmp_path):
+    sheet = {"instrumentation": [{"tag": "FT-101"}, {"tag": "FIC-101"}], "valves": [{"tag": "FV-101"}]}
+    index = LoopIndex()
+    index.add_sheet("S1", sheet)
+    index.add_sheet("S2", {"instrumentation": [{"tag": "LT-300"}]})
+    path = str(tmp_path / "loops.json")
+    index.save(path)
+
+    loaded = LoopIndex.load(path)
+    assert sorted(loaded.sheets) == ["S1", "S2"] and loaded.loops() == index.loops()
+    assert _issues(loaded) == _issues(index)
+    # Unchanged content is not re-indexed; changed content is
+    loaded.add_sheet("S1", sheet)
+    assert not loaded._dirty
+    loaded.add_sheet("S2", {"instrumentation": [{"tag": "LT-300"}, {"tag": "LIC-300"}]})
+    assert _issues(loaded) == [(None, "300", "Incomplete Loop", "Loop 300 has a controller but no final element.")]
+    assert LoopIndex.load(str(tmp_path / "missing.json")).sheets == []
@@ -0,0 +1,62 @@
+import os
+
+from batch_manifest import JobManifest
+from main import collect_inputs, input_root, load_previous, output_name, output_names, write_outputs
+
+
+def test_same_file_names_in_different_folders_do_not_collide(tmp_path):
+    for folder in ("a", "b"):
+        (tmp_path / "in" / folder).mkdir(parents=True)
+        (tmp_path / "in" / folder / "P-1.png").write_bytes(b"")
+    paths = collect_inputs([str(tmp_path / "in" / "**" / "*.png")])
+    root = input_root(paths)
+    assert [output_name(path, root) for path in paths] == [os.path.join("a", "P-1"), os.path.join("b", "P-1")]
+
+    json_dir, csv_dir = str(tmp_path / "json"), str(tmp_path / "csv")
+    for i, path in enumerate(paths):
+        write_outputs({"equipment": [{"tag": f"P-{i}"}]}, path, json_dir, csv_dir, root)
+    for i, path in enumerate(paths):
+        previous = load_previous(os.path.join(json_dir, output_name(path, root) + ".json"))
+        assert previous == {"equipment": [{"tag": f"P-{i}"}]}
+
+    # A single folder keeps the plain file names
+    assert output_name(paths[0], input_root(paths[:1])) == "P-1"
+
+
+def test_missing_csv_is_rewritten_and_empty_category_removed(tmp_path):
+    image = tmp_path / "P-1.png"
+    image.write_bytes(b"")
+    json_dir, csv_dir = str(tmp_path / "json"), str(tmp_path / "csv")
+    data = {"equipment": [{"tag": "P-101"}], "valves": [{"tag": "V-1"}]}
+    outputs = write_outputs(data, str(image), json_dir, csv_dir)
+    equipment_csv = os.path.join(csv_dir, "P-1_equipment.csv")
+    assert equipment_csv in outputs
+
+    # Same data again: nothing changed, but the deleted CSV is written back
+    os.remove(equipment_csv)
+    outputs = write_outputs(data, str(image), json_dir, csv_dir)
+    assert all(os.path.exists(path) for path in outputs) and os.path.exists(equipment_csv)
+
+    # A category that became empty loses its CSV and is not reported as an output
+    outputs = write_outputs({**data, "valves": []}, str(image), json_dir, csv_dir)
+    assert not os.path.exists(os.path.join(csv_dir, "P-1_valves.csv"))
+    assert all(os.path.exists(path) for path in outputs) and len(outputs) == 2
+
+
+def test_output_names_survive_a_narrower_run(tmp_path):
+    for folder in ("a", "b"):
+        (tmp_path / "in" / folder).mkdir(parents=True)
+        (tmp_path / "in" / folder / "P-1.png").write_bytes(b"")
+    manifest = JobManifest(str(tmp_path / "manifest.db"))
+    paths = collect_inputs([str(tmp_path / "in")])
+    names = output_names(paths, manifest)
+    for path in paths:
+        manifest.mark_running(path)
+        manifest.mark_done(path, 0.1, [], output_name=names[path])
+
+    # A later run over one folder alone would name its drawing "P-1"
+    only_a = collect_inputs([str(tmp_path / "in" / "a")])
+    assert output_names(only_a, manifest) == {only_a[0]: os.path.join("a", "P-1")}
+    new = tmp_path / "in" / "a" / "P-2.png"
+    new.write_bytes(b"")
+    assert output_names([str(new)], manifest, str(tmp_path / "in"))[str(new)] == os.path.join("a", "P-2")
@@ -0,0 +1,66 @@
+import copy
+
+from normalizer import attach_flags, normalize_all, normalize_document, normalize_equipment, normalize_instrument, normalize_line, normalize_valve
+from postprocessing import postprocess_pid_data
+
+DOC = {
+    "metadata": {"drawing_title": "Feed", "drawing_number": "PID-1", "revision": "A"},
+    "equipment": [{"tag": "p-101", "type": "Pump", "bounding_box": [1, 2, 30, 40]}],
+    "instrumentation": [
+        {"tag": "ft-101", "type": "Flow Transmitter", "bounding_box": [5, 5, 9, 9]},
+        {"tag": "TIC-203", "type": "Controller", "bounding_box": [5, 5, 5, 9], "flags": ["low_confidence"]},
+    ],
+    "lines": [{"line_number_tag": "2\"-p-1", "source_tag": "p-101", "bounding_box": [0, 0, 100, 2]},
+              {"line_number_tag": "3\"-P-2", "style_hint": "dashed"}],
+    "valves": [{"tag": "hv-1", "type": "Gate Valve", "bounding_box": [1, 1, 2]}],
+    "annotations": [{"text": "NOTE 1", "bounding_box": [0, 0, 10, 10]}],
+}
+
+
+def _legacy_chain(doc):
+    # The previous pipeline: postprocess in place, then deep-copying normalization per item
+    data = postprocess_pid_data(copy.deepcopy(doc))
+    data["metadata"]["standards_referenced"] = ["ISA-5.1", "ISO 10628", "ISO 14617", "ISO 15926"]
+    for key, fn in (("equipment", normalize_equipment), ("valves", normalize_valve),
+                    ("instrumentation", normalize_instrument), ("lines", normalize_line)):
+        data[key] = [attach_flags(fn(item)) for item in data[key]]
+    for key in ("junctions", "control_relationships", "annotations", "safety_devices", "unrecognized_symbols"):
+        data[key] = [attach_flags(item) for item in data[key]]
+    return data
+
+
+def test_fused_pass_matches_legacy_chain_without_touching_input():
+    original = copy.deepcopy(DOC)
+
+    fused = normalize_document(DOC, check_geometry=False, infer_topology=False, infer_links=False)
+
+    assert fused == _legacy_chain(original)
+    assert DOC == original
+    # Copy-on-write: unchanged nested values are shared, changed items are new objects
+    assert fused["equipment"][0] is not DOC["equipment"][0]
+    assert fused["equipment"][0]["bounding_box"] is DOC["equipment"][0]["bounding_box"]
+    assert fused["instrumentation"][1]["flags"] == ["bbox_not_tight", "low_confidence"]
+    assert fused["valves"][0]["flags"] == ["invalid_bbox"]
+    assert fused["lines"][1]["flags"] == ["missing_bbox"]
+    # normalize_all is that chain without the tag cleaning
+    cleaned = postprocess_pid_data(copy.deepcopy(DOC))
+    assert normalize_all(cleaned) == _legacy_chain(cleaned)
+
+
+def test_metadata_list_or_missing_is_normalized():
+    fused = normalize_document({"metadata": [{"drawing_title": "A"}, {"revision": "0"}]})
+    assert fused["metadata"]["drawing_title"] == "A"
+    assert fused["metadata"]["revision"] == "0"
+    assert normalize_document({})["metadata"]["standards_referenced"][0] == "ISA-5.1"
+
+
+def test_geometry_flags_are_applied_in_bulk():
+    fused = normalize_document(DOC, infer_topology=False, infer_links=False)
+
+    # The transmitter sits inside the pump's box, which is normal across categories;
+    # lines are exempt from overlap checks
+    assert "flags" not in fused["equipment"][0]
+    assert "bbox_overlap" not in fused["instrumentation"][0].get("flags", [])
+    assert "flags" not in fused["lines"][0]
+    assert fused["instrumentation"][1]["flags"] == ["bbox_not_tight", "low_confidence"]
+    assert fused["valves"][0]["flags"] == ["invalid_bbox"]
@@ -0,0 +1,76 @@
+from plant_model import PlantModel, save_sheet, sheet_key
+
+SHEET_A = {
+    "metadata": {"drawing_number": "D-001"},
+    "equipment": [{"tag": "P-101"}],
+    "junctions": [{"junction_id": "J-1", "off_page": True, "page_ref": "D-002", "label": "A", "bounding_box": [0, 0, 1, 1]}],
+    "lines": [
+        {"line_number_tag": "L-1", "source_tag": "P-101", "destination_tag": "J-1"},
+        {"line_number_tag": "L-9", "source_tag": "P-101", "destination_tag": "UNKNOWN"},
+    ],
+}
+SHEET_B = {
+    "metadata": {"drawing_number": "D-002"},
+    "equipment": [{"tag": "T-201"}, {"tag": "T-202"}],
+    "junctions": [{"junction_id": "J-1", "off_page": True, "page_ref": "D-001", "label": "A", "bounding_box": [0, 0, 1, 1]}],
+    "lines": [
+        {"line_number_tag": "L-1", "source_tag": "J-1", "destination_tag": "T-201"},
+        {"line_number_tag": "L-9", "source_tag": None, "destination_tag": "T-202"},
+    ],
+}
+
+
+def _stitched(model):
+    return sorted((u, v) for u, v, stitched in model.graph.edges(data="stitched") if stitched)
+
+
+def test_connectors_and_line_numbers_are_stitched_across_sheets():
+    plant = PlantModel()
+    plant.add_sheet("a", SHEET_A)
+    assert _stitched(plant) == []
+    plant.add_sheet("b", SHEET_B)
+    assert _stitched(plant) == [("P-101", "T-202"), ("a:J-1", "b:J-1")]
+    assert plant.graph.nodes["T-201"]["sheets"] == ["b"]
+
+    # Revising a sheet replaces it; removing it drops its nodes and stitches
+    revised = dict(SHEET_B, lines=SHEET_B["lines"][:1])
+    assert plant.add_sheet("b", revised) == 2
+    assert _stitched(plant) == [("a:J-1", "b:J-1")] and "T-202" in plant.graph
+    plant.remove_sheet("b")
+    assert _stitched(plant) == [] and sorted(plant.graph.nodes) == ["P-101", "a:J-1"]
+
+
+def test_saved_model_loads_without_restitching(tmp_path, monkeypatch):
+    import plant_model
+
+    plant = PlantModel()
+    plant.add_sheet("a", SHEET_A)
+    plant.add_sheet("b", SHEET_B)
+    path = tmp_path / "plant.json"
+    plant.save(str(path))
+
+    monkeypatch.setattr(plant_model, "stitch", lambda *args: (_ for _ in ()).throw(AssertionError("re-stitched")))
+    loaded = PlantModel.load(str(path))
+    assert sorted(loaded.graph.edges(keys=True)) == sorted(plant.graph.edges(keys=True))
+    assert loaded.sheets == ["a", "b"] and loaded.stitched_edges() == 2
+    assert len(PlantModel.load(str(tmp_path / "missing.json"))) == 0
+
+
+def test_save_sheet_merges_with_other_sessions(tmp_path):
+    path = str(tmp_path / "plant.json")
+    # Two sessions that each loaded the (empty) model before either saved
+    first, second = PlantModel.load(path), PlantModel.load(path)
+    assert len(first) == len(second) == 0
+
+    save_sheet(sheet_key(SHEET_A), SHEET_A, path)
+    merged = save_sheet(sheet_key(SHEET_B), SHEET_B, path)
+    assert sorted(merged.sheets) == ["D-001", "D-002"] and len(_stitched(merged)) == 2
+    assert sorted(PlantModel.load(path).sheets) == ["D-001", "D-002"]
+
+    untitled = {"equipment": [{"tag": "P-7"}]}
+    assert sheet_key(untitled).startswith("sha1:") and sheet_key(untitled) != sheet_key({"equipment": []})
+    # Re-analysing one upload gives another extraction but the same key
+    upload = b"\x89PNG same upload"
+    assert sheet_key(untitled, upload=upload) == sheet_key({"equipment": []}, upload=upload)
+    assert sheet_key(untitled, upload=upload).startswith("upload:")
+    assert sheet_key(SHEET_A, upload=upload) == "D-001"
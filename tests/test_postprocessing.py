@@ -0,0 +1,43 @@
+import copy
+
+from postprocessing import postprocess_pid_data
+
+DOC = {
+    "equipment": [
+        {"tag": None, "type": "Pump", "bounding_box": [10, 10, 50, 50]},
+        {"tag": None, "type": "Pump", "bounding_box": [10, 10, 50, 50]},
+        {"tag": "P-1", "type": "Pump", "bounding_box": [60, 10, 90, 50]},
+    ],
+    "instrumentation": [
+        {"tag": "", "type": "Indicator", "measured_variable": "Flow", "bounding_box": [1, 1, 5, 5]},
+        {"tag": "", "type": "Indicator", "measured_variable": "Flow", "loop_id": "101", "bounding_box": [6, 1, 9, 5]},
+        {"tag": "", "type": "Indicator", "measured_variable": "Flow", "loop_id": "101", "bounding_box": [6, 6, 9, 9]},
+        {"tag": "FI-101", "type": "Indicator", "bounding_box": [0, 0, 1, 1]},
+    ],
+    "lines": [{"line_number_tag": " ", "line_type": "process", "bounding_box": [0, 0, 100, 2]}],
+    "valves": [{"type": "Gate Valve", "bounding_box": [3, 3, 6, 6]}],
+}
+
+
+def _run(doc):
+    return postprocess_pid_data(copy.deepcopy(doc))
+
+
+def test_synthesized_ids_are_stable_across_runs():
+    first, second = _run(DOC), _run(DOC)
+
+    assert first == second
+    assert first["equipment"][0]["tag"].startswith("EQUIP-")
+    assert first["lines"][0]["line_number_tag"].startswith("UNSPECIFIED-LINE-")
+    assert first["valves"][0]["tag"].startswith("VALVE-")
+
+
+def test_synthesized_ids_never_collide():
+    data = _run(DOC)
+
+    equipment = [item["tag"] for item in data["equipment"]]
+    instruments = [item["tag"] for item in data["instrumentation"]]
+    assert len(set(equipment)) == 3
+    # FI-101 is already taken by a real tag, so the loop-based IDs get suffixes
+    assert instruments[1:] == ["FI-101-2", "FI-101-3", "FI-101"]
+    assert len(set(instruments)) == 4
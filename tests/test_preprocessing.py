@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from preprocessing import PREPROCESS_PARAMS, _preprocess_chain, preprocess_tiled, TILED_TOLERANCE
+
+
+def test_tiled_matches_monolithic():
+    rng = np.random.default_rng(1)
+    img = rng.integers(0, 255, (300, 420), dtype=np.uint8)
+    img[100:104, :] = 0
+    img[:, 200:203] = 0
+
+    monolithic = _preprocess_chain(img)
+    tiled = preprocess_tiled(img, workers=1, tile_size=128)
+
+    assert tiled.shape == monolithic.shape
+    assert np.count_nonzero(tiled != monolithic) / img.size <= TILED_TOLERANCE
+
+
+def test_tile_halo_follows_the_filter_sizes(monkeypatch):
+    rng = np.random.default_rng(2)
+    img = rng.integers(0, 255, (260, 260), dtype=np.uint8)
+    monkeypatch.setitem(PREPROCESS_PARAMS, "search_window", 35)
+    monkeypatch.setitem(PREPROCESS_PARAMS, "threshold_block", 41)
+
+    tiled = preprocess_tiled(img, workers=1, tile_size=96)
+
+    assert np.count_nonzero(tiled != _preprocess_chain(img)) / img.size <= TILED_TOLERANCE
+    with pytest.raises(ValueError):
+        preprocess_tiled(img, workers=1, tile_size=96, overlap=32)
+
+
+def test_load_image_accepts_bytes_and_arrays():
+    import cv2
+    from preprocessing import load_image, preprocess_image
+
+    img = np.full((40, 60, 3), 255, np.uint8)
+    ok, encoded = cv2.imencode(".png", img)
+    assert ok
+
+    decoded = load_image(encoded.tobytes())
+    assert decoded.shape == img.shape
+    assert load_image(decoded) is decoded
+    assert preprocess_image(b"not an image") is None
+    assert preprocess_image(decoded).shape == img.shape[:2]
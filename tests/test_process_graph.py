@@ -0,0 +1,53 @@
+import networkx as nx
+import pytest
+
+from process_graph import build_process_graph, get_process_graph, line_subgraph
+from review_engine import generate_review_queue
+
+DOC = {
+    "equipment": [{"tag": "P-101", "type": "Pump"}, {"tag": "T-201", "type": "Tank"}, {"tag": "E-9", "type": "Heater"}],
+    "instrumentation": [{"tag": "FT-101", "connected_to_tag": "L-1"}, {"tag": "FIC-101"}, {"tag": "bad tag"}],
+    "valves": [{"tag": "FV-101", "type": "Control Valve"}],
+    "junctions": [{"junction_id": "J-1", "connected_lines": ["L-3"]}],
+    "safety_devices": [{"tag": "PSV-1"}],
+    "lines": [
+        {"line_number_tag": "L-1", "source_tag": "P-101", "destination_tag": "FV-101"},
+        {"line_number_tag": "L-2", "source_tag": "fv-101", "destination_tag": "T-201"},
+        {"line_number_tag": "L-3", "source_tag": "UNKNOWN", "destination_tag": "J-1"},
+    ],
+    "control_relationships": [
+        {"source_tag": "FT-101", "destination_tag": "FIC-101", "relationship_type": "signals"},
+        {"source_tag": "FIC-101", "destination_tag": "FV-101", "relationship_type": "controls"},
+    ],
+}
+
+
+def test_graph_nodes_and_edges():
+    graph = build_process_graph(DOC)
+    assert graph.nodes["P-101"]["category"] == "Equipment" and graph.nodes["J-1"]["category_key"] == "junctions"
+    assert sorted(graph.edges(data="kind")) == [
+        ("FIC-101", "FV-101", "control"), ("FT-101", "FIC-101", "control"),
+        ("FV-101", "T-201", "line"), ("P-101", "FV-101", "line")]
+    assert graph.graph["dangling_edges"] == 1
+    assert sorted(line_subgraph(graph).edges()) == [("FV-101", "T-201"), ("P-101", "FV-101")]
+
+
+def test_graph_is_cached_per_document_content():
+    graph = get_process_graph(DOC)
+    assert get_process_graph(dict(reversed(list(DOC.items())))) is graph
+    assert nx.is_frozen(graph)
+    with pytest.raises(nx.NetworkXError):
+        graph.add_node("X")
+    changed = {**DOC, "equipment": DOC["equipment"][:2]}
+    assert get_process_graph(changed) is not graph
+
+
+def test_review_orphans_are_unconnected_graph_nodes():
+    # The review engine indexes the document itself; its orphans are the graph nodes with
+    # no edge and no link to a line
+    graph = build_process_graph(DOC)
+    warnings = generate_review_queue(DOC)["warnings"]
+    orphans = [w["id"] for w in warnings if w["issue_type"] == "Orphan Node"]
+    assert orphans == ["E-9", "BAD TAG", "PSV-1"]
+    assert all(node in graph and not graph.degree(node) for node in orphans)
+    assert [w["id"] for w in warnings if w["issue_type"] == "Invalid Tag Format"] == ["BAD TAG"]
@@ -0,0 +1,89 @@
+import asyncio
+import random
+
+import pytest
+
+from model_backends import LocalBackend, ThrottlingBackend
+from request_scheduler import (
+    CircuitBreaker, CircuitOpenError, ModelUnavailableError, RequestScheduler, TokenBucket,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    async def async_sleep(self, seconds):
+        self.sleep(seconds)
+        await asyncio.sleep(0)
+
+
+def _scheduler(clock, **kwargs):
+    kwargs.setdefault("requests_per_minute", 600)
+    kwargs.setdefault("tokens_per_minute", 10**9)
+    return RequestScheduler(clock=clock, sleep=clock.sleep, async_sleep=clock.async_sleep,
+                            rng=random.Random(0), **kwargs)
+
+
+def test_token_bucket_queues_callers_in_order():
+    clock = FakeClock()
+    bucket = TokenBucket(60, capacity=2, clock=clock)
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 1.0, 2.0]
+
+
+def test_retry_honours_retry_after_then_succeeds():
+    clock = FakeClock()
+    backend = ThrottlingBackend(LocalBackend("ok"), script=[(429, 7), 503])
+    scheduler = _scheduler(clock)
+
+    result = scheduler.call(lambda: backend.generate(b"", "image/png", "p"))
+
+    assert result == "ok"
+    assert backend.attempts == 3
+    assert clock.sleeps[0] >= 7
+    assert scheduler.stats["retries"] == 2
+
+
+def test_gives_up_after_max_attempts():
+    clock = FakeClock()
+    backend = ThrottlingBackend(LocalBackend("ok"), script=[429] * 10)
+    scheduler = _scheduler(clock, max_attempts=3,
+                           breaker=CircuitBreaker(failure_threshold=100, clock=clock))
+
+    with pytest.raises(ModelUnavailableError):
+        scheduler.call(lambda: backend.generate(b"", "image/png", "p"))
+    assert backend.attempts == 3
+
+
+def test_open_circuit_makes_callers_wait_instead_of_failing():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+    backend = ThrottlingBackend(LocalBackend("ok"), script=[429, 429])
+    scheduler = _scheduler(clock, breaker=breaker, base_delay=0.001)
+
+    async def run_batch():
+        return await asyncio.gather(*(
+            scheduler.run(lambda: backend.generate_async(b"", "image/png", "p")) for _ in range(5)
+        ))
+
+    assert asyncio.run(run_batch()) == ["ok"] * 5
+    assert breaker.state == "closed"
+    assert clock.now >= 30
+
+
+def test_circuit_open_error_when_wait_budget_exceeded():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=600, clock=clock)
+    breaker.record_failure()
+    scheduler = _scheduler(clock, breaker=breaker, max_breaker_wait=60)
+
+    with pytest.raises(CircuitOpenError):
+        scheduler.call(lambda: "never called")
@@ -0,0 +1,31 @@
+from result_cache import ResultCache, make_cache_key
+
+
+def test_key_changes_with_prompt_model_and_params():
+    base = make_cache_key(b"img", "prompt", "model", {"h": 10})
+    assert base == make_cache_key(b"img", "prompt", "model", {"h": 10})
+    assert base != make_cache_key(b"img2", "prompt", "model", {"h": 10})
+    assert base != make_cache_key(b"img", "prompt v2", "model", {"h": 10})
+    assert base != make_cache_key(b"img", "prompt", "model-2", {"h": 10})
+    assert base != make_cache_key(b"img", "prompt", "model", {"h": 11})
+
+
+def test_hits_misses_and_lru_eviction(tmp_path):
+    cache = ResultCache(cache_dir=str(tmp_path), max_bytes=250)
+    assert cache.get("a") is None
+
+    cache.put("a", {"equipment": ["x" * 50]})
+    cache.put("b", {"equipment": ["y" * 50]})
+    assert cache.get("a") == {"equipment": ["x" * 50]}
+
+    # "b" is now the least recently used entry and is evicted first
+    import os, time
+    os.utime(tmp_path / "b.json", (time.time() - 60, time.time() - 60))
+    cache.put("c", {"equipment": ["z" * 150]})
+
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+    assert stats["bytes"] <= 250
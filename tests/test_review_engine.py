@@ -0,0 +1,84 @@
+import review_engine
+from review_engine import REVIEW_RULES, ReviewIndex, ReviewSession, generate_review_queue, review_rule, run_rules
+
+DOC = {
+    "metadata": {"drawing_number": "D-1"},
+    "equipment": [
+        {"tag": "P-101", "confidence": 0.5, "bounding_box": [0, 0, 10, 10]},
+        {"tag": "T-201", "flags": ["bbox_overlap", "inferred_association"]},
+        {"tag": "P-101"},
+    ],
+    "instrumentation": [{"tag": "FT-101", "connected_to_tag": "L-1"}, {"tag": "Unknown", "flags": ["missing_tag"]}],
+    "lines": [{"line_number_tag": "L-1", "source_tag": "P-101", "destination_tag": "T-201", "confidence": 0.99}],
+    "unrecognized_symbols": [{"description": "odd symbol", "flag_for_review": True, "review_reason": "Unclear"}],
+}
+
+
+def _found(findings):
+    return sorted((f["id"], f["issue_type"]) for f in findings)
+
+
+def test_builtin_rules():
+    warnings = generate_review_queue(DOC)["warnings"]
+    assert _found(warnings) == [
+        ("P-101", "Low Confidence"), ("T-201", "Overlapping Detection"),
+        ("instrumentation[1]", "Missing Tag"), ("unrecognized_symbols[0]", "AI Flagged"),
+    ]
+    low = next(w for w in warnings if w["issue_type"] == "Low Confidence")
+    assert (low["category"], low["index"], low["details"]) == ("equipment", 0, "Detection confidence is only 0.50.")
+
+
+def test_shared_indexes():
+    index = ReviewIndex(DOC)
+    assert index.by_tag["P-101"] == 0 and index.degree == {"P-101": 1, "T-201": 1}
+    assert index.row_of[("instrumentation", 1)] == 4
+
+
+def test_rules_are_pluggable(monkeypatch):
+    monkeypatch.setattr(review_engine, "REVIEW_RULES", dict(REVIEW_RULES))
+
+    @review_rule("no_bbox_confidence", "Unboxed Detection", severity="error")
+    def unboxed(rows, index):
+        return [(row, "No box.") for row in rows if index.rows[row].tag and index.rows[row].bounding_box is None]
+
+    queue = generate_review_queue(DOC)
+    assert _found(queue["errors"]) == [("FT-101", "Unboxed Detection"), ("P-101", "Unboxed Detection"),
+                                        ("T-201", "Unboxed Detection")]
+    index = ReviewIndex(DOC)
+    only = run_rules(index.all_rows(), index, [review_engine.REVIEW_RULES["orphan"]])
+    assert only == []
+    assert "no_bbox_confidence" not in REVIEW_RULES
+
+
+def test_session_edit_returns_delta():
+    session = ReviewSession(DOC)
+    assert _found(session.queue()["warnings"]) == _found(generate_review_queue(DOC)["warnings"])
+
+    # Fixing the missing tag resolves it; the new tag is an orphan unless something links it
+    delta = session.apply_edit("instrumentation", 1, {"tag": "pt-301", "type": "transmitter",
+                                                          "bounding_box": [0, 0, 5, 5], "connected_to_tag": "L-1"})
+    assert _found(delta["resolved"]) == [("instrumentation[1]", "Missing Tag")]
+    assert delta["added"] == [] and session.data["instrumentation"][1]["tag"] == "PT-301"
+    assert DOC["instrumentation"][1]["tag"] == "Unknown"
+
+    # Re-routing the line away from T-201 leaves it an orphan: a neighbour's finding changes
+    delta = session.apply_edit("lines", 0, {"destination_tag": "PT-301"})
+    assert _found(delta["added"]) == [("T-201", "Orphan Node")] and delta["resolved"] == []
+    assert delta["rechecked"] == 5
+    assert _found(session.queue()["warnings"]) == _found(generate_review_queue(session.data)["warnings"])
+
+    delta = session.apply_edit("equipment", 0, {"type": "pump", "confidence": "high"})
+    assert _found(delta["added"]) == [("P-101", "Schema Violation")]
+    assert delta["added"][0]["details"] == "confidence: 'high' is not of type 'number', 'null'"
+    assert _found(delta["resolved"]) == [("P-101", "Low Confidence")]
+
+
+def test_tag_edit_derives_fields_again():
+    doc = {"instrumentation": [{"tag": "FT-101", "type": "transmitter", "bounding_box": [0, 0, 5, 5],
+                                "loop_id": "101", "measured_variable": "Flow", "isa_function": "Transmitter"}]}
+    session = ReviewSession(doc)
+
+    session.apply_edit("instrumentation", 0, {"tag": "TI-205"})
+
+    item = session.data["instrumentation"][0]
+    assert (item["loop_id"], item["measured_variable"], item["isa_function"]) == ("205", "Temperature", "Indicator")
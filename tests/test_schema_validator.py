@@ -0,0 +1,49 @@
+import pytest
+from jsonschema import ValidationError, validate
+
+from normalizer import normalize_document
+from review_engine import generate_review_queue
+from schema import PID_SCHEMA_V2
+from schema_validator import validate_document
+
+DOC = {
+    "metadata": {"drawing_title": "Test", "drawing_number": "PID-1", "revision": "A"},
+    "equipment": [
+        {"tag": "P-101", "type": "Pump", "bounding_box": [0, 0, 40, 40]},
+        {"tag": "E-201", "bounding_box": [100, 100, 140, 140]},  # missing type
+    ],
+    "instrumentation": [{"tag": "FT-101", "type": "Flow Transmitter", "bounding_box": [50, 0, 60, 10]}],
+    "lines": [{"line_number_tag": '4"-P-1001-A1A', "bounding_box": [40, 18, 100, 22]}],
+    "valves": [{"tag": "V-1", "type": "Gate Valve", "bounding_box": [10, 10, 20]}],  # short box
+}
+
+
+def test_bad_items_are_quarantined_and_the_rest_kept():
+    data = normalize_document(DOC)
+    with pytest.raises(ValidationError):
+        validate(instance=data, schema=PID_SCHEMA_V2)
+
+    kept, quarantined = validate_document(data)
+
+    assert [(q["category"], q["id"]) for q in quarantined] == [("equipment", "E-201"), ("valves", "V-1")]
+    assert any("'type' is a required property" in e for e in quarantined[0]["errors"])
+    assert [e["tag"] for e in kept["equipment"]] == ["P-101"]
+    assert kept["valves"] == [] and len(kept["lines"]) == 1
+    validate(instance=kept, schema=PID_SCHEMA_V2)
+    assert data["valves"]  # input untouched
+
+    queue = generate_review_queue({}, quarantined)
+    assert [(e["id"], e["issue_type"]) for e in queue["errors"]] == [
+        ("E-201", "Schema Violation"), ("V-1", "Schema Violation")]
+
+
+def test_whole_document_mode_and_structural_errors():
+    data = normalize_document(DOC)
+    with pytest.raises(ValidationError):
+        validate_document(data, per_item=False)
+    with pytest.raises(ValidationError):
+        validate_document({"equipment": {"tag": "P-101"}})
+    kept, quarantined = validate_document({"equipment": []})
+    assert quarantined == [] and kept == {"equipment": []}
+    assert validate_document(kept, per_item=False) == (kept, [])
+
@@ -0,0 +1,72 @@
+import numpy as np
+
+from spatial_index import GridIndex, box_distances, infer_associations
+
+
+def _random_boxes(n, seed):
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, 950, (n, 2))
+    return np.hstack([xy, xy + rng.uniform(1, 50, (n, 2))])
+
+
+def test_queries_match_brute_force():
+    boxes = _random_boxes(500, 1)
+    queries = _random_boxes(50, 2)
+    index = GridIndex(boxes)
+
+    nearest, distances = index.nearest_many(queries, max_distance=40.0)
+
+    for q, box in enumerate(queries):
+        d = box_distances(box, boxes)
+        assert set(index.query_range(box, margin=25.0).tolist()) == set(np.flatnonzero(d <= 25.0).tolist())
+        expected = sorted(zip(d.tolist(), range(len(boxes))))[:3]
+        assert index.nearest(box, k=3) == [(i, dist) for dist, i in expected]
+        if expected[0][0] <= 40.0:
+            assert (nearest[q], distances[q]) == (expected[0][1], expected[0][0])
+        else:
+            assert nearest[q] == -1
+
+
+def test_missing_links_are_inferred_with_confidence():
+    doc = {
+        "lines": [
+            {"line_number_tag": "L-1", "bounding_box": [0, 100, 1000, 104]},
+            {"line_number_tag": "L-2", "bounding_box": [0, 300, 1000, 304]},
+        ],
+        "valves": [
+            {"tag": "V-1", "bounding_box": [200, 95, 215, 110]},
+            {"tag": "V-2", "bounding_box": [200, 195, 215, 210]},
+            {"tag": "V-3", "installed_on_line_tag": "L-9", "bounding_box": [400, 295, 415, 310]},
+        ],
+        "instrumentation": [{"tag": "PT-1", "bounding_box": [500, 250, 520, 270]}],
+        "annotations": [{"text": "NC", "bounding_box": [220, 90, 240, 98]}],
+    }
+
+    counts = infer_associations(doc)
+
+    assert doc["valves"][0]["installed_on_line_tag"] == "L-1"
+    assert doc["valves"][0]["association_confidence"] == 1.0
+    assert "installed_on_line_tag" not in doc["valves"][1]  # too far from any line
+    assert doc["valves"][2]["installed_on_line_tag"] == "L-9"  # model output is kept
+    assert doc["instrumentation"][0]["connected_to_tag"] == "L-2"
+    assert doc["instrumentation"][0]["association_confidence"] == 0.625
+    assert doc["annotations"][0]["associated_tag"] == "V-1"
+    assert doc["annotations"][0]["flags"] == ["inferred_association"]
+    assert counts == {"associated_tag": 1, "connected_to_tag": 1, "installed_on_line_tag": 1}
+
+
+def test_line_distance_follows_its_polyline():
+    doc = {
+        "lines": [{"line_number_tag": "L-1", "bounding_box": [0, 0, 1000, 1000],
+                   "polyline": [[0, 0], [1000, 1000]]}],
+        "valves": [
+            {"tag": "V-1", "bounding_box": [890, 40, 910, 60]},  # inside the box, far off the run
+            {"tag": "V-2", "bounding_box": [495, 495, 505, 505]},
+        ],
+    }
+
+    infer_associations(doc)
+
+    assert "installed_on_line_tag" not in doc["valves"][0]
+    assert doc["valves"][1]["installed_on_line_tag"] == "L-1"
+    assert doc["valves"][1]["association_confidence"] == 1.0
@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from normalizer import normalize_document, parse_tag
+from postprocessing import normalize_instrument_tag
+from tag_grammar import matches_column, parse_column, parse_equipment, parse_instrument, parse_line_number
+
+
+def test_scalar_grammars():
+    assert parse_instrument("tic 203a") == {"area": None, "function": "TIC", "loop_id": "203", "suffix": "A"}
+    assert parse_instrument("10-PSV-1001")["area"] == "10"
+    assert parse_instrument("P-101") is None
+    assert parse_equipment("P-101A/B") == {"area": None, "equipment_class": "P", "number": "101", "suffix": "A/B"}
+    assert parse_line_number('1-1/2"-CW-2002-B2') == {
+        "nominal_size": '1-1/2"', "service": "CW", "number": "2002", "spec": "B2", "insulation": None}
+    # Memoized results are read-only
+    with pytest.raises(TypeError):
+        parse_instrument("FT-101")["function"] = "XX"
+    assert parse_instrument(["unhashable"]) is None
+
+
+def test_batch_matches_scalar():
+    tags = ["FT-101", "tic 203a", None, "not a tag", "10-PSV-1001", 42]
+    parsed = parse_column(tags, "instrument")
+    for tag, (_, row) in zip(tags, parsed.iterrows()):
+        expected = parse_instrument(tag)
+        if expected is None:
+            assert row.isna().all()
+        else:
+            assert {k: (None if pd.isna(v) else v) for k, v in row.items()} == expected
+    assert matches_column(tags, "instrument").tolist() == [True, True, False, False, True, False]
+
+
+def test_stages_share_the_grammar():
+    assert parse_tag("TIC-203A") == ("TIC", "203")
+    assert normalize_instrument_tag("ft 101") == "FT-101"
+    out = normalize_document({"lines": [{"line_number_tag": '4"-P-1001-A1A', "spec": "given"}]},
+                             check_geometry=False, infer_topology=False, infer_links=False)
+    line = out["lines"][0]
+    assert (line["nominal_size"], line["service"], line["spec"]) == ('4"', "P", "given")
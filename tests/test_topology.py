@@ -0,0 +1,64 @@
+from topology import UnionFind, build_topology, line_endpoints
+
+
+def _sheet():
+    return {
+        "equipment": [{"tag": "P-101", "bounding_box": [0, 0, 40, 40]},
+                      {"tag": "T-201", "bounding_box": [300, 0, 360, 80]}],
+        "valves": [{"tag": "V-1", "bounding_box": [140, 10, 160, 30]}],
+        "junctions": [{"junction_id": "J-1", "connected_lines": ["L-9"], "bounding_box": [500, 500, 506, 506]}],
+        "lines": [
+            # P-101 -> V-1 -> T-201 along drawn polylines
+            {"line_number_tag": "L-1", "source_tag": "UNKNOWN", "destination_tag": "UNKNOWN",
+             "polyline": [[42, 20], [100, 20], [138, 20]]},
+            {"line_number_tag": "L-2", "source_tag": "UNKNOWN", "destination_tag": "T-201",
+             "polyline": [298, 20, 162, 20]},
+            # Two lines meeting at a bare point, no symbol there
+            {"line_number_tag": "L-3", "source_tag": "UNKNOWN", "destination_tag": "UNKNOWN",
+             "bounding_box": [20, 200, 120, 202]},
+            {"line_number_tag": "L-4", "source_tag": "UNKNOWN", "destination_tag": "UNKNOWN",
+             "polyline": [[123, 201], [123, 400]]},
+            # Listed by the junction but drawn a little off it
+            {"line_number_tag": "L-9", "source_tag": "P-101", "destination_tag": "UNKNOWN",
+             "polyline": [[40, 30], [480, 480]]},
+        ],
+    }
+
+
+def test_union_find():
+    uf = UnionFind(5)
+    uf.union(0, 1)
+    uf.union(3, 4)
+    uf.union(1, 4)
+    assert len({uf.find(x) for x in range(5)}) == 2
+    assert uf.find(2) == 2
+
+
+def test_line_endpoints():
+    assert line_endpoints({"polyline": [[1, 2], [3, 4], [5, 6]]}) == ((1, 2), (5, 6))
+    assert line_endpoints({"bounding_box": [0, 0, 10, 100]}) == ((5, 0), (5, 100))
+    assert line_endpoints({"polyline": None}) is None
+
+
+def test_endpoints_snap_merge_and_fill():
+    data = _sheet()
+    counts = build_topology(data)
+    lines = {line["line_number_tag"]: line for line in data["lines"]}
+
+    assert (lines["L-1"]["source_tag"], lines["L-1"]["destination_tag"]) == ("P-101", "V-1")
+    # Drawn from T-201 towards the valve, stated destination T-201: read backwards
+    assert (lines["L-2"]["source_tag"], lines["L-2"]["destination_tag"]) == ("V-1", "T-201")
+    assert "topology_inferred" in lines["L-1"]["flags"]
+
+    inferred = [j for j in data["junctions"] if "topology_inferred" in (j.get("flags") or [])]
+    assert len(inferred) == 1 and inferred[0]["connected_lines"] == ["L-3", "L-4"]
+    assert lines["L-3"]["destination_tag"] == lines["L-4"]["source_tag"] == inferred[0]["junction_id"]
+    assert lines["L-3"]["source_tag"] == "UNKNOWN"  # dangling end stays unknown
+
+    assert lines["L-9"]["destination_tag"] == "J-1"
+    assert counts == {"junctions": 1, "source_tag": 3, "destination_tag": 3}
+
+    # Model values are kept, and a second pass changes nothing
+    assert lines["L-9"]["source_tag"] == "P-101"
+    again = build_topology(data)
+    assert again == {}
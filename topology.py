@@ -0,0 +1,237 @@
+"""
+Line topology reconstruction from drawn geometry.
+
+The model often leaves source_tag / destination_tag empty (UNKNOWN after
+post-processing), while the line's polyline or bounding box still shows where it
+starts and ends. build_topology snaps each line endpoint to the nearest equipment,
+valve, junction or instrument box within a tolerance, merges coincident free
+endpoints with union-find (two lines meeting at a point become one node, recorded as
+an inferred junction) and joins lines listed in a junction's connected_lines. The
+resulting node at each end fills the missing tags; filled lines get the
+"topology_inferred" flag. Endpoint lookups go through spatial_index.GridIndex, so the
+whole pass stays close to linear in the number of segments.
+"""
+import numpy as np
+
+from geometry import polyline_points
+from postprocessing import TAG_KEYS, collect_tags, stable_id
+from spatial_index import MISSING_VALUES, GridIndex
+
+# Categories a line can start or end at; on ties (an endpoint inside two boxes) the earlier one wins
+NODE_CATEGORIES = ("junctions", "valves", "equipment", "safety_devices", "instrumentation")
+# Max gap between a line end and a symbol box, and between two line ends, in normalized 0-1000 units
+SNAP_TOLERANCE = 8.0
+# Half edge length of the box given to inferred junctions
+JUNCTION_HALF_SIZE = 2
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 with path halving and union by size."""
+
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return a
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return a
+
+
+def line_endpoints(item):
+    """
+    (start, end) points of a line: the ends of its polyline, or else the ends of its
+    bounding box along the longer side. None when the line has neither.
+    """
+    points = polyline_points(item.get("polyline"))
+    if points is not None:
+        return tuple(points[0]), tuple(points[-1])
+    bb = item.get("bounding_box")
+    if not isinstance(bb, list) or len(bb) != 4:
+        return None
+    try:
+        x1, y1, x2, y2 = (float(v) for v in bb)
+    except (TypeError, ValueError):
+        return None
+    if not np.isfinite([x1, y1, x2, y2]).all():
+        return None
+    if abs(x2 - x1) >= abs(y2 - y1):
+        y = (y1 + y2) / 2
+        return (x1, y), (x2, y)
+    x = (x1 + x2) / 2
+    return (x, y1), (x, y2)
+
+
+def _nodes(data, used):
+    """(category, item, tag) and an (n, 4) box array for every symbol a line can attach to."""
+    nodes, boxes = [], []
+    for category in NODE_CATEGORIES:
+        items = data.get(category)
+        if not isinstance(items, list):
+            continue
+        key = TAG_KEYS.get(category, "tag")
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            bb = item.get("bounding_box")
+            try:
+                box = [float(v) for v in bb] if isinstance(bb, list) and len(bb) == 4 else None
+            except (TypeError, ValueError):
+                box = None
+            if box is None or not np.isfinite(box).all():
+                continue
+            tag = item.get(key)
+            if tag in MISSING_VALUES:
+                if category != "junctions":
+                    continue
+                tag = item[key] = stable_id("JCT", category, item, used)
+            nodes.append((category, item, tag))
+            boxes.append(box)
+    return nodes, np.array(boxes, dtype=np.float64).reshape(-1, 4)
+
+
+def _point_boxes(points):
+    return np.hstack([points, points])
+
+
+def build_topology(data, tolerance=SNAP_TOLERANCE):
+    """
+    Reconstructs line connectivity from endpoints and fills missing source_tag /
+    destination_tag values, in place. Existing values from the model are never
+    overwritten; a line whose polyline runs against its stated direction is read
+    backwards. Free ends shared by two or more lines become inferred junctions
+    (appended to data["junctions"] as a new list), and junctions get the lines that end
+    at them added to connected_lines. Returns counts per filled field and of inferred junctions.
+    """
+    lines = data.get("lines")
+    if not isinstance(lines, list) or not lines:
+        return {}
+    used = collect_tags(data)
+    nodes, node_boxes = _nodes(data, used)
+    n_ends = 2 * len(lines)
+
+    endpoints = np.full((n_ends, 2), np.nan)
+    for i, item in enumerate(lines):
+        ends = line_endpoints(item) if isinstance(item, dict) else None
+        if ends is not None:
+            endpoints[2 * i], endpoints[2 * i + 1] = ends
+    valid = np.flatnonzero(np.isfinite(endpoints).all(axis=1))
+    uf = UnionFind(n_ends + len(nodes))
+
+    # 1. Snap endpoints to the nearest symbol box
+    snapped = np.zeros(n_ends, dtype=bool)
+    if len(nodes) and len(valid):
+        nearest, _ = GridIndex(node_boxes).nearest_many(_point_boxes(endpoints[valid]), tolerance)
+        hit = nearest >= 0
+        snapped[valid[hit]] = True
+        for end, node in zip(valid[hit].tolist(), nearest[hit].tolist()):
+            uf.union(end, n_ends + node)
+
+    # 2. Lines a junction lists as connected: attach the end closer to the junction
+    line_key = TAG_KEYS["lines"]
+    rows_by_tag = {}
+    for i, item in enumerate(lines):
+        if isinstance(item, dict) and item.get(line_key) not in MISSING_VALUES:
+            rows_by_tag.setdefault(item[line_key], []).append(i)
+    for k, (category, item, _) in enumerate(nodes):
+        if category != "junctions":
+            continue
+        center = (node_boxes[k, :2] + node_boxes[k, 2:]) / 2
+        for line_tag in item.get("connected_lines") or []:
+            for i in rows_by_tag.get(line_tag, []):
+                ends = [e for e in (2 * i, 2 * i + 1) if np.isfinite(endpoints[e]).all()]
+                if not ends:
+                    continue
+                end = min(ends, key=lambda e: float(np.hypot(*(endpoints[e] - center))))
+                if not snapped[end]:
+                    snapped[end] = True
+                    uf.union(end, n_ends + k)
+
+    # 3. Merge free endpoints lying within the tolerance of each other
+    free = valid[~snapped[valid]]
+    if len(free) > 1:
+        boxes = _point_boxes(endpoints[free])
+        q, t, _ = GridIndex(boxes, cell_size=max(tolerance, 1.0)).pairs_within(boxes, tolerance)
+        for a, b in zip(free[q[q < t]].tolist(), free[t[q < t]].tolist()):
+            uf.union(a, b)
+
+    # 4. Name every cluster: its symbol, an inferred junction, or nothing for a dangling end
+    labels = {}
+    node_of_root = {}
+    for k, (_, _, tag) in enumerate(nodes):
+        root = uf.find(n_ends + k)
+        labels.setdefault(root, tag)
+        node_of_root.setdefault(root, k)
+    roots = [-1] * n_ends
+    for e in valid.tolist():
+        roots[e] = uf.find(e)
+
+    counts = {}
+    junctions = []
+    members = {}
+    for e in valid.tolist():
+        members.setdefault(roots[e], []).append(e)
+    for root, ends in members.items():
+        if root in labels or len(ends) < 2:
+            continue
+        cx, cy = endpoints[ends].mean(axis=0)
+        box = [int(round(cx)) - JUNCTION_HALF_SIZE, int(round(cy)) - JUNCTION_HALF_SIZE,
+               int(round(cx)) + JUNCTION_HALF_SIZE, int(round(cy)) + JUNCTION_HALF_SIZE]
+        junction = {"junction_id": None, "connected_lines": [], "bounding_box": box,
+                    "category_name": "junctions", "flags": ["topology_inferred"]}
+        junction["junction_id"] = junction["label"] = stable_id("JCT", "junctions", junction, used)
+        labels[root] = junction["junction_id"]
+        junctions.append((root, junction))
+    if junctions:
+        data["junctions"] = list(data.get("junctions") or []) + [j for _, j in junctions]
+        counts["junctions"] = len(junctions)
+
+    # 5. Fill missing ends and record which lines meet at each junction
+    connected = {}
+    drawn = np.isfinite(endpoints).all(axis=1).reshape(-1, 2).all(axis=1).tolist()
+    for i, item in enumerate(lines):
+        if not drawn[i]:
+            continue
+        start, end = labels.get(roots[2 * i]), labels.get(roots[2 * i + 1])
+        source, destination = item.get("source_tag"), item.get("destination_tag")
+        if (destination not in MISSING_VALUES and destination == start) or (
+                source not in MISSING_VALUES and source == end):
+            start, end = end, start
+        if start == end:
+            start = end = None
+        filled = False
+        for field, tag in (("source_tag", start), ("destination_tag", end)):
+            if tag is not None and item.get(field) in MISSING_VALUES:
+                item[field] = tag
+                counts[field] = counts.get(field, 0) + 1
+                filled = True
+        if filled:
+            item["flags"] = sorted(set(item.get("flags") or []) | {"topology_inferred"})
+        line_tag = item.get(line_key)
+        if line_tag not in MISSING_VALUES:
+            for root in {roots[2 * i], roots[2 * i + 1]}:
+                connected.setdefault(root, []).append(line_tag)
+
+    for root, junction in junctions:
+        junction["connected_lines"] = list(dict.fromkeys(connected.get(root, [])))
+    for root, k in node_of_root.items():
+        category, item, _ = nodes[k]
+        if category != "junctions" or root not in connected:
+            continue
+        existing = item.get("connected_lines") or []
+        added = [tag for tag in dict.fromkeys(connected[root]) if tag not in existing]
+        if added:
+            item["connected_lines"] = list(existing) + added
+    return counts
@@ -1,24 +1,26 @@
 import cv2
-import os
-import numpy as np
-from PIL import Image
+from preprocessing import load_image
 
-def draw_bounding_boxes(uploaded_file, detections, output_dir="temp_outputs"):
+def draw_bounding_boxes(image, detections):
     """
     Draws bounding boxes from AI detections on the uploaded image.
 
     Parameters:
-        uploaded_file (streamlit UploadedFile): The uploaded P&ID image.
+        image: The P&ID as a decoded NumPy array (shared with the rest of the pipeline),
+               raw bytes, a file path or a Streamlit UploadedFile.
         detections (dict): Extracted data with bounding_box info.
-        output_dir (str): Temporary folder to save annotated image.
 
     Returns:
-        str: Path to the saved annotated image.
+        numpy.ndarray: Annotated copy of the image in BGR order, or None if it cannot be decoded.
     """
-    # Convert uploaded file to OpenCV image
-    image = Image.open(uploaded_file).convert("RGB")
-    img_cv = np.array(image)
-    img_cv = cv2.cvtColor(img_cv, cv2.COLOR_RGB2BGR)
+    img_cv = load_image(image)
+    if img_cv is None:
+        return None
+    if img_cv.ndim == 2:
+        img_cv = cv2.cvtColor(img_cv, cv2.COLOR_GRAY2BGR)
+    else:
+        # Draw on a copy so the shared decoded buffer stays untouched
+        img_cv = img_cv.copy()
 
 
     for category, items in detections.items():
@@ -37,10 +39,5 @@ def draw_bounding_boxes(uploaded_file, detections, output_dir="temp_outputs"):
                                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
                     except Exception as e:
                         print(f"Skipping invalid bbox in {category}: {e}")
-    os.makedirs(output_dir, exist_ok=True)
 
-
-    output_path = os.path.join(output_dir, "annotated_image.png")
-    cv2.imwrite(output_path, img_cv)
-
-    return output_path
+    return img_cv